@@ -1,54 +1,34 @@
+import asyncio
+import copy
+import hashlib
 import json
-from typing import Dict, Any, Optional
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
 import config
-from database import Database
+from async_database import AsyncDatabase
+from bulk_update import compile_rule, compile_sku_updates
+from database import get_reference_version
+from product_index import TrigramIndex
+from text_normalizer import normalize as normalize_text
 
 # Import کتابخانه‌های AI
 if config.AI_PROVIDER == 'groq':
-    from groq import Groq
+    from groq import AsyncGroq
 elif config.AI_PROVIDER == 'claude':
     import anthropic
 
 
-class AIHandler:
-    def __init__(self):
-        self.provider = config.AI_PROVIDER
-        self.db = Database()
-        
-        # Initialize AI client بر اساس provider
-        if self.provider == 'groq':
-            self.client = Groq(api_key=config.GROQ_API_KEY)
-            self.model = config.GROQ_MODEL
-            print(f"✅ استفاده از Groq (رایگان) - مدل: {self.model}")
-        elif self.provider == 'claude':
-            self.client = anthropic.Anthropic(api_key=config.ANTHROPIC_API_KEY)
-            self.model = config.CLAUDE_MODEL
-            print(f"✅ استفاده از Claude (پولی) - مدل: {self.model}")
-        else:
-            raise ValueError(f"AI Provider نامعتبر: {self.provider}")
-
-    def create_system_prompt(self) -> str:
-        """ساخت system prompt"""
-        
-        # دریافت اطلاعات دسته‌بندی‌ها و برندها
-        categories = self.db.get_all_categories()
-        brands = self.db.get_all_brands()
-        
-        categories_text = "\n".join([f"- {cat['title']} (ID: {cat['id']})" for cat in categories])
-        brands_text = "\n".join([f"- {brand['name']} (ID: {brand['id']})" for brand in brands])
-        
-        return f"""شما یک دستیار هوشمند برای مدیریت فروشگاه آنلاین هستید.
+# بخش‌های ثابت system prompt؛ چون هیچ داده‌ای از دیتابیس ندارند، در Claude کش می‌شوند
+_PROMPT_HEADER = """شما یک دستیار هوشمند برای مدیریت فروشگاه آنلاین هستید.
 
 وظایف شما:
 1. درک درخواست‌های کاربر به زبان فارسی ساده
 2. استخراج اطلاعات محصول، دسته‌بندی، برند و ویژگی‌ها
 3. تولید پاسخ JSON استاندارد برای اجرای دستورات
 
-دسته‌بندی‌های موجود:
-{categories_text if categories else "هیچ دسته‌بندی موجود نیست"}
-
-برندهای موجود:
-{brands_text if brands else "هیچ برندی موجود نیست"}
+لیست دسته‌بندی‌ها و برندهای موجود در انتهای همین دستورالعمل آمده است.
 
 ساختار جدول محصولات (products):
 - name: نام محصول (اجباری)
@@ -61,100 +41,524 @@ class AIHandler:
 - weight: وزن محصول
 - weight_unit: واحد وزن (کیلوگرم یا گرم)
 
-انواع عملیات‌ها و فرمت JSON خروجی:
+"""
+
+_PROMPT_JSON_ACTIONS = """انواع عملیات‌ها و فرمت JSON خروجی:
 
 1. افزودن محصول:
-{{
+{
     "action": "add_product",
-    "data": {{
+    "data": {
         "name": "نام محصول",
         "price": 1000000,
         "sku": "SKU-001",
         "category_id": 1,
         "brand_id": 1,
         "stock": 10
-    }},
+    },
     "message": "پیام تأیید"
-}}
+}
 
 2. ویرایش محصول:
-{{
+{
     "action": "update_product",
     "product_identifier": "نام یا ID",
-    "data": {{"price": 1200000}},
+    "data": {"price": 1200000},
     "message": "پیام تأیید"
-}}
+}
 
 3. حذف محصول:
-{{
+{
     "action": "delete_product",
     "product_identifier": "نام یا ID",
     "message": "پیام تأیید"
-}}
+}
 
 4. لیست محصولات:
-{{
+{
     "action": "list_products",
     "message": "لیست محصولات"
-}}
+}
 
 5. جستجو:
-{{
+{
     "action": "search_product",
     "search_term": "کلمه کلیدی",
     "message": "جستجو"
-}}
+}
 
 6. افزودن دسته‌بندی:
-{{
+{
     "action": "add_category",
-    "data": {{"title": "نام", "slug": "slug"}},
+    "data": {"title": "نام", "slug": "slug"},
     "message": "پیام"
-}}
+}
 
 7. افزودن برند:
-{{
+{
     "action": "add_brand",
-    "data": {{"name": "نام", "slug": "slug"}},
+    "data": {"name": "نام", "slug": "slug"},
     "message": "پیام"
-}}
+}
 
 8. لیست دسته‌بندی‌ها:
-{{
+{
     "action": "list_categories",
     "message": "لیست"
-}}
+}
 
 9. لیست برندها:
-{{
+{
     "action": "list_brands",
     "message": "لیست"
-}}
+}
 
 10. جزئیات محصول:
-{{
+{
     "action": "view_product",
     "product_identifier": "نام یا ID",
     "message": "جزئیات"
-}}
+}
+
+11. تغییر گروهی قیمت یا موجودی (چند محصول با یک دستور):
+{
+    "action": "bulk_update",
+    "filters": {"category_id": 1, "brand_id": 2},
+    "changes": {"price_percent": 10},
+    "message": "افزایش ۱۰ درصدی قیمت"
+}
+- filters: category_id، brand_id، product_ids، skus؛ برای همه محصولات {"all": true}
+- changes: یکی از price، price_percent یا price_delta (منفی = کاهش) و یکی از stock یا stock_delta
+
+12. چند عملیات در یک پیام (فقط add_product، update_product، delete_product، add_category و add_brand):
+{
+    "action": "plan",
+    "steps": [
+        {"id": "b1", "action": "add_brand", "data": {"name": "ایسوس", "slug": "asus"}},
+        {"id": "p1", "action": "add_product", "data": {"name": "لپ تاپ X", "price": 1000, "sku": "LAPTOP-X", "category_id": 2, "brand_id": "$b1"}}
+    ],
+    "message": "پیام تأیید"
+}
+- هر مرحله id یکتا دارد؛ "$id" به شناسه‌ای اشاره می‌کند که مرحله قبلی ساخته است
+- اگر درخواست فقط یک عملیات است، از plan استفاده نکن
+
+"""
 
-نکات مهم:
+_PROMPT_RULES = """نکات مهم:
 - SKU را خودکار تولید کن از نام محصول
 - قیمت فقط عدد (بدون تومان)
 - slug از نام با حروف انگلیسی و خط تیره
 - در پیام‌ها از ایموجی استفاده کن
-- فقط JSON برگردان بدون هیچ توضیح اضافی
+"""
+
+# حالت json: مدل action را به صورت متن JSON برمی‌گرداند
+STATIC_SYSTEM_PROMPT = (
+    f"{_PROMPT_HEADER}{_PROMPT_JSON_ACTIONS}{_PROMPT_RULES}"
+    "- فقط JSON برگردان بدون هیچ توضیح اضافی\n"
+)
+
+# حالت tools: هر action یک ابزار با JSON schema است و آرگومان‌ها پارس شده برمی‌گردند
+TOOLS_SYSTEM_PROMPT = (
+    f"{_PROMPT_HEADER}{_PROMPT_RULES}"
+    "- برای هر درخواست دقیقاً یکی از ابزارها را فراخوانی کن\n"
+)
+
+
+# ==================== ابزارها (حالت tools) ====================
+
+_MESSAGE_PROPERTY = {"type": "string", "description": "پیام کوتاه برای کاربر با ایموجی"}
+_PRODUCT_IDENTIFIER_PROPERTY = {
+    "type": ["integer", "string"],
+    "description": "ID عددی محصول یا نام آن"
+}
+_PRODUCT_FIELDS = {
+    "name": {"type": "string", "description": "نام محصول"},
+    "price": {"type": "number", "description": "قیمت به تومان، فقط عدد"},
+    "stock": {"type": "integer", "description": "موجودی انبار"},
+    "sku": {"type": "string", "description": "کد یونیک محصول"},
+    "category_id": {"type": "integer", "description": "شناسه دسته‌بندی"},
+    "brand_id": {"type": "integer", "description": "شناسه برند"},
+    "description": {"type": "string", "description": "توضیحات"},
+    "weight": {"type": "number", "description": "وزن محصول"},
+    "weight_unit": {"type": "string", "enum": ["کیلوگرم", "گرم"]},
+}
+
+
+def _tool(name: str, description: str, properties: Dict[str, Any], required: list) -> Dict[str, Any]:
+    """تعریف یک ابزار با JSON schema آرگومان‌ها"""
+    return {
+        "name": name,
+        "description": description,
+        "parameters": {
+            "type": "object",
+            "properties": {**properties, "message": _MESSAGE_PROPERTY},
+            "required": required + ["message"],
+        },
+    }
+
+
+ACTION_TOOLS = [
+    _tool("add_product", "افزودن محصول جدید", {
+        "data": {
+            "type": "object",
+            "properties": _PRODUCT_FIELDS,
+            "required": ["name", "price", "sku", "category_id"],
+        },
+    }, ["data"]),
+    _tool("update_product", "ویرایش فیلدهای یک محصول موجود", {
+        "product_identifier": _PRODUCT_IDENTIFIER_PROPERTY,
+        "data": {"type": "object", "properties": _PRODUCT_FIELDS},
+    }, ["product_identifier", "data"]),
+    _tool("delete_product", "حذف محصول", {
+        "product_identifier": _PRODUCT_IDENTIFIER_PROPERTY,
+    }, ["product_identifier"]),
+    _tool("list_products", "نمایش لیست محصولات", {}, []),
+    _tool("search_product", "جستجوی محصولات با کلمه کلیدی", {
+        "search_term": {"type": "string", "description": "کلمه کلیدی"},
+    }, ["search_term"]),
+    _tool("view_product", "نمایش جزئیات یک محصول", {
+        "product_identifier": _PRODUCT_IDENTIFIER_PROPERTY,
+    }, ["product_identifier"]),
+    _tool("add_category", "افزودن دسته‌بندی جدید", {
+        "data": {
+            "type": "object",
+            "properties": {
+                "title": {"type": "string", "description": "نام دسته‌بندی"},
+                "slug": {"type": "string", "description": "slug انگلیسی با خط تیره"},
+                "description": {"type": "string"},
+                "parent_id": {"type": "integer", "description": "شناسه دسته‌بندی والد"},
+            },
+            "required": ["title", "slug"],
+        },
+    }, ["data"]),
+    _tool("list_categories", "نمایش لیست دسته‌بندی‌ها", {}, []),
+    _tool("add_brand", "افزودن برند جدید", {
+        "data": {
+            "type": "object",
+            "properties": {
+                "name": {"type": "string", "description": "نام برند"},
+                "slug": {"type": "string", "description": "slug انگلیسی با خط تیره"},
+            },
+            "required": ["name", "slug"],
+        },
+    }, ["data"]),
+    _tool("list_brands", "نمایش لیست برندها", {}, []),
+    _tool("bulk_update", "تغییر گروهی قیمت یا موجودی محصولات یک دسته‌بندی/برند یا لیست محصولات", {
+        "filters": {
+            "type": "object",
+            "properties": {
+                "category_id": {"type": "integer", "description": "شناسه دسته‌بندی"},
+                "brand_id": {"type": "integer", "description": "شناسه برند"},
+                "product_ids": {"type": "array", "items": {"type": "integer"}},
+                "skus": {"type": "array", "items": {"type": "string"}},
+                "all": {"type": "boolean", "description": "true = همه محصولات"},
+            },
+        },
+        "changes": {
+            "type": "object",
+            "properties": {
+                "price": {"type": "number", "description": "قیمت جدید"},
+                "price_percent": {"type": "number", "description": "درصد تغییر قیمت (منفی = کاهش، بیشتر از -100)"},
+                "price_delta": {"type": "number", "description": "مبلغ اضافه/کم شده از قیمت"},
+                "stock": {"type": "integer", "description": "موجودی جدید"},
+                "stock_delta": {"type": "integer", "description": "تغییر موجودی (منفی = کاهش)"},
+            },
+        },
+    }, ["filters", "changes"]),
+    _tool("plan", "اجرای چند عملیات افزودن/ویرایش/حذف در یک پیام؛ فقط وقتی درخواست بیش از یک عملیات دارد", {
+        "steps": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "id": {"type": "string", "description": "شناسه یکتای مرحله؛ مراحل بعد با \"$id\" به شناسه ساخته شده اشاره می‌کنند"},
+                    "action": {"type": "string", "enum": ["add_product", "update_product", "delete_product", "add_category", "add_brand"]},
+                    "product_identifier": _PRODUCT_IDENTIFIER_PROPERTY,
+                    "data": {"type": "object", "description": "مثل data همان action؛ شناسه‌ها می‌توانند \"$id\" باشند"},
+                },
+                "required": ["id", "action"],
+            },
+        },
+    }, ["steps"]),
+]
+
+# قالب هر provider برای تعریف ابزارها
+GROQ_TOOLS = [{"type": "function", "function": tool} for tool in ACTION_TOOLS]
+CLAUDE_TOOLS = [
+    {"name": tool["name"], "description": tool["description"], "input_schema": tool["parameters"]}
+    for tool in ACTION_TOOLS
+]
+
+
+# ==================== مسیر سریع (بدون LLM) ====================
+
+_SHOW_SUFFIX = r'(?: (?:رو|را))?(?: (?:نشون|نشان) (?:بده|بدید|بدین)| بده| بفرست)?'
+_LIST_PREFIX = r'(?:(?:لیست|نمایش|فهرست)(?: همه)? (?:ی )?)?'
+# عبارت جستجو: یک اسم کوتاه (حداکثر ۵ کلمه)، نه «کن» یا «برای» تنها
+_SEARCH_TERM = r'(?!(?:کن|برای)$)(?P<term>[^\s:]+(?: [^\s:]+){0,4}?)'
+
+# پیام جستجویی که این کلمات را دارد در واقع تغییر می‌خواهد (مثل «سرچ کن X و قیمتش رو زیاد کن»)؛ به LLM می‌رود
+_MUTATION_WORDS = frozenset({
+    'حذف', 'پاک', 'تغییر', 'ویرایش', 'اضافه', 'افزودن', 'زیاد', 'کم', 'بیشتر', 'کمتر',
+    'بذار', 'بزار', 'کن', 'کنید', 'بکن', 'رو', 'را',
+})
+
+
+class IntentMatcher:
+    """تشخیص قطعی درخواست‌های ساده (لیست‌ها، جستجو، شناسه محصول) بدون فراخوانی LLM"""
+
+    PATTERNS = [
+        (re.compile(rf'^{_LIST_PREFIX}(?:محصولات|کالاها){_SHOW_SUFFIX}$'), 'list_products'),
+        (re.compile(rf'^{_LIST_PREFIX}دسته[\u200c ]?بندی[\u200c ]?ها{_SHOW_SUFFIX}$'), 'list_categories'),
+        (re.compile(rf'^{_LIST_PREFIX}برند[\u200c ]?ها{_SHOW_SUFFIX}$'), 'list_brands'),
+        # «جستجوی» قبل از «جستجو»، وگرنه «ی» جزء عبارت جستجو می‌شود
+        (re.compile(rf'^(?:جستجوی|جستجو|سرچ)(?: کن)?(?: برای)?(?: ?: ?| ){_SEARCH_TERM}$'), 'search_product'),
+        (re.compile(rf'^دنبال {_SEARCH_TERM} (?:بگرد|بگردید)$'), 'search_product'),
+        (re.compile(r'^(?:(?:جزئیات|مشخصات)(?: محصول)?|محصول)? ?#?(?P<id>\d{1,10})$'), 'view_product'),
+    ]
+
+    MESSAGES = {
+        'list_products': 'لیست محصولات',
+        'list_categories': 'لیست دسته‌بندی‌ها',
+        'list_brands': 'لیست برندها',
+        'search_product': 'جستجو',
+        'view_product': 'جزئیات محصول',
+    }
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """یکسان‌سازی متن برای تطبیق با الگوها"""
+        return normalize_text(text).rstrip('.!?؟')
+
+    def match(self, text: str) -> Optional[Dict[str, Any]]:
+        """تبدیل پیام به action؛ اگر با اطمینان تشخیص داده نشود None برمی‌گرداند"""
+        normalized = self.normalize(text)
+        for pattern, action in self.PATTERNS:
+            match = pattern.match(normalized)
+            if not match:
+                continue
+            
+            if action == 'search_product' and _MUTATION_WORDS & set(match.group('term').split()):
+                continue
+            
+            action_data = {'action': action, 'message': self.MESSAGES[action]}
+            if action == 'search_product':
+                action_data['search_term'] = match.group('term').strip()
+            elif action == 'view_product':
+                action_data['product_identifier'] = int(match.group('id'))
+            
+            self.hits += 1
+            return action_data
+        
+        self.misses += 1
+        return None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """تعداد پیام‌هایی که بدون LLM پاسخ داده شدند"""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits / total) if total else 0.0,
+        }
+
+
+# ==================== چند عملیات در یک پیام ====================
+
+# action هایی که داخل plan مجازند (bulk_update تأیید جدا لازم دارد)
+PLAN_ACTIONS = {'add_product', 'update_product', 'delete_product', 'add_category', 'add_brand'}
+
+# مقدار "$<id مرحله>" با شناسه‌ای که آن مرحله ساخته جایگزین می‌شود
+_PLAN_REF_RE = re.compile(r'^\$(\w+)$')
+
+
+def _plan_refs(value: Any) -> set:
+    """id مراحلی که این مقدار (به صورت بازگشتی) به آن‌ها اشاره می‌کند"""
+    if isinstance(value, str):
+        match = _PLAN_REF_RE.match(value)
+        return {match.group(1)} if match else set()
+    if isinstance(value, dict):
+        return set().union(*(_plan_refs(item) for item in value.values()))
+    if isinstance(value, list):
+        return set().union(*(_plan_refs(item) for item in value))
+    return set()
+
+
+def _resolve_plan_refs(value: Any, created: Dict[str, int]) -> Any:
+    """کپی مقدار که به جای هر "$id" شناسه ساخته شده در آن مرحله را دارد"""
+    if isinstance(value, str):
+        match = _PLAN_REF_RE.match(value)
+        if not match:
+            return value
+        if created.get(match.group(1)) is None:
+            raise ValueError(f"مرحله {match.group(1)} شناسه‌ای نساخته است")
+        return created[match.group(1)]
+    if isinstance(value, dict):
+        return {key: _resolve_plan_refs(item, created) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_resolve_plan_refs(item, created) for item in value]
+    return value
+
+
+# ==================== کش پاسخ AI ====================
+
+# فقط خروجی این action ها کش می‌شود؛ عملیات تغییردهنده هرگز
+READ_ONLY_ACTIONS = {'list_products', 'list_categories', 'list_brands', 'search_product', 'view_product'}
+
+
+class ResponseCache:
+    """کش LRU با TTL برای action های پارس شده‌ی درخواست‌های فقط-خواندنی"""
+
+    def __init__(self, max_size: int = 256, ttl: float = 600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._items: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple[str, str]) -> Optional[Dict[str, Any]]:
+        """دریافت action از کش (کپی، تا تغییرات بعدی روی نسخه کش اثر نگذارد)"""
+        item = self._items.get(key)
+        if item is not None:
+            stored_at, action_data = item
+            if not self.ttl or time.monotonic() - stored_at < self.ttl:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return copy.deepcopy(action_data)
+            del self._items[key]
+        
+        self.misses += 1
+        return None
+
+    def put(self, key: Tuple[str, str], action_data: Dict[str, Any]):
+        """ذخیره action فقط-خواندنی در کش"""
+        if action_data.get('action') not in READ_ONLY_ACTIONS:
+            return
+        self._items[key] = (time.monotonic(), copy.deepcopy(action_data))
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """آمار hit/miss کش"""
+        total = self.hits + self.misses
+        return {
+            'size': len(self._items),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits / total) if total else 0.0,
+        }
+
+
+class AIHandler:
+    def __init__(self):
+        self.provider = config.AI_PROVIDER
+        self.mode = config.AI_SETTINGS['mode']
+        self.static_prompt = TOOLS_SYSTEM_PROMPT if self.mode == 'tools' else STATIC_SYSTEM_PROMPT
+        self.db = AsyncDatabase()
+        
+        # Initialize AI client بر اساس provider
+        if self.provider == 'groq':
+            self.client = AsyncGroq(
+                api_key=config.GROQ_API_KEY,
+                timeout=config.AI_SETTINGS['request_timeout'],
+                max_retries=config.AI_SETTINGS['max_retries']
+            )
+            self.model = config.GROQ_MODEL
+            print(f"✅ استفاده از Groq (رایگان) - مدل: {self.model}")
+        elif self.provider == 'claude':
+            self.client = anthropic.AsyncAnthropic(
+                api_key=config.ANTHROPIC_API_KEY,
+                timeout=config.AI_SETTINGS['request_timeout'],
+                max_retries=config.AI_SETTINGS['max_retries']
+            )
+            self.model = config.CLAUDE_MODEL
+            print(f"✅ استفاده از Claude (پولی) - مدل: {self.model}")
+        else:
+            raise ValueError(f"AI Provider نامعتبر: {self.provider}")
+        
+        self.intent_matcher = IntentMatcher()
+        self.response_cache = ResponseCache(
+            max_size=config.AI_SETTINGS['response_cache_size'],
+            ttl=config.AI_SETTINGS['response_cache_ttl']
+        )
+        
+        # index نام محصولات؛ در اولین جستجوی محصول با نام از دیتابیس ساخته می‌شود
+        self.product_index = TrigramIndex(normalize_text, min_score=config.PRODUCT_INDEX['min_score'])
+        self._product_index_lock = asyncio.Lock()
+        
+        # کش system prompt: (نسخه داده‌های مرجع, زمان ساخت, prompt, hash کل prompt)
+        self._prompt_cache = None
+        self.prompt_cache_hits = 0
+        self.prompt_cache_misses = 0
+        
+        # توکن‌های خوانده/نوشته شده از کش prompt در Claude
+        self.claude_cache_read_tokens = 0
+        self.claude_cache_write_tokens = 0
+
+    async def create_reference_prompt(self) -> str:
+        """دریافت بخش متغیر prompt از کش؛ فقط با تغییر دسته‌بندی/برند یا پایان TTL دوباره ساخته می‌شود"""
+        version = get_reference_version()
+        ttl = config.AI_SETTINGS['prompt_cache_ttl']
+        
+        if self._prompt_cache:
+            cached_version, created_at, prompt, _ = self._prompt_cache
+            if cached_version == version and (not ttl or time.monotonic() - created_at < ttl):
+                self.prompt_cache_hits += 1
+                return prompt
+        
+        self.prompt_cache_misses += 1
+        # نسخه قبل از خواندن دیتابیس گرفته می‌شود تا تغییر همزمان، کش کهنه نسازد
+        prompt = await self._build_reference_prompt()
+        prompt_hash = hashlib.sha1(f"{self.static_prompt}\n{prompt}".encode('utf-8')).hexdigest()
+        self._prompt_cache = (version, time.monotonic(), prompt, prompt_hash)
+        return prompt
+
+    async def _build_reference_prompt(self) -> str:
+        """ساخت بخش متغیر system prompt"""
+        
+        # دریافت اطلاعات دسته‌بندی‌ها و برندها
+        categories = await self.db.get_all_categories()
+        brands = await self.db.get_all_brands()
+        
+        categories_text = "\n".join([f"- {cat['title']} (ID: {cat['id']})" for cat in categories])
+        brands_text = "\n".join([f"- {brand['name']} (ID: {brand['id']})" for brand in brands])
+        
+        return f"""دسته‌بندی‌های موجود:
+{categories_text if categories else "هیچ دسته‌بندی موجود نیست"}
+
+برندهای موجود:
+{brands_text if brands else "هیچ برندی موجود نیست"}
 """
 
     async def process_request(self, user_message: str) -> Dict[str, Any]:
         """پردازش درخواست با AI provider انتخابی"""
+        if config.AI_SETTINGS['fast_path']:
+            action_data = self.intent_matcher.match(user_message)
+            if action_data:
+                return action_data
+        
         try:
-            system_prompt = self.create_system_prompt()
+            reference_prompt = await self.create_reference_prompt()
+            
+            # کلید کش: متن یکسان‌سازی شده + hash نسخه prompt
+            cache_key = (IntentMatcher.normalize(user_message), self._prompt_cache[3])
+            action_data = self.response_cache.get(cache_key)
+            if action_data:
+                return action_data
             
             if self.provider == 'groq':
-                return await self._process_with_groq(system_prompt, user_message)
+                system_prompt = f"{self.static_prompt}\n{reference_prompt}"
+                action_data = await self._process_with_groq(system_prompt, user_message)
             elif self.provider == 'claude':
-                return await self._process_with_claude(system_prompt, user_message)
+                action_data = await self._process_with_claude(reference_prompt, user_message)
+            
+            self.response_cache.put(cache_key, action_data)
+            return action_data
                 
         except Exception as e:
             print(f"خطا در پردازش درخواست: {e}")
@@ -166,31 +570,55 @@ class AIHandler:
     async def _process_with_groq(self, system_prompt: str, user_message: str) -> Dict[str, Any]:
         """پردازش با Groq (رایگان)"""
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
+            request = {
+                "model": self.model,
+                "messages": [
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_message}
                 ],
-                temperature=0.3,
-                max_tokens=2000
-            )
+                "temperature": 0.3,
+                "max_tokens": 2000
+            }
+            if self.mode == 'tools':
+                request.update(tools=GROQ_TOOLS, tool_choice="required")
             
-            response_text = response.choices[0].message.content
-            return self._parse_json_response(response_text)
+            response = await self._with_timeout(self.client.chat.completions.create(**request))
+            
+            response_message = response.choices[0].message
+            if response_message.tool_calls:
+                function = response_message.tool_calls[0].function
+                return self._tool_call_to_action(function.name, json.loads(function.arguments))
+            
+            return self._parse_json_response(response_message.content)
             
         except Exception as e:
             raise Exception(f"خطای Groq: {str(e)}")
 
-    async def _process_with_claude(self, system_prompt: str, user_message: str) -> Dict[str, Any]:
-        """پردازش با Claude (پولی)"""
+    async def _process_with_claude(self, reference_prompt: str, user_message: str) -> Dict[str, Any]:
+        """پردازش با Claude (پولی)؛ بخش ثابت system prompt با prompt caching ارسال می‌شود"""
         try:
-            message = self.client.messages.create(
-                model=self.model,
-                max_tokens=4000,
-                system=system_prompt,
-                messages=[{"role": "user", "content": user_message}]
-            )
+            request = {
+                "model": self.model,
+                "max_tokens": 4000,
+                "system": [
+                    {
+                        "type": "text",
+                        "text": self.static_prompt,
+                        "cache_control": {"type": "ephemeral"}
+                    },
+                    {"type": "text", "text": reference_prompt}
+                ],
+                "messages": [{"role": "user", "content": user_message}]
+            }
+            if self.mode == 'tools':
+                request.update(tools=CLAUDE_TOOLS, tool_choice={"type": "any"})
+            
+            message = await self._with_timeout(self.client.beta.prompt_caching.messages.create(**request))
+            self._log_claude_usage(message.usage)
+            
+            for block in message.content:
+                if block.type == 'tool_use':
+                    return self._tool_call_to_action(block.name, block.input)
             
             response_text = message.content[0].text
             return self._parse_json_response(response_text)
@@ -198,6 +626,29 @@ class AIHandler:
         except Exception as e:
             raise Exception(f"خطای Claude: {str(e)}")
 
+    def _tool_call_to_action(self, name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """تبدیل فراخوانی ابزار به همان ساختار action حالت json"""
+        return {"action": name, **arguments}
+
+    async def _with_timeout(self, request):
+        """سقف زمانی کل برای یک درخواست AI (شامل retry ها)؛ با پایان زمان، درخواست لغو می‌شود"""
+        timeout = config.AI_SETTINGS['total_timeout']
+        try:
+            return await asyncio.wait_for(request, timeout=timeout)
+        except asyncio.TimeoutError:
+            raise Exception(f"پاسخ AI در {timeout} ثانیه دریافت نشد")
+
+    def _log_claude_usage(self, usage):
+        """ثبت مصرف توکن Claude برای سنجش اثر prompt caching"""
+        cache_read = usage.cache_read_input_tokens or 0
+        cache_write = usage.cache_creation_input_tokens or 0
+        self.claude_cache_read_tokens += cache_read
+        self.claude_cache_write_tokens += cache_write
+        print(
+            f"📊 Claude usage - input: {usage.input_tokens}, output: {usage.output_tokens}, "
+            f"cache read: {cache_read}, cache write: {cache_write}"
+        )
+
     def _parse_json_response(self, response_text: str) -> Dict[str, Any]:
         """پارس کردن پاسخ JSON"""
         try:
@@ -230,31 +681,35 @@ class AIHandler:
                 "message": "متأسفانه نتوانستم درخواست شما را درک کنم."
             }
 
-    def execute_action(self, action_data: Dict[str, Any]) -> Dict[str, Any]:
+    async def execute_action(self, action_data: Dict[str, Any]) -> Dict[str, Any]:
         """اجرای عملیات"""
         action = action_data.get('action')
         
         try:
             if action == 'add_product':
-                return self._add_product(action_data)
+                return await self._add_product(action_data)
             elif action == 'update_product':
-                return self._update_product(action_data)
+                return await self._update_product(action_data)
             elif action == 'delete_product':
-                return self._delete_product(action_data)
+                return await self._delete_product(action_data)
             elif action == 'list_products':
-                return self._list_products(action_data)
+                return await self._list_products(action_data)
             elif action == 'search_product':
-                return self._search_product(action_data)
+                return await self._search_product(action_data)
             elif action == 'view_product':
-                return self._view_product(action_data)
+                return await self._view_product(action_data)
             elif action == 'add_category':
-                return self._add_category(action_data)
+                return await self._add_category(action_data)
             elif action == 'list_categories':
-                return self._list_categories(action_data)
+                return await self._list_categories(action_data)
             elif action == 'add_brand':
-                return self._add_brand(action_data)
+                return await self._add_brand(action_data)
             elif action == 'list_brands':
-                return self._list_brands(action_data)
+                return await self._list_brands(action_data)
+            elif action == 'bulk_update':
+                return await self._bulk_update(action_data)
+            elif action == 'plan':
+                return await self._execute_plan(action_data)
             else:
                 return {
                     'success': False,
@@ -266,54 +721,309 @@ class AIHandler:
                 'message': f'خطا: {str(e)}'
             }
 
-    def _add_product(self, action_data: Dict) -> Dict:
+    async def _add_product(self, action_data: Dict) -> Dict:
         product_data = action_data.get('data', {})
         if 'category_id' in product_data:
-            category = self.db.get_category_by_id(product_data['category_id'])
+            category = await self.db.get_category_by_id(product_data['category_id'])
             if not category:
                 return {'success': False, 'message': '❌ دسته‌بندی یافت نشد'}
+        if product_data.get('brand_id') is not None:
+            brand = await self.db.get_brand_by_id(product_data['brand_id'])
+            if not brand:
+                return {'success': False, 'message': '❌ برند یافت نشد'}
+        
+        media_ids = action_data.get('media_ids', [])
         
-        product_id = self.db.add_product(product_data)
+        # ساخت محصول (با media_pinned_id) و لینک عکس‌ها با یک commit؛ نیمه‌کاره نمی‌ماند
+        async with self.db.transaction():
+            product_id = await self.db.add_product(product_data)
+            await self.db.link_medias_to_product(media_ids, product_id)
+        self.product_index.add(product_id, product_data.get('name'), product_data.get('sku'))
+        
+        message = f"✅ {action_data.get('message', 'محصول اضافه شد')}\n🆔 ID: {product_id}"
+        if media_ids:
+            message += f"\n📸 {len(media_ids)} عکس به محصول لینک شد"
         return {
             'success': True,
-            'message': f"✅ {action_data.get('message', 'محصول اضافه شد')}\n🆔 ID: {product_id}",
+            'message': message,
             'product_id': product_id
         }
 
-    def _update_product(self, action_data: Dict) -> Dict:
+    def _plan_steps(self, steps: list) -> list:
+        """
+        بررسی مراحل plan
+
+        Returns:
+            لیست (id مرحله, مرحله) به ترتیب پیام کاربر
+
+        Raises:
+            ValueError: action غیرمجاز، id تکراری یا اشاره به مرحله‌ای که قبل از این مرحله نیست
+        """
+        ordered = []
+        seen = set()
+        for index, step in enumerate(steps):
+            step_id = str(step.get('id') or index + 1)
+            if step.get('action') not in PLAN_ACTIONS:
+                raise ValueError(f"عملیات {step.get('action')} در مرحله {step_id} مجاز نیست")
+            if step_id in seen:
+                raise ValueError(f"id مرحله تکراری است: {step_id}")
+            unknown = _plan_refs(step) - seen
+            if unknown:
+                raise ValueError(f"مرحله {step_id} به مرحله‌ای اشاره می‌کند که قبل از آن نیست: {', '.join(sorted(unknown))}")
+            seen.add(step_id)
+            ordered.append((step_id, step))
+        return ordered
+
+    async def _execute_plan(self, action_data: Dict) -> Dict:
+        """
+        اجرای چند عملیات از یک پاسخ AI در یک تراکنش (همه یا هیچ)
+
+        مراحل به ترتیب پیام کاربر پشت سر هم اجرا می‌شوند (مثلاً «X را اضافه کن و موجودی X را ۵ کن»)؛
+        کوئری‌ها روی یک اتصال هستند، پس اجرای هم‌زمان سودی ندارد. صرفه‌جویی اصلی یک فراخوانی AI به جای N است.
+        """
+        steps = action_data.get('steps') or []
+        if not steps:
+            return {'success': False, 'message': '❌ هیچ عملیاتی مشخص نشده است'}
+        if len(steps) > config.AI_SETTINGS['max_plan_steps']:
+            return {'success': False, 'message': f"❌ حداکثر {config.AI_SETTINGS['max_plan_steps']} عملیات در یک پیام ممکن است"}
+        
+        try:
+            ordered = self._plan_steps(steps)
+        except ValueError as e:
+            return {'success': False, 'message': f'❌ {e}'}
+        
+        created: Dict[str, int] = {}  # id مرحله -> شناسه محصول/دسته‌بندی/برند ساخته شده
+        messages = []
+        
+        try:
+            async with self.db.transaction():
+                for step_id, step in ordered:
+                    try:
+                        outcome = await self.execute_action(_resolve_plan_refs(step, created))
+                    except Exception as e:
+                        raise ValueError(f"مرحله {step_id}: {e}")
+                    if not outcome.get('success'):
+                        raise ValueError(f"مرحله {step_id}: {outcome.get('message')}")
+                    messages.append(outcome['message'])
+                    created[step_id] = outcome.get('product_id') or outcome.get('category_id') or outcome.get('brand_id')
+        except Exception as e:
+            # محصولاتی که در index اضافه/حذف شدند rollback شده‌اند
+            self.product_index.invalidate()
+            return {'success': False, 'message': f"{e}\n\n↩️ هیچ‌کدام از {len(steps)} عملیات ذخیره نشد"}
+        
+        message = f"✅ {action_data.get('message', f'{len(steps)} عملیات انجام شد')}\n\n"
+        message += "\n\n".join(messages)
+        return {'success': True, 'message': message}
+
+    async def _bulk_update(self, action_data: Dict) -> Dict:
+        """پیش‌نمایش تغییر گروهی؛ UPDATE فقط بعد از تأیید کاربر (apply_bulk_update) اجرا می‌شود"""
+        try:
+            count_query, update_query = compile_rule(action_data.get('filters'), action_data.get('changes'))
+        except ValueError as e:
+            return {'success': False, 'message': f'❌ {e}'}
+        
+        rows = await self.db.execute_query(*count_query, fetch=True)
+        count = rows[0]['count']
+        if not count:
+            return {'success': False, 'message': '❌ محصولی با این شرایط یافت نشد'}
+        
+        return {
+            'success': True,
+            'message': config.MESSAGES['bulk_preview'].format(
+                description=action_data.get('message', 'تغییر گروهی'), count=count
+            ),
+            'bulk_update': {'statements': [update_query], 'count': count},
+        }
+
+    async def preview_sku_updates(self, updates: Dict[str, Dict[str, Any]]) -> Dict:
+        """پیش‌نمایش فایل SKU -> قیمت/موجودی (SKU های ناموجود نادیده گرفته می‌شوند)"""
+        skus = list(updates)
+        existing = set()
+        for start in range(0, len(skus), 1000):
+            existing |= await self.db.get_existing_skus(skus[start:start + 1000])
+        if not existing:
+            return {'success': False, 'message': '❌ هیچ‌کدام از SKU های فایل در فروشگاه نیست'}
+        
+        statements = compile_sku_updates({sku: updates[sku] for sku in skus if sku in existing})
+        return {
+            'success': True,
+            'message': config.MESSAGES['bulk_preview_file'].format(
+                count=len(existing), missing=len(skus) - len(existing)
+            ),
+            'bulk_update': {'statements': statements, 'count': len(existing)},
+        }
+
+    async def apply_bulk_update(self, bulk_update: Dict[str, Any]) -> Dict:
+        """اجرای UPDATE های تأیید شده در یک تراکنش"""
+        changed = await self.db.execute_statements(bulk_update['statements'])
+        return {
+            'success': True,
+            'message': config.MESSAGES['bulk_done'].format(count=bulk_update['count'], changed=changed),
+        }
+
+    async def _get_product_index(self) -> Optional[TrigramIndex]:
+        """index نام محصولات (ساخته یا تازه شده در صورت نیاز)؛ None اگر غیرفعال باشد"""
+        settings = config.PRODUCT_INDEX
+        if not settings['enabled']:
+            return None
+        
+        def is_stale() -> bool:
+            built_at = self.product_index.built_at
+            if built_at is None:
+                return True
+            return bool(settings['refresh_interval']) and time.monotonic() - built_at > settings['refresh_interval']
+        
+        if is_stale():
+            async with self._product_index_lock:
+                if is_stale():
+                    self.product_index.build(await self.db.get_product_names())
+                    print(f"🔎 index نام محصولات ساخته شد ({self.product_index.get_stats()['size']} محصول)")
+        return self.product_index
+
+    async def _resolve_product(self, identifier) -> Optional[Dict]:
+        """پیدا کردن محصول با ID، یا با نزدیک‌ترین نام/SKU از index (غلط تایپی و ی/ي و ک/ك مهم نیست)؛ فقط برای نمایش"""
+        if isinstance(identifier, int):
+            return await self.db.get_product_by_id(identifier)
+        if not identifier:
+            return None
+        
+        index = await self._get_product_index()
+        if index is not None:
+            for product_id, _ in index.search(str(identifier), limit=1):
+                product = await self.db.get_product_by_id(product_id)
+                if product:
+                    return product
+                index.remove(product_id)  # خارج از بات حذف شده
+        
+        # محصولی که بعد از ساخت index خارج از بات اضافه شده
+        return await self.db.get_product_by_name(identifier)
+
+    async def _resolve_product_strict(self, action_data: Dict) -> Tuple[Optional[Dict], Optional[Dict]]:
+        """
+        محصول مقصد ویرایش/حذف: فقط با ID، SKU یا نام نرمال شده دقیقاً برابر
+        
+        بدون برابری دقیق، اگر index فقط یک محصول نزدیک‌تر از بقیه پیدا کند همان برای تأیید
+        کاربر پیشنهاد می‌شود (confirm_action) و تغییری انجام نمی‌شود.
+        
+        Returns:
+            (محصول, None) یا (None, نتیجه ناموفق برای کاربر)
+        """
         identifier = action_data.get('product_identifier')
+        not_found = {'success': False, 'message': '❌ محصول یافت نشد'}
+        if isinstance(identifier, int):
+            product = await self.db.get_product_by_id(identifier)
+            return (product, None) if product else (None, not_found)
+        if not identifier:
+            return None, not_found
+        identifier = str(identifier)
+        
+        index = await self._get_product_index()
+        matches = []
+        if index is not None:
+            for product_id in index.find_exact(identifier)[:2]:
+                product = await self.db.get_product_by_id(product_id)
+                if product:
+                    matches.append(product)
+                else:
+                    index.remove(product_id)  # خارج از بات حذف شده
+        if not matches:
+            # محصولی که بعد از ساخت index خارج از بات اضافه شده
+            matches = await self.db.get_products_by_exact_name(identifier)
+        if len(matches) == 1:
+            return matches[0], None
+        if matches:
+            return None, {
+                'success': False,
+                'message': config.MESSAGES['change_ambiguous_product'].format(identifier=identifier),
+            }
+        
+        if index is not None:
+            hits = index.search(identifier, limit=2)
+            # دو محصول با امتیاز برابر (مثل «آیفون 13» و «آیفون 15») یعنی منظور کاربر معلوم نیست
+            if hits and (len(hits) == 1 or hits[0][1] > hits[1][1]):
+                product = await self.db.get_product_by_id(hits[0][0])
+                if product:
+                    return None, {
+                        'success': False,
+                        'message': config.MESSAGES['change_confirm_product'].format(
+                            identifier=identifier, name=product['name'], id=product['id']
+                        ),
+                        'confirm_action': {**action_data, 'product_identifier': product['id']},
+                    }
+        return None, not_found
+
+    async def _update_product(self, action_data: Dict) -> Dict:
         product_data = action_data.get('data', {})
         
-        product = self.db.get_product_by_id(identifier) if isinstance(identifier, int) else self.db.get_product_by_name(identifier)
+        product, failure = await self._resolve_product_strict(action_data)
         if not product:
-            return {'success': False, 'message': '❌ محصول یافت نشد'}
+            return failure
         
-        self.db.update_product(product['id'], product_data)
+        await self.db.update_product(product['id'], product_data)
+        if 'name' in product_data or 'sku' in product_data:
+            self.product_index.add(
+                product['id'],
+                product_data.get('name', product['name']),
+                product_data.get('sku', product['sku'])
+            )
         return {'success': True, 'message': f"✅ {action_data.get('message', 'محصول ویرایش شد')}"}
 
-    def _delete_product(self, action_data: Dict) -> Dict:
-        identifier = action_data.get('product_identifier')
-        product = self.db.get_product_by_id(identifier) if isinstance(identifier, int) else self.db.get_product_by_name(identifier)
+    async def _delete_product(self, action_data: Dict) -> Dict:
+        product, failure = await self._resolve_product_strict(action_data)
         if not product:
-            return {'success': False, 'message': '❌ محصول یافت نشد'}
+            return failure
         
-        self.db.delete_product(product['id'])
+        await self.db.delete_product(product['id'])
+        self.product_index.remove(product['id'])
         return {'success': True, 'message': f"✅ محصول '{product['name']}' حذف شد"}
 
-    def _list_products(self, action_data: Dict) -> Dict:
-        products = self.db.get_all_products(limit=50)
+    async def _list_products(self, action_data: Dict) -> Dict:
+        products = await self.db.get_all_products(limit=50)
         if not products:
             return {'success': True, 'message': '📋 محصولی یافت نشد'}
         
-        message = "📋 لیست محصولات:\n\n"
-        for idx, p in enumerate(products, 1):
+        message = "📋 لیست محصولات:\n\n" + self._format_products(products)
+        return {'success': True, 'message': message}
+
+    def _format_products(self, products: list, start: int = 1) -> str:
+        """متن لیست محصولات با شماره ردیف از start"""
+        message = ""
+        for idx, p in enumerate(products, start):
             message += f"{idx}. {'✅' if p['is_active'] else '❌'} {p['name']}\n"
             message += f"   💰 {p['price']:,} تومان | 📦 {p['stock']}\n\n"
-        return {'success': True, 'message': message}
+        return message
+
+    async def list_products_page(self, page: int = 1, cursor: Optional[tuple] = None,
+                                 direction: str = 'next') -> Dict[str, Any]:
+        """
+        یک صفحه از لیست محصولات برای /products (keyset pagination)
+        
+        Returns:
+            dict با message، products، page، has_prev و has_next
+        """
+        page_size = config.BOT_SETTINGS['products_page_size']
+        result = await self.db.get_products_page(page_size, cursor, direction)
+        products = result['products']
+        
+        if direction == 'prev' and cursor is not None:
+            has_prev, has_next = result['has_more'], True
+            if not has_prev:
+                page = 1  # محصولات جدید اضافه شده باشند هم به صفحه اول رسیده‌ایم
+        else:
+            has_prev, has_next = cursor is not None, result['has_more']
+        
+        if not products:
+            return {'message': '📋 محصولی یافت نشد', 'products': [], 'page': page,
+                    'has_prev': has_prev, 'has_next': False}
+        
+        message = f"📋 لیست محصولات (صفحه {page}):\n\n"
+        message += self._format_products(products, start=(page - 1) * page_size + 1)
+        return {'message': message, 'products': products, 'page': page,
+                'has_prev': has_prev, 'has_next': has_next}
 
-    def _search_product(self, action_data: Dict) -> Dict:
+    async def _search_product(self, action_data: Dict) -> Dict:
         term = action_data.get('search_term', '')
-        products = self.db.search_products(term)
+        products = await self.db.search_products(term)
         if not products:
             return {'success': True, 'message': f'🔍 نتیجه‌ای برای "{term}" یافت نشد'}
         
@@ -322,9 +1032,9 @@ class AIHandler:
             message += f"{idx}. {p['name']}\n   💰 {p['price']:,} تومان\n\n"
         return {'success': True, 'message': message}
 
-    def _view_product(self, action_data: Dict) -> Dict:
+    async def _view_product(self, action_data: Dict) -> Dict:
         identifier = action_data.get('product_identifier')
-        product = self.db.get_product_by_id(identifier) if isinstance(identifier, int) else self.db.get_product_by_name(identifier)
+        product = await self._resolve_product(identifier)
         if not product:
             return {'success': False, 'message': '❌ محصول یافت نشد'}
         
@@ -334,12 +1044,21 @@ class AIHandler:
         message += f"🆔 {product['sku']}\n"
         return {'success': True, 'message': message}
 
-    def _add_category(self, action_data: Dict) -> Dict:
-        category_id = self.db.add_category(action_data.get('data', {}))
-        return {'success': True, 'message': f"✅ دسته‌بندی اضافه شد\n🆔 ID: {category_id}", 'category_id': category_id}
+    async def _add_category(self, action_data: Dict) -> Dict:
+        media_id = action_data.get('category_media_id')
+        
+        async with self.db.transaction():
+            category_id = await self.db.add_category(action_data.get('data', {}))
+            if media_id:
+                await self.db.link_media_to_category(media_id, category_id)
+        
+        message = f"✅ دسته‌بندی اضافه شد\n🆔 ID: {category_id}"
+        if media_id:
+            message += "\n📸 عکس به دسته‌بندی لینک شد"
+        return {'success': True, 'message': message, 'category_id': category_id}
 
-    def _list_categories(self, action_data: Dict) -> Dict:
-        categories = self.db.get_all_categories()
+    async def _list_categories(self, action_data: Dict) -> Dict:
+        categories = await self.db.get_all_categories()
         if not categories:
             return {'success': True, 'message': '📋 دسته‌بندی یافت نشد'}
         
@@ -348,12 +1067,12 @@ class AIHandler:
             message += f"{idx}. {'✅' if c['is_active'] else '❌'} {c['title']}\n"
         return {'success': True, 'message': message}
 
-    def _add_brand(self, action_data: Dict) -> Dict:
-        brand_id = self.db.add_brand(action_data.get('data', {}))
-        return {'success': True, 'message': f"✅ برند اضافه شد\n🆔 ID: {brand_id}"}
+    async def _add_brand(self, action_data: Dict) -> Dict:
+        brand_id = await self.db.add_brand(action_data.get('data', {}))
+        return {'success': True, 'message': f"✅ برند اضافه شد\n🆔 ID: {brand_id}", 'brand_id': brand_id}
 
-    def _list_brands(self, action_data: Dict) -> Dict:
-        brands = self.db.get_all_brands()
+    async def _list_brands(self, action_data: Dict) -> Dict:
+        brands = await self.db.get_all_brands()
         if not brands:
             return {'success': True, 'message': '📋 برندی یافت نشد'}
         
@@ -0,0 +1,726 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+import aiomysql
+from pymysql import Error
+from typing import Optional, List, Dict, Any, AsyncIterator, Tuple
+import config
+from database import (
+    MEDIA_DEFAULTS, MEDIA_INSERT_QUERY, PRODUCT_DEFAULTS, PRODUCT_EXPORT_QUERY, PRODUCT_INSERT_QUERY, PRODUCT_LIST_QUERY,
+    REFERENCE_TABLES,
+    ReferenceTable, bump_reference_version, get_reference_cache, get_reference_version,
+    serialize_media_variants, with_normalized_name,
+)
+from text_normalizer import normalize as normalize_text
+
+
+class AsyncConnectionPool:
+    """Pool اتصال‌های async روی aiomysql با health-check هنگام تحویل و متریک زمان انتظار"""
+
+    def __init__(self, db_config: Dict[str, Any], min_size: int = 2, max_size: int = 10,
+                 timeout: float = 5.0, health_check: bool = True):
+        self.db_config = db_config
+        self.min_size = min_size
+        self.max_size = max(max_size, min_size, 1)
+        self.timeout = timeout
+        self.health_check = health_check
+        self._pool = None
+        self._init_lock = asyncio.Lock()
+
+        # متریک‌ها
+        self._checkouts = 0
+        self._timeouts = 0
+        self._reconnects = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    async def _get_pool(self):
+        """ساخت تنبل pool داخل event loop در حال اجرا"""
+        if self._pool is None:
+            async with self._init_lock:
+                if self._pool is None:
+                    self._pool = await aiomysql.create_pool(
+                        host=self.db_config['host'],
+                        port=self.db_config['port'],
+                        db=self.db_config['database'],
+                        user=self.db_config['user'],
+                        password=self.db_config['password'],
+                        charset=self.db_config.get('charset', 'utf8mb4'),
+                        minsize=self.min_size,
+                        maxsize=self.max_size,
+                        # aiomysql اتصالی را که داخل تراکنش برگردد می‌بندد؛
+                        # پس کوئری‌های عادی autocommit هستند و تراکنش‌ها صریح شروع می‌شوند
+                        autocommit=True,
+                    )
+                    print(f"Pool async دیتابیس MySQL آماده شد ({self.min_size}-{self.max_size} اتصال).")
+        return self._pool
+
+    async def acquire(self):
+        """گرفتن یک اتصال از pool (در صورت پر بودن، تا timeout صبر می‌کند)"""
+        pool = await self._get_pool()
+
+        start = time.perf_counter()
+        try:
+            connection = await asyncio.wait_for(pool.acquire(), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self._timeouts += 1
+            raise Error(f"هیچ اتصال آزادی در {self.timeout} ثانیه پیدا نشد")
+
+        wait = time.perf_counter() - start
+        self._checkouts += 1
+        self._total_wait += wait
+        self._max_wait = max(self._max_wait, wait)
+
+        if self.health_check:
+            try:
+                await connection.ping(reconnect=False)
+            except Exception as e:
+                print(f"⚠️ اتصال دیتابیس قطع شده بود، اتصال دوباره برقرار می‌شود: {e}")
+                self._reconnects += 1
+                try:
+                    await connection.ping(reconnect=True)
+                except Exception:
+                    pool.release(connection)
+                    raise
+        return connection
+
+    def release(self, connection):
+        """برگرداندن اتصال به pool"""
+        if self._pool is not None:
+            self._pool.release(connection)
+
+    @asynccontextmanager
+    async def connection(self):
+        """context manager برای گرفتن و برگرداندن اتصال"""
+        connection = await self.acquire()
+        try:
+            yield connection
+        finally:
+            self.release(connection)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """متریک‌های pool (زمان انتظار بر حسب میلی‌ثانیه)"""
+        size = self._pool.size if self._pool else 0
+        idle = self._pool.freesize if self._pool else 0
+        return {
+            'size': size,
+            'idle': idle,
+            'in_use': size - idle,
+            'max_size': self.max_size,
+            'checkouts': self._checkouts,
+            'timeouts': self._timeouts,
+            'reconnects': self._reconnects,
+            'avg_wait_ms': (self._total_wait / self._checkouts * 1000) if self._checkouts else 0.0,
+            'max_wait_ms': self._max_wait * 1000,
+        }
+
+    async def close(self):
+        """بستن تمام اتصال‌های pool"""
+        if self._pool is not None:
+            self._pool.close()
+            await self._pool.wait_closed()
+            self._pool = None
+            print("Pool async دیتابیس بسته شد.")
+
+
+# pool مشترک بین تمام هندلرها
+_shared_pool: Optional[AsyncConnectionPool] = None
+
+
+def get_async_pool() -> AsyncConnectionPool:
+    """دریافت (یا ساخت) pool مشترک async؛ اتصال‌ها در اولین استفاده باز می‌شوند"""
+    global _shared_pool
+    if _shared_pool is None:
+        _shared_pool = AsyncConnectionPool(config.DB_CONFIG, **config.DB_POOL_CONFIG)
+    return _shared_pool
+
+
+async def close_async_pool():
+    """بستن pool مشترک async (هنگام خاموش شدن بات)"""
+    global _shared_pool
+    if _shared_pool is not None:
+        await _shared_pool.close()
+        _shared_pool = None
+
+
+# خطای MySQL وقتی index FULLTEXT متناظر با MATCH وجود ندارد (migration 003/007 اجرا نشده)
+FULLTEXT_INDEX_MISSING = 1191
+
+# با نبود index، بقیه جستجوها مستقیم با LIKE انجام می‌شوند
+_fulltext_search = True
+
+
+# اتصال تراکنش جاری task (هر هندلر تلگرام task جدای خودش را دارد)
+_transaction_connection: ContextVar = ContextVar('transaction_connection', default=None)
+
+
+class AsyncDatabase:
+    """دسترسی async به دیتابیس داخل event loop بات (متدهای import، export، رسانه‌ها و ... فقط اینجا هستند)"""
+
+    def __init__(self, pool: Optional[AsyncConnectionPool] = None):
+        self.pool = pool or get_async_pool()
+
+    @asynccontextmanager
+    async def transaction(self):
+        """
+        اجرای چند کوئری با یک commit؛ با خطا همه rollback می‌شوند
+
+        تمام کوئری‌های AsyncDatabase (از هر نمونه‌ای) داخل این بلوک روی همین اتصال اجرا می‌شوند.
+        تراکنش تو در تو به تراکنش بیرونی می‌پیوندد.
+        """
+        if _transaction_connection.get() is not None:
+            yield self
+            return
+
+        version = get_reference_version()
+        async with self.pool.connection() as connection:
+            await connection.begin()
+            token = _transaction_connection.set(connection)
+            try:
+                yield self
+                await connection.commit()
+            except BaseException:
+                await connection.rollback()
+                raise
+            finally:
+                _transaction_connection.reset(token)
+                # تغییر دسته‌بندی/برند داخل تراکنش قبل از commit نسخه را زیاد کرده؛
+                # کشی که در این فاصله از داده‌های قدیمی ساخته شده باطل می‌شود
+                if get_reference_version() != version:
+                    bump_reference_version()
+
+    @asynccontextmanager
+    async def _connection(self):
+        """اتصال تراکنش جاری، یا یک اتصال از pool"""
+        connection = _transaction_connection.get()
+        if connection is not None:
+            yield connection
+        else:
+            async with self.pool.connection() as connection:
+                yield connection
+
+    async def _reference(self, table: str) -> ReferenceTable:
+        """جدول مرجع از کش، یا بارگذاری از دیتابیس"""
+        cache = get_reference_cache()
+        cached = cache.get(table)
+        if cached is not None:
+            return cached
+
+        query, name_field = REFERENCE_TABLES[table]
+        version = get_reference_version()
+        reference = ReferenceTable(await self.execute_query(query, fetch=True), name_field, version)
+        # داخل تراکنش ردیف‌های commit نشده هم دیده می‌شوند؛ کش نمی‌شوند
+        if _transaction_connection.get() is None:
+            cache.store(table, reference)
+        return reference
+
+    async def execute_query(self, query: str, params: tuple = None, fetch: bool = False):
+        """اجرای کوئری"""
+        async with self._connection() as connection:
+            async with connection.cursor(aiomysql.DictCursor) as cursor:
+                try:
+                    await cursor.execute(query, params or ())
+                    if fetch:
+                        return await cursor.fetchall()
+                    return cursor.lastrowid
+                except Error as e:
+                    print(f"خطا در اجرای کوئری: {e}")
+                    raise
+
+    async def execute_many(self, query: str, params_list: List[Any]) -> int:
+        """اجرای یک کوئری برای چند دسته پارامتر در یک تراکنش؛ تعداد ردیف‌های تغییر کرده برگردانده می‌شود"""
+        if not params_list:
+            return 0
+
+        async with self.transaction(), self._connection() as connection:
+            async with connection.cursor() as cursor:
+                try:
+                    await cursor.executemany(query, params_list)
+                    return cursor.rowcount
+                except Error as e:
+                    print(f"خطا در اجرای کوئری: {e}")
+                    raise
+
+    async def execute_statements(self, statements: List[Tuple[str, tuple]]) -> int:
+        """اجرای چند کوئری (مثلاً UPDATE های گروهی) در یک تراکنش؛ مجموع ردیف‌های تغییر کرده برگردانده می‌شود"""
+        rowcount = 0
+        async with self.transaction(), self._connection() as connection:
+            async with connection.cursor() as cursor:
+                try:
+                    for query, params in statements:
+                        await cursor.execute(query, params)
+                        rowcount += cursor.rowcount
+                except Error as e:
+                    print(f"خطا در اجرای کوئری: {e}")
+                    raise
+        return rowcount
+
+    async def _find_by_normalized_name(self, query: str, column: str, name: str) -> Optional[Dict]:
+        """
+        اولین ردیف با نام نرمال شده برابر (با index)؛ در غیر این صورت شامل نام (LIKE)
+
+        query جای شرط WHERE را با {} خالی می‌گذارد. LIKE روی ستون اصلی هم انجام می‌شود
+        چون ردیف‌هایی که خارج از بات ساخته شده‌اند ستون نرمال شده ندارند.
+        """
+        normalized = normalize_text(name)
+        if not normalized:
+            return None
+        result = await self.execute_query(query.format(f"{column}_normalized = %s"), (normalized,), fetch=True)
+        if not result:
+            condition = f"({column}_normalized LIKE %s OR {column} LIKE %s)"
+            result = await self.execute_query(query.format(condition), (f'%{normalized}%', f'%{name}%'), fetch=True)
+        return result[0] if result else None
+
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """متریک‌های pool اتصال"""
+        return self.pool.get_stats()
+
+    # ==================== محصولات ====================
+
+    async def add_product(self, product_data: Dict[str, Any]) -> int:
+        """افزودن محصول جدید"""
+        product_data = with_normalized_name({**PRODUCT_DEFAULTS, **product_data}, 'name', 'name_normalized')
+        return await self.execute_query(PRODUCT_INSERT_QUERY, product_data)
+
+    async def add_products(self, products: List[Dict[str, Any]]) -> int:
+        """افزودن چند محصول با یک executemany (یک INSERT چند ردیفی) و یک commit؛ تعداد ردیف‌ها برگردانده می‌شود"""
+        rows = [
+            with_normalized_name({**PRODUCT_DEFAULTS, **product_data}, 'name', 'name_normalized')
+            for product_data in products
+        ]
+        return await self.execute_many(PRODUCT_INSERT_QUERY, rows)
+
+    async def get_existing_skus(self, skus: List[str]) -> set:
+        """SKU هایی از لیست که در دیتابیس وجود دارند"""
+        if not skus:
+            return set()
+        placeholders = ", ".join(["%s"] * len(skus))
+        query = f"SELECT sku FROM products WHERE sku IN ({placeholders})"
+        rows = await self.execute_query(query, tuple(skus), fetch=True)
+        return {row['sku'] for row in rows}
+
+    async def update_product(self, product_id: int, product_data: Dict[str, Any]) -> bool:
+        """ویرایش محصول"""
+        product_data = with_normalized_name(product_data, 'name', 'name_normalized')
+        set_clause = ", ".join([f"{key} = %({key})s" for key in product_data.keys()])
+        query = f"UPDATE products SET {set_clause} WHERE id = %(id)s"
+
+        product_data['id'] = product_id
+        await self.execute_query(query, product_data)
+        return True
+
+    async def get_product_by_id(self, product_id: int) -> Optional[Dict]:
+        """دریافت محصول با ID"""
+        query = """
+        SELECT p.*, c.title as category_name, b.name as brand_name
+        FROM products p
+        LEFT JOIN categories c ON p.category_id = c.id
+        LEFT JOIN brands b ON p.brand_id = b.id
+        WHERE p.id = %s
+        """
+        result = await self.execute_query(query, (product_id,), fetch=True)
+        return result[0] if result else None
+
+    async def get_product_by_name(self, name: str) -> Optional[Dict]:
+        """جستجوی محصول با نام"""
+        query = """
+        SELECT p.*, c.title as category_name, b.name as brand_name
+        FROM products p
+        LEFT JOIN categories c ON p.category_id = c.id
+        LEFT JOIN brands b ON p.brand_id = b.id
+        WHERE {}
+        """
+        return await self._find_by_normalized_name(query, 'p.name', name)
+
+    async def get_products_by_exact_name(self, identifier: str, limit: int = 2) -> List[Dict]:
+        """محصولاتی که SKU یا نام (نرمال شده) آن‌ها دقیقاً برابر است؛ بدون LIKE، برای ویرایش و حذف"""
+        normalized = normalize_text(identifier)
+        if not normalized:
+            return []
+        query = """
+        SELECT p.*, c.title as category_name, b.name as brand_name
+        FROM products p
+        LEFT JOIN categories c ON p.category_id = c.id
+        LEFT JOIN brands b ON p.brand_id = b.id
+        WHERE p.sku = %s OR p.name_normalized = %s OR p.name = %s
+        LIMIT %s
+        """
+        return await self.execute_query(query, (identifier.strip(), normalized, identifier.strip(), limit), fetch=True)
+
+    async def get_product_names(self) -> List[Dict]:
+        """شناسه، نام و SKU تمام محصولات (برای ساخت index نام محصولات)"""
+        query = "SELECT id, name, sku FROM products"
+        return await self.execute_query(query, fetch=True)
+
+    async def get_all_products(self, limit: int = 50) -> List[Dict]:
+        """دریافت لیست محصولات"""
+        return await self.execute_query(PRODUCT_LIST_QUERY, (limit,), fetch=True)
+
+    async def iter_products_export(self, batch_size: int = 1000) -> AsyncIterator[List[Dict]]:
+        """
+        تمام محصولات (با دسته‌بندی، برند و آدرس عکس‌ها) دسته به دسته برای /export
+
+        cursor سمت سرور (SSDictCursor) ردیف‌ها را از روی شبکه می‌خواند، نه کل نتیجه را در حافظه؛
+        تا پایان خواندن اتصال اشغال است، پس روی اتصالی جدا از تراکنش جاری اجرا می‌شود.
+        """
+        async with self.pool.connection() as connection:
+            async with connection.cursor(aiomysql.SSDictCursor) as cursor:
+                # سقف پیش‌فرض GROUP_CONCAT (1024 بایت) برای آدرس چند عکس کافی نیست
+                await cursor.execute("SET SESSION group_concat_max_len = 65535")
+                await cursor.execute(PRODUCT_EXPORT_QUERY)
+                while True:
+                    rows = await cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yield rows
+
+    async def get_products_page(self, limit: int = 20, cursor: Optional[tuple] = None,
+                                direction: str = 'next') -> Dict[str, Any]:
+        """
+        یک صفحه از محصولات (جدیدترین اول) با keyset pagination روی (created_at, id)
+
+        Args:
+            limit: تعداد محصول در صفحه
+            cursor: (created_at, id) آخرین محصول صفحه فعلی برای next، یا اولینش برای prev
+            direction: next = محصولات قدیمی‌تر از cursor، prev = جدیدتر از cursor
+
+        Returns:
+            dict با products (به ترتیب نمایش) و has_more (صفحه دیگری در همین جهت هست)
+        """
+        if cursor is None:
+            condition, params, order = "", (), "DESC"
+        elif direction == 'next':
+            condition = "WHERE p.created_at < %s OR (p.created_at = %s AND p.id < %s)"
+            params, order = (cursor[0], cursor[0], cursor[1]), "DESC"
+        else:
+            condition = "WHERE p.created_at > %s OR (p.created_at = %s AND p.id > %s)"
+            params, order = (cursor[0], cursor[0], cursor[1]), "ASC"
+
+        # هزینه هر صفحه یک range scan روی index (created_at, id) است، نه OFFSET
+        query = f"""
+        SELECT p.id, p.name, p.price, p.stock, p.is_active, p.created_at
+        FROM products p
+        {condition}
+        ORDER BY p.created_at {order}, p.id {order}
+        LIMIT %s
+        """
+        rows = await self.execute_query(query, (*params, limit + 1), fetch=True)
+
+        has_more = len(rows) > limit
+        rows = list(rows[:limit])
+        if order == "ASC":
+            rows.reverse()
+        return {'products': rows, 'has_more': has_more}
+
+    async def delete_product(self, product_id: int) -> bool:
+        """حذف محصول"""
+        query = "DELETE FROM products WHERE id = %s"
+        await self.execute_query(query, (product_id,))
+        return True
+
+    # ==================== دسته‌بندی‌ها ====================
+
+    async def add_category(self, category_data: Dict[str, Any]) -> int:
+        """افزودن دسته‌بندی جدید"""
+        query = """
+        INSERT INTO categories (
+            title, title_normalized, slug, description, parent_id, level,
+            discount, display_order, is_active
+        ) VALUES (
+            %(title)s, %(title_normalized)s, %(slug)s, %(description)s, %(parent_id)s, %(level)s,
+            %(discount)s, %(display_order)s, %(is_active)s
+        )
+        """
+
+        defaults = {
+            'description': None,
+            'parent_id': None,
+            'level': 0,
+            'discount': None,
+            'display_order': 0,
+            'is_active': 1
+        }
+
+        category_data = with_normalized_name({**defaults, **category_data}, 'title', 'title_normalized')
+        category_id = await self.execute_query(query, category_data)
+        bump_reference_version()
+        return category_id
+
+    async def get_category_by_name(self, title: str) -> Optional[Dict]:
+        """جستجوی دسته‌بندی با نام (از کش داده‌های مرجع)"""
+        category = (await self._reference('categories')).find_by_name(title)
+        return dict(category) if category else None
+
+    async def get_category_by_id(self, category_id: int) -> Optional[Dict]:
+        """دریافت دسته‌بندی با ID (از کش داده‌های مرجع)"""
+        category = (await self._reference('categories')).find_by_id(category_id)
+        return dict(category) if category else None
+
+    async def get_all_categories(self) -> List[Dict]:
+        """دریافت لیست تمام دسته‌بندی‌ها (از کش داده‌های مرجع)"""
+        return [dict(category) for category in (await self._reference('categories')).rows]
+
+    async def update_category(self, category_id: int, category_data: Dict[str, Any]) -> bool:
+        """ویرایش دسته‌بندی"""
+        category_data = with_normalized_name(category_data, 'title', 'title_normalized')
+        set_clause = ", ".join([f"{key} = %({key})s" for key in category_data.keys()])
+        query = f"UPDATE categories SET {set_clause} WHERE id = %(id)s"
+
+        category_data['id'] = category_id
+        await self.execute_query(query, category_data)
+        bump_reference_version()
+        return True
+
+    async def delete_category(self, category_id: int) -> bool:
+        """حذف دسته‌بندی"""
+        query = "DELETE FROM categories WHERE id = %s"
+        await self.execute_query(query, (category_id,))
+        bump_reference_version()
+        return True
+
+    # ==================== برندها ====================
+
+    async def add_brand(self, brand_data: Dict[str, Any]) -> int:
+        """افزودن برند جدید"""
+        query = """
+        INSERT INTO brands (name, name_normalized, slug, logo, is_active)
+        VALUES (%(name)s, %(name_normalized)s, %(slug)s, %(logo)s, %(is_active)s)
+        """
+
+        defaults = {
+            'logo': '',
+            'is_active': 1
+        }
+
+        brand_data = with_normalized_name({**defaults, **brand_data}, 'name', 'name_normalized')
+        brand_id = await self.execute_query(query, brand_data)
+        bump_reference_version()
+        return brand_id
+
+    async def get_brand_by_name(self, name: str) -> Optional[Dict]:
+        """جستجوی برند با نام (از کش داده‌های مرجع)"""
+        brand = (await self._reference('brands')).find_by_name(name)
+        return dict(brand) if brand else None
+
+    async def get_brand_by_id(self, brand_id: int) -> Optional[Dict]:
+        """دریافت برند با ID (از کش داده‌های مرجع)"""
+        brand = (await self._reference('brands')).find_by_id(brand_id)
+        return dict(brand) if brand else None
+
+    async def get_all_brands(self) -> List[Dict]:
+        """دریافت لیست تمام برندها (از کش داده‌های مرجع)"""
+        return [dict(brand) for brand in (await self._reference('brands')).rows]
+
+    async def update_brand(self, brand_id: int, brand_data: Dict[str, Any]) -> bool:
+        """ویرایش برند"""
+        brand_data = with_normalized_name(brand_data, 'name', 'name_normalized')
+        set_clause = ", ".join([f"{key} = %({key})s" for key in brand_data.keys()])
+        query = f"UPDATE brands SET {set_clause} WHERE id = %(id)s"
+
+        brand_data['id'] = brand_id
+        await self.execute_query(query, brand_data)
+        bump_reference_version()
+        return True
+
+    async def delete_brand(self, brand_id: int) -> bool:
+        """حذف برند"""
+        query = "DELETE FROM brands WHERE id = %s"
+        await self.execute_query(query, (brand_id,))
+        bump_reference_version()
+        return True
+
+    # ==================== ویژگی‌ها ====================
+
+    async def add_attribute(self, attribute_data: Dict[str, Any]) -> int:
+        """افزودن ویژگی جدید"""
+        query = """
+        INSERT INTO attributes (
+            name, slug, type, is_public, is_variant,
+            group_id, display_order, is_active
+        ) VALUES (
+            %(name)s, %(slug)s, %(type)s, %(is_public)s, %(is_variant)s,
+            %(group_id)s, %(display_order)s, %(is_active)s
+        )
+        """
+
+        defaults = {
+            'type': 'text',
+            'is_public': 0,
+            'is_variant': 0,
+            'group_id': None,
+            'display_order': 0,
+            'is_active': 1
+        }
+
+        attribute_data = {**defaults, **attribute_data}
+        return await self.execute_query(query, attribute_data)
+
+    async def get_all_attributes(self) -> List[Dict]:
+        """دریافت لیست تمام ویژگی‌ها"""
+        query = """
+        SELECT a.*, ag.name as group_name
+        FROM attributes a
+        LEFT JOIN attribute_groups ag ON a.group_id = ag.id
+        ORDER BY a.display_order
+        """
+        return await self.execute_query(query, fetch=True)
+
+    # ==================== راهنمای محصول ====================
+
+    async def add_helper(self, helper_data: Dict[str, Any]) -> int:
+        """افزودن راهنمای محصول"""
+        query = """
+        INSERT INTO helpers (title, description, image, product_id)
+        VALUES (%(title)s, %(description)s, %(image)s, %(product_id)s)
+        """
+
+        defaults = {
+            'image': None
+        }
+
+        helper_data = {**defaults, **helper_data}
+        return await self.execute_query(query, helper_data)
+
+    async def get_helper_by_product(self, product_id: int) -> Optional[Dict]:
+        """دریافت راهنمای محصول"""
+        query = "SELECT * FROM helpers WHERE product_id = %s"
+        result = await self.execute_query(query, (product_id,), fetch=True)
+        return result[0] if result else None
+
+    # ==================== رسانه‌ها ====================
+
+    async def add_media(self, media_data: Dict[str, Any]) -> int:
+        """افزودن رسانه (تصویر/ویدیو)"""
+        media_data = serialize_media_variants({**MEDIA_DEFAULTS, **media_data})
+        return await self.execute_query(MEDIA_INSERT_QUERY, media_data)
+
+    async def add_medias(self, medias: List[Dict[str, Any]]) -> List[int]:
+        """افزودن گروهی رسانه‌ها با یک INSERT چند ردیفی؛ شناسه‌ها به ترتیب ورودی برگردانده می‌شوند"""
+        if not medias:
+            return []
+
+        medias = [serialize_media_variants({**MEDIA_DEFAULTS, **media}) for media in medias]
+        urls = [media['url'] for media in medias]
+
+        async with self.transaction(), self._connection() as connection:
+            async with connection.cursor(aiomysql.DictCursor) as cursor:
+                try:
+                    await cursor.executemany(MEDIA_INSERT_QUERY, medias)
+                    # شناسه‌های auto-increment همیشه پشت سر هم نیستند و url هم (با حذف تکراری‌ها) یونیک نیست؛
+                    # ردیف‌های این INSERT از اولین شناسه به بعد، به ترتیب id خوانده می‌شوند
+                    first_id = cursor.lastrowid
+                    placeholders = ", ".join(["%s"] * len(urls))
+                    await cursor.execute(
+                        f"SELECT id, url FROM medias WHERE id >= %s AND url IN ({placeholders}) ORDER BY id",
+                        [first_id, *urls]
+                    )
+                    ids_by_url = {}
+                    for row in await cursor.fetchall():
+                        ids_by_url.setdefault(row['url'], []).append(row['id'])
+                except Error as e:
+                    print(f"خطا در اجرای کوئری: {e}")
+                    raise
+
+        return [ids_by_url[url].pop(0) for url in urls]
+
+    async def link_medias_to_product(self, media_ids: List[int], product_id: int):
+        """لینک چند رسانه به محصول با یک UPDATE"""
+        if not media_ids:
+            return
+        placeholders = ", ".join(["%s"] * len(media_ids))
+        query = f"UPDATE medias SET product_id = %s WHERE id IN ({placeholders})"
+        await self.execute_query(query, (product_id, *media_ids))
+
+    async def link_media_to_category(self, media_id: int, category_id: int):
+        """لینک رسانه به دسته‌بندی"""
+        query = "UPDATE medias SET category_id = %s WHERE id = %s"
+        await self.execute_query(query, (category_id, media_id))
+
+    async def get_media_by_hash(self, content_hash: str) -> Optional[Dict]:
+        """پیدا کردن رسانه با hash محتوای فایل (SHA-256)"""
+        query = "SELECT * FROM medias WHERE content_hash = %s ORDER BY id LIMIT 1"
+        result = await self.execute_query(query, (content_hash,), fetch=True)
+        return result[0] if result else None
+
+    async def get_unlinked_media_by_hash(self, content_hash: str, telegram_user_id: int) -> Optional[Dict]:
+        """رسانه‌ی لینک نشده‌ی همین کاربر تلگرام با همین hash (برای استفاده دوباره از همان ردیف)"""
+        query = """
+        SELECT * FROM medias
+        WHERE content_hash = %s AND telegram_user_id = %s AND product_id IS NULL AND category_id IS NULL
+        ORDER BY id DESC
+        LIMIT 1
+        """
+        result = await self.execute_query(query, (content_hash, telegram_user_id), fetch=True)
+        return result[0] if result else None
+
+    async def get_media_by_phash(self, phash: int, max_distance: int) -> Optional[Dict]:
+        """پیدا کردن نزدیک‌ترین رسانه با hash ادراکی (فاصله Hamming حداکثر max_distance بیت)"""
+        query = """
+        SELECT *, BIT_COUNT(phash ^ %s) AS distance
+        FROM medias
+        WHERE phash IS NOT NULL
+        HAVING distance <= %s
+        ORDER BY distance, id
+        LIMIT 1
+        """
+        result = await self.execute_query(query, (phash, max_distance), fetch=True)
+        return result[0] if result else None
+
+    async def get_product_medias(self, product_id: int) -> List[Dict]:
+        """دریافت رسانه‌های محصول"""
+        query = "SELECT * FROM medias WHERE product_id = %s ORDER BY created_at"
+        return await self.execute_query(query, (product_id,), fetch=True)
+
+    # ==================== جستجو ====================
+
+    async def search_products(self, search_term: str, limit: int = 20) -> List[Dict]:
+        """جستجوی محصولات؛ با index FULLTEXT به ترتیب ارتباط، وگرنه با LIKE"""
+        global _fulltext_search
+        search_term = search_term.strip()
+        if (_fulltext_search and config.SEARCH_SETTINGS['fulltext']
+                and len(search_term) >= config.SEARCH_SETTINGS['min_term_length']):
+            try:
+                rows = await self._search_products_fulltext(normalize_text(search_term), limit)
+                if rows:
+                    return rows
+                # بدون نتیجه (مثلاً محصولی که خارج از بات ساخته شده و نام نرمال شده ندارد)؛ LIKE امتحان می‌شود
+            except Error as e:
+                if e.args[0] != FULLTEXT_INDEX_MISSING:
+                    raise
+                # migration 007 اعمال نشده (مثلاً MariaDB بدون ngram)؛ تا اجرای بعدی فقط LIKE
+                _fulltext_search = False
+                print("⚠️ index FULLTEXT محصولات پیدا نشد؛ جستجو با LIKE انجام می‌شود")
+
+        return await self._search_products_like(search_term, limit)
+
+    async def _search_products_fulltext(self, search_term: str, limit: int) -> List[Dict]:
+        """جستجو با MATCH ... AGAINST روی index ngram نام نرمال شده، مرتب بر اساس relevance"""
+        query = """
+        SELECT p.id, p.name, p.price, p.stock, c.title as category_name,
+               b.name as brand_name,
+               MATCH(p.name_normalized, p.description, p.sku) AGAINST (%s IN NATURAL LANGUAGE MODE) AS relevance
+        FROM products p
+        LEFT JOIN categories c ON p.category_id = c.id
+        LEFT JOIN brands b ON p.brand_id = b.id
+        WHERE MATCH(p.name_normalized, p.description, p.sku) AGAINST (%s IN NATURAL LANGUAGE MODE)
+        ORDER BY relevance DESC, p.created_at DESC
+        LIMIT %s
+        """
+        return await self.execute_query(query, (search_term, search_term, limit), fetch=True)
+
+    async def _search_products_like(self, search_term: str, limit: int) -> List[Dict]:
+        """جستجو با LIKE (اسکن کامل جدول)"""
+        query = """
+        SELECT p.id, p.name, p.price, p.stock, c.title as category_name,
+               b.name as brand_name
+        FROM products p
+        LEFT JOIN categories c ON p.category_id = c.id
+        LEFT JOIN brands b ON p.brand_id = b.id
+        WHERE p.name_normalized LIKE %s OR p.name LIKE %s OR p.description LIKE %s OR p.sku LIKE %s
+        ORDER BY p.created_at DESC
+        LIMIT %s
+        """
+        search_pattern = f'%{search_term}%'
+        normalized_pattern = f'%{normalize_text(search_term)}%'
+        return await self.execute_query(query, (normalized_pattern, search_pattern, search_pattern, search_pattern, limit), fetch=True)
@@ -1,8 +1,15 @@
+import asyncio
+import io
 import logging
 import os
-from telegram import Update
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
 from telegram.ext import (
     Application,
+    CallbackQueryHandler,
     CommandHandler,
     MessageHandler,
     filters,
@@ -11,6 +18,12 @@ from telegram.ext import (
 import config
 from ai_handler import AIHandler
 from image_handler import ImageHandler
+from async_database import close_async_pool
+from database import get_reference_cache
+from executors import get_executor_stats, run_blocking, shutdown_executors
+from migrations import run_migrations
+import product_import
+from catalog_export import FORMATS as EXPORT_FORMATS, CatalogWriter
 
 # تنظیمات لاگ
 logging.basicConfig(
@@ -19,17 +32,35 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# قالب created_at در callback_data دکمه‌های صفحه‌بندی (سقف callback_data تلگرام 64 بایت است)
+CURSOR_TIME_FORMAT = '%Y%m%d%H%M%S%f'
+
 
 class ShopBot:
     def __init__(self):
         self.ai_handler = AIHandler()
         self.image_handler = ImageHandler()
-        self.application = Application.builder().token(config.TELEGRAM_BOT_TOKEN).build()
+        self.application = (
+            Application.builder()
+            .token(config.TELEGRAM_BOT_TOKEN)
+            .concurrent_updates(config.BOT_SETTINGS['concurrent_updates'])
+            .post_shutdown(self._on_shutdown)
+            .build()
+        )
         self._register_handlers()
         
         # ذخیره‌سازی موقت media_ids برای هر کاربر
         # {user_id: {'ids': [media_id1, media_id2, ...], 'type': 'product'/'category'}}
         self.user_media = {}
+        
+        # عکس‌های آلبوم‌های در حال دریافت
+        # {media_group_id: {'updates': [update, ...], 'last_seen': زمان آخرین عکس}}
+        self.media_groups = {}
+        
+        # تغییرهای گروهی (یا ویرایش/حذف محصول) منتظر تأیید
+        # {user_id: {'token': شماره پیش‌نمایش, 'bulk_update': {...}, 'confirm_action': {...}, 'created_at': زمان}}
+        self.pending_bulk_updates = {}
+        self._bulk_sequence = 0
 
     def _register_handlers(self):
         """ثبت هندلرهای بات"""
@@ -42,12 +73,29 @@ class ShopBot:
         self.application.add_handler(CommandHandler("clearimages", self.clear_images_command))
         self.application.add_handler(CommandHandler("setproduct", self.set_product_type_command))
         self.application.add_handler(CommandHandler("setcategory", self.set_category_type_command))
+        self.application.add_handler(CommandHandler("stats", self.stats_command))
+        self.application.add_handler(CommandHandler("export", self.export_command))
+        
+        # دکمه‌های صفحه‌بندی /products
+        self.application.add_handler(
+            CallbackQueryHandler(self.products_page_callback, pattern=r'^products:')
+        )
+        
+        # دکمه‌های تأیید/لغو تغییر گروهی
+        self.application.add_handler(
+            CallbackQueryHandler(self.bulk_update_callback, pattern=r'^(?:bulk|change):')
+        )
         
         # دریافت عکس
         self.application.add_handler(
             MessageHandler(filters.PHOTO, self.handle_photo)
         )
         
+        # فایل CSV/XLSX برای وارد کردن گروهی محصولات
+        self.application.add_handler(
+            MessageHandler(filters.Document.ALL, self.handle_document)
+        )
+        
         # پیام‌های متنی
         self.application.add_handler(
             MessageHandler(filters.TEXT & ~filters.COMMAND, self.handle_message)
@@ -77,6 +125,8 @@ class ShopBot:
 /clearimages - پاک کردن عکس‌های آپلود شده
 /setproduct - حالت محصول (چند عکسی)
 /setcategory - حالت دسته‌بندی (یک عکس)
+/stats - وضعیت و آمار داخلی بات
+/export - فایل خروجی تمام محصولات (csv یا jsonl، فشرده gzip)
 
 💬 نحوه استفاده:
 فقط کافیست به زبان ساده درخواست خود را بنویسید!
@@ -94,6 +144,17 @@ class ShopBot:
 [ارسال عکس]
 "دسته‌بندی موبایل اضافه کن"
 
+📥 وارد کردن گروهی محصولات:
+فایل CSV یا XLSX بفرستید؛ سطر اول عنوان ستون‌هاست:
+name، price، sku، category (اجباری) و brand، stock، description، weight
+(عنوان فارسی هم قبول است: نام، قیمت، کد، دسته‌بندی، برند، موجودی، ...)
+فایلی که فقط ستون‌های sku و price/stock دارد، قیمت/موجودی محصولات موجود را
+بعد از تأیید تغییر می‌دهد.
+
+📊 تغییر گروهی:
+"قیمت همه محصولات دسته موبایل ۱۰ درصد گرون بشه"
+"موجودی محصولات برند سامسونگ صفر بشه"
+
 ✨ مثال‌های کاربردی:
 
 📦 محصول با تصویر:
@@ -115,6 +176,7 @@ class ShopBot:
 
 ⚡️ نکات:
 - پیش‌فرض: حالت محصول (چند عکسی)
+- عکس‌ها رو می‌تونی به صورت آلبوم هم بفرستی؛ یکجا آپلود میشن
 - دسته‌بندی: فقط یک عکس
 - اشتباهی عکس فرستادی؟ /clearimages
         """
@@ -175,12 +237,41 @@ class ShopBot:
             await update.message.reply_text(config.MESSAGES['unauthorized'])
             return
         
-        await update.message.reply_text(config.MESSAGES['processing'])
+        page = await self.ai_handler.list_products_page()
+        await update.message.reply_text(page['message'], reply_markup=self._products_keyboard(page))
+
+    async def products_page_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """دکمه‌های قبلی/بعدی /products؛ cursor صفحه در callback_data است"""
+        query = update.callback_query
+        if not self._is_authorized(query.from_user.id):
+            await query.answer(config.MESSAGES['unauthorized'], show_alert=True)
+            return
         
-        action_data = {'action': 'list_products'}
-        result = self.ai_handler.execute_action(action_data)
+        # products:<next|prev>:<شماره صفحه مقصد>:<created_at>:<id>
+        _, direction, page, created_at, product_id = query.data.split(':')
+        cursor = (datetime.strptime(created_at, CURSOR_TIME_FORMAT), int(product_id))
         
-        await update.message.reply_text(result['message'])
+        await query.answer()
+        page = await self.ai_handler.list_products_page(int(page), cursor, direction)
+        await query.edit_message_text(page['message'], reply_markup=self._products_keyboard(page))
+
+    def _products_keyboard(self, page: dict) -> InlineKeyboardMarkup:
+        """دکمه‌های صفحه قبل/بعد با cursor اولین/آخرین محصول صفحه"""
+        products = page['products']
+        buttons = []
+        if products and page['has_prev']:
+            first = products[0]
+            buttons.append(InlineKeyboardButton(
+                config.MESSAGES['page_prev'],
+                callback_data=f"products:prev:{page['page'] - 1}:{first['created_at'].strftime(CURSOR_TIME_FORMAT)}:{first['id']}"
+            ))
+        if products and page['has_next']:
+            last = products[-1]
+            buttons.append(InlineKeyboardButton(
+                config.MESSAGES['page_next'],
+                callback_data=f"products:next:{page['page'] + 1}:{last['created_at'].strftime(CURSOR_TIME_FORMAT)}:{last['id']}"
+            ))
+        return InlineKeyboardMarkup([buttons]) if buttons else None
 
     async def categories_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """دستور /categories - نمایش لیست دسته‌بندی‌ها"""
@@ -189,7 +280,7 @@ class ShopBot:
             return
         
         action_data = {'action': 'list_categories'}
-        result = self.ai_handler.execute_action(action_data)
+        result = await self.ai_handler.execute_action(action_data)
         
         await update.message.reply_text(result['message'])
 
@@ -200,10 +291,106 @@ class ShopBot:
             return
         
         action_data = {'action': 'list_brands'}
-        result = self.ai_handler.execute_action(action_data)
+        result = await self.ai_handler.execute_action(action_data)
         
         await update.message.reply_text(result['message'])
 
+    async def export_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """دستور /export [csv|jsonl] - ارسال تمام محصولات به صورت فایل فشرده"""
+        if not self._is_authorized(update.effective_user.id):
+            await update.message.reply_text(config.MESSAGES['unauthorized'])
+            return
+        
+        export_format = (context.args[0] if context.args else config.EXPORT_SETTINGS['default_format']).lower()
+        if export_format not in EXPORT_FORMATS:
+            await update.message.reply_text(config.MESSAGES['export_invalid_format'])
+            return
+        
+        status_msg = await update.message.reply_text(config.MESSAGES['export_started'])
+        fd, temp_path = tempfile.mkstemp(prefix='products_export_', suffix=EXPORT_FORMATS[export_format])
+        os.close(fd)
+        try:
+            count = await self._write_export(temp_path, export_format)
+            
+            size = os.path.getsize(temp_path)
+            if size > config.EXPORT_SETTINGS['max_upload_size']:
+                await status_msg.edit_text(config.MESSAGES['export_too_large'].format(size=size // (1024 * 1024)))
+                return
+            
+            filename = f"products_{datetime.now():%Y%m%d_%H%M}{EXPORT_FORMATS[export_format]}"
+            with open(temp_path, 'rb') as file:
+                await update.message.reply_document(document=file, filename=filename)
+            await status_msg.edit_text(config.MESSAGES['export_done'].format(count=count))
+        except Exception as e:
+            logger.error(f"Error exporting products: {e}")
+            await status_msg.edit_text(config.MESSAGES['export_failed'].format(error=e))
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    async def _write_export(self, path: str, export_format: str) -> int:
+        """
+        استریم محصولات از cursor سمت سرور به فایل gzip
+        
+        نوشتن هر دسته در thread pool با خواندن دسته بعدی از دیتابیس هم‌زمان است؛
+        حداکثر دو دسته در حافظه است، هر چقدر هم کاتالوگ بزرگ باشد.
+        """
+        writer = CatalogWriter(path, export_format)
+        batches = self.ai_handler.db.iter_products_export(config.EXPORT_SETTINGS['batch_size'])
+        pending = None
+        try:
+            async for rows in batches:
+                if pending is not None:
+                    await pending
+                pending = asyncio.ensure_future(run_blocking('export', writer.write_rows, rows))
+            if pending is not None:
+                await pending
+        finally:
+            if pending is not None:
+                # نوشتن دسته قبلی تمام شود تا فایل هم‌زمان بسته نشود
+                await asyncio.gather(pending, return_exceptions=True)
+            await batches.aclose()
+            await run_blocking('export', writer.close)
+        return writer.rows_written
+
+    async def stats_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """دستور /stats - نمایش متریک‌های داخلی بات"""
+        if not self._is_authorized(update.effective_user.id):
+            await update.message.reply_text(config.MESSAGES['unauthorized'])
+            return
+        
+        pool_stats = self.ai_handler.db.get_pool_stats()
+        message = "📊 وضعیت بات:\n\n"
+        message += "🗄 Pool دیتابیس:\n"
+        message += f"   اتصال‌ها: {pool_stats['in_use']} در حال استفاده / {pool_stats['size']} باز (حداکثر {pool_stats['max_size']})\n"
+        message += f"   تحویل‌ها: {pool_stats['checkouts']} | timeout: {pool_stats['timeouts']} | reconnect: {pool_stats['reconnects']}\n"
+        message += f"   انتظار: میانگین {pool_stats['avg_wait_ms']:.1f}ms | حداکثر {pool_stats['max_wait_ms']:.1f}ms\n"
+        message += "\n🧠 کش system prompt:\n"
+        message += f"   hit: {self.ai_handler.prompt_cache_hits} | miss: {self.ai_handler.prompt_cache_misses}\n"
+        if self.ai_handler.provider == 'claude':
+            message += f"   توکن‌های Claude از کش: خواندن {self.ai_handler.claude_cache_read_tokens:,} | نوشتن {self.ai_handler.claude_cache_write_tokens:,}\n"
+        for name, executor_stats in get_executor_stats().items():
+            message += f"\n🧵 Pool {name}:\n"
+            message += f"   در صف: {executor_stats['queued']} | در حال اجرا: {executor_stats['running']}/{executor_stats['max_workers']} | انجام شده: {executor_stats['completed']}\n"
+            message += f"   انتظار: میانگین {executor_stats['avg_wait_ms']:.1f}ms | حداکثر {executor_stats['max_wait_ms']:.1f}ms | اجرا: {executor_stats['avg_run_ms']:.0f}ms\n"
+        ftp_stats = self.image_handler.ftp_pool.get_stats()
+        message += "\n📡 نشست‌های FTP:\n"
+        message += f"   آزاد: {ftp_stats['idle']}/{ftp_stats['max_size']} | ساخته شده: {ftp_stats['created']} | استفاده مجدد: {ftp_stats['reused']} | reconnect: {ftp_stats['reconnects']} | timeout: {ftp_stats['timeouts']}\n"
+        response_cache = self.ai_handler.response_cache.get_stats()
+        message += "\n💾 کش پاسخ AI:\n"
+        message += f"   hit: {response_cache['hits']} | miss: {response_cache['misses']} ({response_cache['hit_rate']:.0%}) | اندازه: {response_cache['size']}\n"
+        message += "\n📚 کش دسته‌بندی‌ها و برندها:\n"
+        for table, table_stats in get_reference_cache().get_stats().items():
+            message += f"   {table}: hit: {table_stats['hits']} | miss: {table_stats['misses']} ({table_stats['hit_rate']:.0%}) | اندازه: {table_stats['size']}\n"
+        product_index = self.ai_handler.product_index.get_stats()
+        message += "\n🔎 index نام محصولات:\n"
+        message += f"   {product_index['size']} محصول | {product_index['lookups']} جستجو ({product_index['matches']} پیدا شد) | میانگین {product_index['avg_lookup_us']:.0f}µs\n"
+        fast_path = self.ai_handler.intent_matcher.get_stats()
+        message += "\n⚡️ مسیر سریع (بدون LLM):\n"
+        message += f"   {fast_path['hits']} از {fast_path['hits'] + fast_path['misses']} پیام ({fast_path['hit_rate']:.0%}) بدون فراخوانی AI پاسخ داده شد\n"
+        
+        await update.message.reply_text(message)
+
     async def handle_photo(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """پردازش عکس‌های ارسالی"""
         user_id = update.effective_user.id
@@ -212,25 +399,23 @@ class ShopBot:
             await update.message.reply_text(config.MESSAGES['unauthorized'])
             return
         
+        # عکس‌های یک آلبوم جمع می‌شوند و یکجا پردازش می‌شوند
+        media_group_id = update.message.media_group_id
+        if media_group_id:
+            group = self.media_groups.setdefault(media_group_id, {'updates': []})
+            group['updates'].append(update)
+            group['last_seen'] = time.monotonic()
+            if len(group['updates']) == 1:
+                context.application.create_task(self._flush_media_group(media_group_id, context))
+            return
+        
         processing_msg = await update.message.reply_text(config.MESSAGES['image_uploading'])
         
         try:
-            # دانلود عکس از تلگرام
+            # دانلود عکس از تلگرام و آپلود مستقیم به FTP
             photo = update.message.photo[-1]  # بزرگترین سایز
-            file = await context.bot.get_file(photo.file_id)
-            
-            # ذخیره موقت
-            import time
-            import tempfile
-            temp_path = os.path.join(tempfile.gettempdir(), f'telegram_image_{user_id}_{int(time.time())}.jpg')
-            await file.download_to_drive(temp_path)
-            
-            # آپلود به FTP
-            result = await self.image_handler.upload_image(temp_path)
-            
-            # حذف فایل موقت
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
+            async with self._download_photo(photo, context) as image:
+                result = await self.image_handler.upload_image(image, telegram_user_id=user_id)
             
             if result['success']:
                 # اگه لیست media برای این کاربر نداریم، بساز
@@ -253,6 +438,12 @@ class ShopBot:
                     )
                     return
                 
+                # همین عکس قبلاً در همین جلسه فرستاده شده
+                if result['media_id'] in self.user_media[user_id]['ids']:
+                    await processing_msg.delete()
+                    await update.message.reply_text(config.MESSAGES['image_duplicate'])
+                    return
+                
                 # اضافه کردن media_id به لیست
                 self.user_media[user_id]['ids'].append(result['media_id'])
                 
@@ -279,6 +470,9 @@ class ShopBot:
                         url=result['url']
                     )
                 
+                if result.get('duplicate'):
+                    message += "\n" + config.MESSAGES['image_duplicate']
+                
                 await update.message.reply_text(message)
             else:
                 await processing_msg.delete()
@@ -293,6 +487,247 @@ class ShopBot:
                 config.MESSAGES['ai_error'].format(error=str(e))
             )
 
+    async def handle_document(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """وارد کردن گروهی محصولات از فایل CSV/XLSX (بدون فراخوانی AI برای هر ردیف)"""
+        if not self._is_authorized(update.effective_user.id):
+            await update.message.reply_text(config.MESSAGES['unauthorized'])
+            return
+        
+        document = update.message.document
+        extension = os.path.splitext(document.file_name or '')[1].lower()
+        if not product_import.is_supported(extension):
+            await update.message.reply_text(config.MESSAGES['import_unsupported'])
+            return
+        if (document.file_size or 0) > config.IMPORT_SETTINGS['max_file_size']:
+            await update.message.reply_text(config.MESSAGES['import_too_large'])
+            return
+        
+        status_msg = await update.message.reply_text(config.MESSAGES['import_started'])
+        fd, temp_path = tempfile.mkstemp(prefix='telegram_import_', suffix=extension)
+        os.close(fd)
+        try:
+            file = await context.bot.get_file(document.file_id)
+            await file.download_to_drive(temp_path)
+            
+            # فایل فقط SKU و قیمت/موجودی: تغییر گروهی محصولات موجود با پیش‌نمایش
+            if await run_blocking('import', product_import.is_update_file, temp_path, extension):
+                updates, errors = await run_blocking('import', product_import.read_updates, temp_path, extension)
+                if updates:
+                    result = await self.ai_handler.preview_sku_updates(updates)
+                else:
+                    result = {'success': False, 'message': config.MESSAGES['import_failed'].format(error='ردیف معتبری نیست')}
+                await self._send_bulk_preview(status_msg, update.effective_user.id, result, edit=True)
+            else:
+                counts, errors = await self._import_products(temp_path, extension, status_msg)
+                await status_msg.edit_text(config.MESSAGES['import_done'].format(**counts))
+        except Exception as e:
+            logger.error(f"Error importing products: {e}")
+            await status_msg.edit_text(config.MESSAGES['import_failed'].format(error=e))
+            return
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        
+        if errors:
+            await update.message.reply_document(
+                document=product_import.error_report(errors),
+                filename='import_errors.csv',
+                caption=config.MESSAGES['import_error_report']
+            )
+
+    async def _import_products(self, path: str, extension: str, status_msg):
+        """
+        خواندن تکه‌تکه فایل در thread pool و INSERT هر تکه با یک executemany در یک تراکنش
+        
+        Returns:
+            (تعداد ردیف‌ها {processed, imported, failed}, خطاها [(شماره ردیف, sku, پیام)])
+        """
+        db = self.ai_handler.db
+        settings = config.IMPORT_SETTINGS
+        
+        # دسته‌بندی‌ها و برندها یک بار از کش داده‌های مرجع خوانده می‌شوند
+        categories = product_import.build_lookup(await db.get_all_categories(), 'title')
+        brands = product_import.build_lookup(await db.get_all_brands(), 'name')
+        chunks = product_import.read_chunks(path, extension, settings['chunk_size'], categories, brands)
+        
+        counts = {'processed': 0, 'imported': 0, 'failed': 0}
+        errors = []
+        seen_skus = set()
+        last_progress = time.monotonic()
+        try:
+            while True:
+                chunk = await run_blocking('import', next, chunks, None)
+                if chunk is None:
+                    break
+                valid, chunk_errors = chunk
+                counts['processed'] += len(valid) + len(chunk_errors)
+                
+                # SKU یونیک است؛ تکراری‌های داخل فایل و موجود در دیتابیس کنار گذاشته می‌شوند
+                existing = await db.get_existing_skus([product['sku'] for _, product in valid])
+                batch = []
+                for line_number, product in valid:
+                    if product['sku'] in existing or product['sku'] in seen_skus:
+                        chunk_errors.append((line_number, product['sku'], 'SKU تکراری است'))
+                        continue
+                    seen_skus.add(product['sku'])
+                    batch.append((line_number, product))
+                
+                if batch:
+                    try:
+                        await db.add_products([product for _, product in batch])
+                        counts['imported'] += len(batch)
+                    except Exception as e:
+                        # کل تکه rollback شده است
+                        chunk_errors.extend((line_number, product['sku'], str(e)) for line_number, product in batch)
+                
+                errors.extend(chunk_errors)
+                counts['failed'] = len(errors)
+                
+                if time.monotonic() - last_progress >= settings['progress_interval']:
+                    last_progress = time.monotonic()
+                    await status_msg.edit_text(config.MESSAGES['import_progress'].format(**counts))
+        finally:
+            chunks.close()
+            if counts['imported']:
+                # محصولات جدید در جستجوی بعدی index نام‌ها دیده می‌شوند
+                self.ai_handler.product_index.invalidate()
+        
+        return counts, errors
+
+    @asynccontextmanager
+    async def _download_photo(self, photo, context: ContextTypes.DEFAULT_TYPE):
+        """دانلود عکس تلگرام در حافظه؛ فایل‌های بزرگ‌تر از آستانه روی دیسک موقت می‌روند و همیشه پاک می‌شوند"""
+        file = await context.bot.get_file(photo.file_id)
+        file_size = file.file_size or photo.file_size or 0
+        
+        if file_size <= config.BOT_SETTINGS['max_in_memory_image_size']:
+            buffer = io.BytesIO()
+            await file.download_to_memory(buffer)
+            buffer.seek(0)
+            yield buffer
+            return
+        
+        fd, temp_path = tempfile.mkstemp(prefix='telegram_image_', suffix='.jpg')
+        os.close(fd)
+        try:
+            await file.download_to_drive(temp_path)
+            yield temp_path
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    async def _flush_media_group(self, media_group_id: str, context: ContextTypes.DEFAULT_TYPE):
+        """صبر تا رسیدن تمام عکس‌های آلبوم و سپس پردازش یکجای آن‌ها"""
+        window = config.BOT_SETTINGS['media_group_window']
+        group = self.media_groups[media_group_id]
+        
+        # تلگرام عکس‌های آلبوم را پشت سر هم می‌فرستد؛ تا وقتی عکس جدیدی برسد صبر می‌کنیم
+        while True:
+            remaining = group['last_seen'] + window - time.monotonic()
+            if remaining <= 0:
+                break
+            await asyncio.sleep(remaining)
+        
+        del self.media_groups[media_group_id]
+        updates = sorted(group['updates'], key=lambda u: u.message.message_id)
+        
+        try:
+            await self._process_media_group(updates, context)
+        except Exception as e:
+            logger.error(f"خطا در پردازش آلبوم: {e}")
+            await updates[0].message.reply_text(
+                config.MESSAGES['ai_error'].format(error=str(e))
+            )
+
+    async def _process_media_group(self, updates: list, context: ContextTypes.DEFAULT_TYPE):
+        """دانلود و آپلود همزمان عکس‌های آلبوم، ثبت گروهی در دیتابیس و یک پاسخ خلاصه"""
+        first_message = updates[0].message
+        user_id = first_message.from_user.id
+        
+        if user_id not in self.user_media:
+            self.user_media[user_id] = {'ids': [], 'type': 'product'}  # پیش‌فرض: محصول
+        user_state = self.user_media[user_id]
+        media_type = user_state['type']
+        
+        # ظرفیت باقی‌مانده قبل از آپلود بررسی می‌شود تا عکس اضافه آپلود نشود
+        if media_type == 'category':
+            available = config.BOT_SETTINGS['max_images_per_category'] - len(user_state['ids'])
+            if available <= 0:
+                await first_message.reply_text(config.MESSAGES['image_limit_category'])
+                return
+        else:
+            available = config.BOT_SETTINGS['max_images_per_product'] - len(user_state['ids'])
+            if available <= 0:
+                await first_message.reply_text(
+                    config.MESSAGES['image_limit_product'].format(max=config.BOT_SETTINGS['max_images_per_product'])
+                )
+                return
+        
+        accepted = updates[:available]
+        skipped = len(updates) - len(accepted)
+        
+        processing_msg = await first_message.reply_text(
+            config.MESSAGES['album_uploading'].format(count=len(accepted))
+        )
+        
+        semaphore = asyncio.Semaphore(config.BOT_SETTINGS['album_upload_parallelism'])
+        
+        async def transfer(photo_update: Update) -> dict:
+            async with semaphore:
+                photo = photo_update.message.photo[-1]  # بزرگترین سایز
+                async with self._download_photo(photo, context) as image:
+                    return await self.image_handler.upload_file(image)
+        
+        results = await asyncio.gather(*[transfer(u) for u in accepted], return_exceptions=True)
+        uploads = [r for r in results if isinstance(r, dict) and r.get('success')]
+        urls = [upload['url'] for upload in uploads]
+        failed = len(accepted) - len(uploads)
+        
+        # ثبت تمام عکس‌ها با یک INSERT، به ترتیب پیام‌های آلبوم
+        media_ids = await self.image_handler.add_medias(uploads, telegram_user_id=user_id) if uploads else []
+        has_pinned = bool(user_state['ids'])
+        user_state['ids'].extend(media_ids)
+        
+        await processing_msg.delete()
+        
+        if not media_ids:
+            await first_message.reply_text(
+                config.MESSAGES['ftp_error'].format(error=config.ERROR_MESSAGES['ftp_upload_failed'])
+            )
+            return
+        
+        if media_type == 'product':
+            lines = []
+            for index, (media_id, url) in enumerate(zip(media_ids, urls)):
+                pinned = " ⭐ عکس اصلی" if index == 0 and not has_pinned else ""
+                lines.append(f"🆔 {media_id}{pinned}\n🔗 {url}")
+            
+            notes = []
+            if failed:
+                notes.append(f"⚠️ {failed} عکس آپلود نشد")
+            duplicates = sum(1 for upload in uploads if upload.get('existing_media'))
+            if duplicates:
+                notes.append(f"♻️ {duplicates} عکس قبلاً آپلود شده بود و دوباره آپلود نشد")
+            if skipped:
+                notes.append(config.MESSAGES['image_limit_product'].format(max=config.BOT_SETTINGS['max_images_per_product']))
+            
+            message = config.MESSAGES['album_uploaded_product'].format(
+                count=len(media_ids),
+                lines="\n".join(lines),
+                total=len(user_state['ids']),
+                notes="\n".join(notes),
+                hint="عکس دیگه هم داری بفرست یا اطلاعات محصول رو بنویس"
+            )
+        else:  # category
+            message = config.MESSAGES['image_uploaded_category'].format(
+                media_id=media_ids[0],
+                url=urls[0]
+            )
+            if skipped:
+                message += "\n" + config.MESSAGES['image_limit_category']
+        
+        await first_message.reply_text(message)
+
     async def handle_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """پردازش پیام‌های متنی کاربر"""
         user_id = update.effective_user.id
@@ -327,44 +762,36 @@ class ShopBot:
             # پردازش درخواست با AI
             action_data = await self.ai_handler.process_request(user_message)
             
+            # در پیام چند مرحله‌ای، عکس‌ها به اولین محصول/دسته‌بندی جدید می‌رسند
+            steps = (action_data.get('steps') or []) if action_data.get('action') == 'plan' else [action_data]
+            
             # اگه محصول اضافه شد و media داره
-            if action_data.get('action') == 'add_product' and media_ids and media_type == 'product':
-                action_data['data']['media_pinned_id'] = media_ids[0]
-                action_data['media_ids'] = media_ids  # برای لینک کردن بعد از ساخت
+            if media_ids and media_type == 'product':
+                step = next((step for step in steps if step.get('action') == 'add_product'), None)
+                if step is not None:
+                    step.setdefault('data', {})['media_pinned_id'] = media_ids[0]
+                    step['media_ids'] = media_ids  # در همان تراکنش ساخت محصول لینک می‌شوند
             
             # اگه دسته‌بندی اضافه شد و media داره
-            elif action_data.get('action') == 'add_category' and media_ids and media_type == 'category':
-                action_data['category_media_id'] = media_ids[0]
-            
-            # اجرای عملیات
-            result = self.ai_handler.execute_action(action_data)
+            elif media_ids and media_type == 'category':
+                step = next((step for step in steps if step.get('action') == 'add_category'), None)
+                if step is not None:
+                    step['category_media_id'] = media_ids[0]
             
-            # اگه محصول با موفقیت اضافه شد و media_ids داریم
-            if result.get('success') and action_data.get('action') == 'add_product' and media_ids and media_type == 'product':
-                product_id = result.get('product_id')
-                if product_id:
-                    # لینک کردن تمام عکس‌ها به محصول
-                    linked = await self.image_handler.link_medias_to_product(media_ids, product_id)
-                    if linked:
-                        result['message'] += f"\n📸 {len(media_ids)} عکس به محصول لینک شد"
-            
-            # اگه دسته‌بندی با موفقیت اضافه شد و media داره
-            elif result.get('success') and action_data.get('action') == 'add_category' and media_ids and media_type == 'category':
-                category_id = result.get('category_id')
-                if category_id:
-                    # لینک کردن عکس به دسته‌بندی
-                    linked = await self.image_handler.link_media_to_category(media_ids[0], category_id)
-                    if linked:
-                        result['message'] += f"\n📸 عکس به دسته‌بندی لینک شد"
+            # اجرای عملیات (ساخت محصول/دسته‌بندی و لینک عکس‌ها در یک تراکنش)
+            result = await self.ai_handler.execute_action(action_data)
             
             # حذف پیام "در حال پردازش"
             await processing_msg.delete()
             
-            # ارسال پاسخ
-            await update.message.reply_text(result['message'])
+            # ارسال پاسخ (تغییر گروهی یا ویرایش/حذف محصول پیدا شده با نام تقریبی، با دکمه تأیید)
+            if result.get('bulk_update') or result.get('confirm_action'):
+                await self._send_bulk_preview(update.message, user_id, result)
+            else:
+                await update.message.reply_text(result['message'])
             
             # اگه محصول یا دسته‌بندی با موفقیت اضافه شد، media_ids رو پاک کن
-            if result.get('success') and action_data.get('action') in ['add_product', 'add_category']:
+            if result.get('success') and any(step.get('action') in ['add_product', 'add_category'] for step in steps):
                 if user_id in self.user_media:
                     del self.user_media[user_id]
             
@@ -380,6 +807,60 @@ class ShopBot:
                 config.MESSAGES['ai_error'].format(error=str(e))
             )
 
+    async def _send_bulk_preview(self, message, user_id: int, result: dict, edit: bool = False):
+        """ارسال پیش‌نمایش تغییر گروهی (یا درخواست تأیید محصول) با دکمه‌های تأیید/لغو، یا پیام خطا"""
+        send = message.edit_text if edit else message.reply_text
+        if not result.get('bulk_update') and not result.get('confirm_action'):
+            await send(result['message'])
+            return
+        
+        self._bulk_sequence += 1
+        token = self._bulk_sequence
+        kind = 'bulk' if result.get('bulk_update') else 'change'
+        self.pending_bulk_updates[user_id] = {
+            'token': token,
+            'bulk_update': result.get('bulk_update'),
+            'confirm_action': result.get('confirm_action'),
+            'created_at': time.monotonic(),
+        }
+        keyboard = InlineKeyboardMarkup([[
+            InlineKeyboardButton(config.MESSAGES['bulk_confirm'], callback_data=f"{kind}:confirm:{token}"),
+            InlineKeyboardButton(config.MESSAGES['bulk_cancel'], callback_data=f"{kind}:cancel:{token}"),
+        ]])
+        await send(result['message'], reply_markup=keyboard)
+
+    async def bulk_update_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """اجرا یا لغو تغییر گروهی پیش‌نمایش داده شده (یا ویرایش/حذف محصول منتظر تأیید)"""
+        query = update.callback_query
+        user_id = query.from_user.id
+        if not self._is_authorized(user_id):
+            await query.answer(config.MESSAGES['unauthorized'], show_alert=True)
+            return
+        await query.answer()
+        
+        kind, decision, token = query.data.split(':')
+        pending = self.pending_bulk_updates.get(user_id)
+        # فقط آخرین پیش‌نمایش هر کاربر، تا پایان مهلت، قابل تأیید است
+        if (not pending or pending['token'] != int(token)
+                or time.monotonic() - pending['created_at'] > config.BOT_SETTINGS['bulk_confirm_timeout']):
+            await query.edit_message_text(config.MESSAGES[f'{kind}_expired'])
+            return
+        del self.pending_bulk_updates[user_id]
+        
+        if decision != 'confirm':
+            await query.edit_message_text(config.MESSAGES[f'{kind}_cancelled'])
+            return
+        
+        try:
+            if pending['confirm_action']:
+                result = await self.ai_handler.execute_action(pending['confirm_action'])
+            else:
+                result = await self.ai_handler.apply_bulk_update(pending['bulk_update'])
+        except Exception as e:
+            logger.error(f"Error applying confirmed change: {e}")
+            result = {'message': config.MESSAGES[f'{kind}_failed'].format(error=str(e))}
+        await query.edit_message_text(result['message'])
+
     def _is_authorized(self, user_id: int) -> bool:
         """بررسی دسترسی کاربر"""
         if not config.ADMIN_USER_IDS:
@@ -388,9 +869,16 @@ class ShopBot:
 
     def run(self):
         """اجرای بات"""
+        run_migrations()
         logger.info("ربات در حال اجرا است...")
         self.application.run_polling(allowed_updates=Update.ALL_TYPES)
 
+    async def _on_shutdown(self, application: Application):
+        """آزادسازی منابع هنگام خاموش شدن بات"""
+        await close_async_pool()
+        await run_blocking('ftp', self.image_handler.close)
+        shutdown_executors()
+
 
 def main():
     """تابع اصلی"""
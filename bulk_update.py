@@ -0,0 +1,131 @@
+from typing import Any, Dict, List, Tuple
+
+# فیلتر قانون -> شرط WHERE روی products p
+FILTERS = {
+    'category_id': "p.category_id = %s",
+    'brand_id': "p.brand_id = %s",
+    'product_ids': "p.id IN ({})",
+    'skus': "p.sku IN ({})",
+}
+
+# فیلترهایی که لیست می‌گیرند -> نوع هر عضو؛ بقیه یک شناسه عددی می‌گیرند
+LIST_FILTERS = {
+    'product_ids': int,
+    'skus': str,
+}
+
+# تغییر قانون -> (ستون, عبارت SET)؛ برای هر ستون فقط یک تغییر مجاز است
+CHANGES = {
+    'price': ('price', "p.price = %s"),
+    'price_percent': ('price', "p.price = GREATEST(ROUND(p.price * (100 + %s) / 100), 0)"),
+    'price_delta': ('price', "p.price = GREATEST(p.price + %s, 0)"),
+    'stock': ('stock', "p.stock = %s"),
+    # CAST: با ستون UNSIGNED، کم شدن به زیر صفر به جای 0 خطای out of range می‌دهد
+    'stock_delta': ('stock', "p.stock = GREATEST(CAST(p.stock AS SIGNED) + %s, 0)"),
+}
+
+# بیشترین تعداد SKU در هر UPDATE ... CASE
+SKU_BATCH_SIZE = 500
+
+Statement = Tuple[str, tuple]
+
+
+def compile_rule(filters: Dict[str, Any], changes: Dict[str, Any]) -> Tuple[Statement, Statement]:
+    """
+    تبدیل قانون گروهی (مثل «قیمت دسته X ده درصد بیشتر») به یک UPDATE مجموعه‌ای
+
+    Returns:
+        (کوئری شمارش ردیف‌ها برای پیش‌نمایش, کوئری UPDATE)
+
+    Raises:
+        ValueError: فیلتر یا تغییر نامعتبر؛ بدون فیلتر فقط با all=true کل محصولات تغییر می‌کنند
+    """
+    conditions, where_params = [], []
+    for key, value in (filters or {}).items():
+        if key == 'all' or value is None:
+            continue
+        if key not in FILTERS:
+            raise ValueError(f"فیلتر نامعتبر: {key}")
+        if key in LIST_FILTERS:
+            conditions.append(FILTERS[key].format(", ".join(["%s"] * len(_check_list(key, value)))))
+            where_params.extend(value)
+        else:
+            conditions.append(FILTERS[key])
+            where_params.append(_check_id(key, value))
+    if not conditions and not (filters or {}).get('all'):
+        raise ValueError("برای تغییر همه محصولات all باید true باشد")
+
+    assignments, set_params, columns = [], [], set()
+    for key, value in (changes or {}).items():
+        if value is None:
+            continue
+        if key not in CHANGES:
+            raise ValueError(f"تغییر نامعتبر: {key}")
+        column, expression = CHANGES[key]
+        if column in columns:
+            raise ValueError(f"برای {column} فقط یک تغییر ممکن است")
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or (key in ('price', 'stock') and value < 0):
+            raise ValueError(f"مقدار نامعتبر برای {key}: {value}")
+        if key == 'price_percent' and value <= -100:
+            # ۱۰۰ درصد کاهش یا بیشتر قیمت را صفر یا منفی می‌کند
+            raise ValueError(f"درصد تغییر قیمت باید بیشتر از -100 باشد: {value}")
+        columns.add(column)
+        assignments.append(expression)
+        set_params.append(value)
+    if not assignments:
+        raise ValueError("هیچ تغییری مشخص نشده است")
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    count_query = (f"SELECT COUNT(*) AS count FROM products p {where}", tuple(where_params))
+    update_query = (
+        f"UPDATE products p SET {', '.join(assignments)} {where}",
+        tuple(set_params) + tuple(where_params),
+    )
+    return count_query, update_query
+
+
+def _check_id(key: str, value: Any) -> int:
+    """شناسه عددی مثبت برای فیلترهای تک‌مقداری (category_id، brand_id)"""
+    if isinstance(value, bool) or not isinstance(value, int) or value <= 0:
+        raise ValueError(f"{key} باید یک شناسه عددی باشد، نه {value!r}")
+    return value
+
+
+def _check_list(key: str, value: Any) -> list:
+    """لیست غیرخالی برای فیلترهای IN (product_ids عدد، skus متن)"""
+    item_type = LIST_FILTERS[key]
+    if not isinstance(value, (list, tuple)) or not value:
+        raise ValueError(f"{key} باید لیستی غیرخالی باشد، نه {value!r}")
+    for item in value:
+        if (isinstance(item, bool) or not isinstance(item, item_type)
+                or (item_type is int and item <= 0) or (item_type is str and not item.strip())):
+            raise ValueError(f"مقدار نامعتبر در {key}: {item!r}")
+    return value
+
+
+def compile_sku_updates(updates: Dict[str, Dict[str, Any]],
+                        batch_size: int = SKU_BATCH_SIZE) -> List[Statement]:
+    """
+    تبدیل فایل SKU -> قیمت/موجودی به UPDATE های CASE، هر کدام برای batch_size محصول
+
+    Args:
+        updates: {sku: {'price': ..., 'stock': ...}}؛ ستونی که برای یک SKU نیامده تغییر نمی‌کند
+    """
+    statements = []
+    skus = list(updates)
+    for start in range(0, len(skus), batch_size):
+        batch = skus[start:start + batch_size]
+        assignments, params = [], []
+        for column in ('price', 'stock'):
+            cases = [sku for sku in batch if updates[sku].get(column) is not None]
+            if not cases:
+                continue
+            assignments.append(f"{column} = CASE sku {' '.join(['WHEN %s THEN %s'] * len(cases))} ELSE {column} END")
+            for sku in cases:
+                params.extend((sku, updates[sku][column]))
+        if not assignments:
+            continue
+        placeholders = ", ".join(["%s"] * len(batch))
+        query = f"UPDATE products SET {', '.join(assignments)} WHERE sku IN ({placeholders})"
+        statements.append((query, tuple(params) + tuple(batch)))
+    return statements
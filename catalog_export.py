@@ -0,0 +1,52 @@
+import csv
+import gzip
+import json
+from typing import Any, Dict, List
+
+# فرمت خروجی -> پسوند فایل
+FORMATS = {
+    'csv': '.csv.gz',
+    'jsonl': '.jsonl.gz',
+}
+
+# ستون‌های فایل خروجی (به ترتیب PRODUCT_EXPORT_QUERY)
+EXPORT_COLUMNS = [
+    'id', 'sku', 'name', 'price', 'stock', 'discount_amount', 'discount_percent',
+    'weight', 'weight_unit', 'is_active', 'is_visible',
+    'category_id', 'category_name', 'brand_id', 'brand_name',
+    'description', 'created_at', 'media_urls',
+]
+
+
+class CatalogWriter:
+    """نوشتن ردیف‌های محصولات در فایل gzip (CSV یا JSONL)؛ هر بار فقط یک دسته ردیف در حافظه است"""
+
+    def __init__(self, path: str, export_format: str = 'csv'):
+        if export_format not in FORMATS:
+            raise ValueError(f"فرمت خروجی نامعتبر: {export_format}")
+        self.export_format = export_format
+        self.rows_written = 0
+        self._file = gzip.open(path, 'wt', encoding='utf-8', newline='')
+        if export_format == 'csv':
+            # BOM تا Excel متن فارسی را درست نشان دهد
+            self._file.write('\ufeff')
+            self._csv = csv.writer(self._file)
+            self._csv.writerow(EXPORT_COLUMNS)
+
+    def write_rows(self, rows: List[Dict[str, Any]]) -> int:
+        """نوشتن یک دسته ردیف (در thread pool اجرا می‌شود)"""
+        for row in rows:
+            if self.export_format == 'csv':
+                self._csv.writerow([row.get(column) for column in EXPORT_COLUMNS])
+            else:
+                record = {column: row.get(column) for column in EXPORT_COLUMNS}
+                record['media_urls'] = record['media_urls'].split(' ') if record['media_urls'] else []
+                # Decimal و datetime به متن تبدیل می‌شوند
+                self._file.write(json.dumps(record, ensure_ascii=False, default=str))
+                self._file.write('\n')
+        self.rows_written += len(rows)
+        return len(rows)
+
+    def close(self):
+        """بستن فایل (پایان stream gzip)"""
+        self._file.close()
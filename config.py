@@ -1,3 +1,4 @@
+import multiprocessing
 import os
 from dotenv import load_dotenv
 
@@ -17,6 +18,22 @@ GROQ_MODEL = "llama-3.3-70b-versatile"
 ANTHROPIC_API_KEY = os.getenv('ANTHROPIC_API_KEY', '')
 CLAUDE_MODEL = "claude-sonnet-4-20250514"
 
+# AI Settings
+AI_SETTINGS = {
+    # json: مدل متن JSON برمی‌گرداند | tools: هر action یک ابزار (function calling) است
+    'mode': os.getenv('AI_MODE', 'json'),
+    # system prompt فقط با تغییر دسته‌بندی/برند دوباره ساخته می‌شود؛
+    # این TTL (ثانیه) برای تغییراتی است که خارج از بات در دیتابیس انجام می‌شوند. 0 = بدون TTL
+    'prompt_cache_ttl': int(os.getenv('PROMPT_CACHE_TTL', 300)),
+    'request_timeout': float(os.getenv('AI_REQUEST_TIMEOUT', 30)),  # timeout هر تلاش HTTP (ثانیه)
+    'max_retries': int(os.getenv('AI_MAX_RETRIES', 2)),  # تعداد retry خودکار SDK
+    'total_timeout': float(os.getenv('AI_TOTAL_TIMEOUT', 60)),  # سقف کل یک درخواست با retry ها (ثانیه)
+    'fast_path': os.getenv('AI_FAST_PATH', 'true').lower() == 'true',  # پاسخ به درخواست‌های ساده بدون LLM
+    'response_cache_size': int(os.getenv('AI_RESPONSE_CACHE_SIZE', 256)),  # تعداد پاسخ‌های فقط-خواندنی کش شده
+    'response_cache_ttl': int(os.getenv('AI_RESPONSE_CACHE_TTL', 600)),  # اعتبار پاسخ کش شده (ثانیه)
+    'max_plan_steps': int(os.getenv('AI_MAX_PLAN_STEPS', 20)),  # سقف عملیات‌های یک پیام چند مرحله‌ای (action plan)
+}
+
 # Database Configuration
 DB_CONFIG = {
     'host': os.getenv('DB_HOST', 'localhost'),
@@ -28,6 +45,35 @@ DB_CONFIG = {
     'collation': 'utf8mb4_unicode_ci'
 }
 
+# Database Connection Pool
+DB_POOL_CONFIG = {
+    'min_size': int(os.getenv('DB_POOL_MIN_SIZE', 2)),  # تعداد اتصال‌های باز از ابتدا
+    'max_size': int(os.getenv('DB_POOL_MAX_SIZE', 10)),  # حداکثر اتصال همزمان
+    'timeout': float(os.getenv('DB_POOL_TIMEOUT', 5)),  # حداکثر انتظار برای اتصال آزاد (ثانیه)
+    'health_check': os.getenv('DB_POOL_HEALTH_CHECK', 'true').lower() == 'true',  # ping قبل از تحویل اتصال
+}
+
+# جستجوی محصولات
+SEARCH_SETTINGS = {
+    'fulltext': os.getenv('SEARCH_FULLTEXT', 'true').lower() == 'true',  # index FULLTEXT (ngram)؛ false = همیشه LIKE
+    'min_term_length': int(os.getenv('SEARCH_MIN_TERM_LENGTH', 2)),  # برابر ngram_token_size؛ عبارت کوتاه‌تر با LIKE جستجو می‌شود
+}
+
+# Index سه‌حرفی (trigram) نام/SKU محصولات در حافظه برای پیدا کردن محصول با نام تقریبی
+PRODUCT_INDEX = {
+    'enabled': os.getenv('PRODUCT_INDEX', 'true').lower() == 'true',  # false = جستجوی نام با LIKE در دیتابیس
+    'min_score': float(os.getenv('PRODUCT_INDEX_MIN_SCORE', 0.5)),  # حداقل سهم سه‌حرفی‌های مشترک برای تطبیق
+    # ساخت دوباره از دیتابیس برای تغییراتی که خارج از بات انجام می‌شوند (ثانیه). 0 = فقط یک بار
+    'refresh_interval': int(os.getenv('PRODUCT_INDEX_REFRESH', 600)),
+}
+
+# کش درون حافظه دسته‌بندی‌ها و برندها (با هر تغییر از طریق بات باطل می‌شود)
+REFERENCE_CACHE = {
+    'enabled': os.getenv('REFERENCE_CACHE', 'true').lower() == 'true',
+    # اعتبار کش برای تغییراتی که خارج از بات انجام می‌شوند (ثانیه). 0 = بدون انقضا
+    'ttl': int(os.getenv('REFERENCE_CACHE_TTL', 300)),
+}
+
 # FTP Configuration for Image Upload
 FTP_CONFIG = {
     'host': os.getenv('FTP_HOST', 'ftp.poshtybanman.ir'),
@@ -38,6 +84,64 @@ FTP_CONFIG = {
     'base_url': os.getenv('FTP_BASE_URL', 'https://dl.poshtybanman.ir/Rshop/product/')
 }
 
+# Thread pool های کارهای blocking (FTP و ...)؛ max_queue = کارهای منتظر بیشتر از ظرفیت
+EXECUTOR_POOLS = {
+    'ftp': {
+        'max_workers': int(os.getenv('FTP_POOL_WORKERS', 4)),
+        'max_queue': int(os.getenv('FTP_POOL_QUEUE', 32)),
+    },
+    # کار Pillow (تغییر اندازه، encode و dHash) CPU-bound است؛ در process جدا اجرا می‌شود
+    'image': {
+        'max_workers': int(os.getenv('IMAGE_POOL_WORKERS', os.cpu_count() or 2)),
+        'max_queue': int(os.getenv('IMAGE_POOL_QUEUE', 16)),
+        'processes': True,
+        # process ها با fork ساخته نمی‌شوند (forkserver، یا spawn جایی که forkserver نیست)
+        'start_method': os.getenv(
+            'IMAGE_POOL_START_METHOD',
+            'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+        ),
+    },
+    # SHA-256 عکس‌ها (hashlib در حین hash کردن GIL را آزاد می‌کند و به process نیاز ندارد)
+    'hash': {
+        'max_workers': int(os.getenv('HASH_POOL_WORKERS', 2)),
+        'max_queue': int(os.getenv('HASH_POOL_QUEUE', 16)),
+    },
+    # خواندن و اعتبارسنجی فایل‌های CSV/XLSX وارد کردن محصولات
+    'import': {
+        'max_workers': int(os.getenv('IMPORT_POOL_WORKERS', 2)),
+        'max_queue': int(os.getenv('IMPORT_POOL_QUEUE', 4)),
+    },
+    # فشرده‌سازی و نوشتن فایل /export (هم‌زمان با خواندن دسته بعدی از دیتابیس)
+    'export': {
+        'max_workers': int(os.getenv('EXPORT_POOL_WORKERS', 2)),
+        'max_queue': int(os.getenv('EXPORT_POOL_QUEUE', 4)),
+    },
+}
+
+# نسخه‌های تصویر که قبل از آپلود ساخته می‌شوند (نیاز به Pillow)
+IMAGE_PROCESSING = {
+    'enabled': os.getenv('IMAGE_PROCESSING', 'true').lower() == 'true',  # false = آپلود عکس اصلی بدون تغییر
+    'sizes': [int(size) for size in os.getenv('IMAGE_SIZES', '1600,800,200').split(',') if size.strip()],  # بزرگ‌ترین ضلع (پیکسل)
+    'formats': [f.strip() for f in os.getenv('IMAGE_FORMATS', 'webp,jpeg').split(',') if f.strip()],  # webp و/یا jpeg
+    'jpeg_quality': int(os.getenv('IMAGE_JPEG_QUALITY', 82)),
+    'webp_quality': int(os.getenv('IMAGE_WEBP_QUALITY', 80)),
+}
+
+# حذف آپلودهای تکراری: عکسی که قبلاً آپلود شده دوباره به FTP فرستاده نمی‌شود
+MEDIA_DEDUP = {
+    'enabled': os.getenv('MEDIA_DEDUP', 'true').lower() == 'true',  # مقایسه SHA-256 فایل
+    'perceptual': os.getenv('MEDIA_DEDUP_PERCEPTUAL', 'false').lower() == 'true',  # عکس‌های تقریباً یکسان (dHash، نیاز به Pillow)
+    'max_distance': int(os.getenv('MEDIA_DEDUP_MAX_DISTANCE', 4)),  # حداکثر اختلاف بیت‌های dHash برای تکراری بودن
+}
+
+# Pool نشست‌های FTP لاگین شده (حداکثر تعداد برابر با worker های pool ftp)
+FTP_SESSION_POOL = {
+    'max_size': EXECUTOR_POOLS['ftp']['max_workers'],
+    'keepalive_interval': float(os.getenv('FTP_KEEPALIVE_INTERVAL', 60)),  # NOOP برای نشست‌های بیکارتر از این (ثانیه)
+    'timeout': float(os.getenv('FTP_TIMEOUT', 30)),  # timeout عملیات شبکه FTP (ثانیه)
+    'acquire_timeout': float(os.getenv('FTP_ACQUIRE_TIMEOUT', 60)),  # انتظار برای نشست آزاد (ثانیه)
+}
+
 # Admin Users (comma-separated user IDs)
 ADMIN_USER_IDS = [int(uid.strip()) for uid in os.getenv('ADMIN_USER_IDS', '').split(',') if uid.strip()]
 
@@ -46,7 +150,27 @@ BOT_SETTINGS = {
     'max_images_per_product': 10,  # حداکثر تعداد عکس برای محصول
     'max_images_per_category': 1,  # حداکثر تعداد عکس برای دسته‌بندی
     'temp_image_path': '/tmp',  # مسیر ذخیره موقت عکس‌ها
+    'max_in_memory_image_size': int(os.getenv('MAX_IN_MEMORY_IMAGE_SIZE', 10 * 1024 * 1024)),  # عکس‌های بزرگ‌تر روی دیسک موقت می‌روند (بایت)
     'default_media_type': 'product',  # نوع پیش‌فرض: product یا category
+    'concurrent_updates': int(os.getenv('CONCURRENT_UPDATES', 16)),  # تعداد آپدیت‌هایی که همزمان پردازش می‌شوند
+    'media_group_window': float(os.getenv('MEDIA_GROUP_WINDOW', 1.0)),  # انتظار برای بقیه عکس‌های آلبوم (ثانیه)
+    'album_upload_parallelism': int(os.getenv('ALBUM_UPLOAD_PARALLELISM', 4)),  # دانلود/آپلود همزمان عکس‌های آلبوم
+    'products_page_size': int(os.getenv('PRODUCTS_PAGE_SIZE', 20)),  # تعداد محصول در هر صفحه /products
+    'bulk_confirm_timeout': int(os.getenv('BULK_CONFIRM_TIMEOUT', 300)),  # اعتبار دکمه تأیید تغییر گروهی یا ویرایش/حذف محصول (ثانیه)
+}
+
+# وارد کردن گروهی محصولات از فایل CSV/XLSX
+IMPORT_SETTINGS = {
+    'chunk_size': int(os.getenv('IMPORT_CHUNK_SIZE', 500)),  # تعداد ردیف هر INSERT چند ردیفی (و هر تراکنش)
+    'max_file_size': int(os.getenv('IMPORT_MAX_FILE_SIZE', 20 * 1024 * 1024)),  # سقف دانلود فایل با Bot API (بایت)
+    'progress_interval': float(os.getenv('IMPORT_PROGRESS_INTERVAL', 2.0)),  # فاصله ویرایش پیام پیشرفت (ثانیه)
+}
+
+# خروجی گرفتن از کل کاتالوگ با /export
+EXPORT_SETTINGS = {
+    'batch_size': int(os.getenv('EXPORT_BATCH_SIZE', 1000)),  # تعداد ردیف هر fetchmany از cursor سمت سرور
+    'default_format': os.getenv('EXPORT_FORMAT', 'csv'),  # csv یا jsonl
+    'max_upload_size': int(os.getenv('EXPORT_MAX_UPLOAD_SIZE', 50 * 1024 * 1024)),  # سقف ارسال فایل با Bot API (بایت)
 }
 
 # Bot Messages
@@ -104,6 +228,48 @@ MESSAGES = {
 💡 {hint}
     """,
     
+    'album_uploading': '📸 در حال آپلود {count} عکس آلبوم...',
+    
+    'album_uploaded_product': """
+✅ {count} عکس از آلبوم آپلود شد!
+{lines}
+📊 مجموع عکس‌ها: {total}
+{notes}
+
+💡 {hint}
+    """,
+    
+    'image_duplicate': '♻️ این عکس قبلاً آپلود شده بود؛ از همان فایل استفاده شد.',
+    
+    'import_started': '📥 در حال وارد کردن محصولات از فایل...',
+    'import_progress': '📥 در حال وارد کردن محصولات...\n\n📄 {processed} ردیف بررسی شد\n✅ {imported} محصول اضافه شد\n❌ {failed} ردیف خطا',
+    'import_done': '✅ وارد کردن محصولات تمام شد\n\n📄 {processed} ردیف بررسی شد\n✅ {imported} محصول اضافه شد\n❌ {failed} ردیف خطا',
+    'import_error_report': '📄 گزارش ردیف‌های وارد نشده',
+    'import_unsupported': '❌ فقط فایل CSV یا XLSX قابل وارد کردن است (برای XLSX پکیج openpyxl لازم است).',
+    'import_too_large': '❌ حجم فایل بیشتر از حد مجاز است.',
+    'import_failed': '❌ خطا در وارد کردن فایل: {error}',
+    
+    'bulk_preview': '⚠️ {description}\n\n📦 {count} محصول تغییر می‌کند. تأیید می‌کنید؟',
+    'bulk_preview_file': '⚠️ قیمت/موجودی {count} محصول از روی فایل تغییر می‌کند ({missing} SKU در فروشگاه نیست). تأیید می‌کنید؟',
+    'bulk_done': '✅ تغییر گروهی انجام شد: {changed} محصول از {count} محصول تغییر کرد.',
+    'bulk_failed': '❌ خطا در تغییر گروهی (هیچ محصولی تغییر نکرد): {error}',
+    'bulk_cancelled': '🚫 تغییر گروهی لغو شد.',
+    'bulk_expired': '⌛️ این تغییر گروهی منقضی شده است؛ دوباره درخواست دهید.',
+    'bulk_confirm': '✅ تأیید',
+    'bulk_cancel': '❌ لغو',
+    
+    'change_confirm_product': '❓ محصول «{identifier}» دقیقاً پیدا نشد. منظورتان «{name}» (ID: {id}) است؟',
+    'change_ambiguous_product': '❌ چند محصول با «{identifier}» هست؛ محصول را با ID یا SKU مشخص کنید.',
+    'change_failed': '❌ خطا در اجرای درخواست: {error}',
+    'change_cancelled': '🚫 درخواست لغو شد.',
+    'change_expired': '⌛️ این درخواست منقضی شده است؛ دوباره درخواست دهید.',
+    
+    'export_started': '📤 در حال آماده کردن فایل خروجی محصولات...',
+    'export_done': '✅ {count} محصول در فایل خروجی نوشته شد',
+    'export_invalid_format': '❌ فرمت خروجی باید csv یا jsonl باشد (مثال: /export jsonl)',
+    'export_too_large': '❌ فایل خروجی ({size} مگابایت) از سقف ارسال تلگرام بزرگ‌تر است.',
+    'export_failed': '❌ خطا در ساخت فایل خروجی: {error}',
+    
     'image_uploaded_category': """
 ✅ تصویر برای دسته‌بندی آپلود شد!
 🆔 Media ID: {media_id}
@@ -125,6 +291,10 @@ MESSAGES = {
     
     'mode_category': '📂 حالت: دسته‌بندی\nعکس بعدی برای دسته‌بندی است (فقط یک عکس)',
     
+    'page_prev': '« قبلی',
+    
+    'page_next': 'بعدی »',
+    
     'ftp_error': '❌ خطا در آپلود به سرور: {error}',
     
     'database_error': '❌ خطا در دیتابیس: {error}',
@@ -139,6 +309,8 @@ ERROR_MESSAGES = {
     'no_db_config': 'اطلاعات دیتابیس ناقص است',
     'no_ftp_config': 'اطلاعات FTP ناقص است',
     'invalid_ai_provider': 'AI_PROVIDER باید groq یا claude باشه',
+    'invalid_ai_mode': 'AI_MODE باید json یا tools باشه',
+    'invalid_image_formats': 'IMAGE_FORMATS فقط می‌تونه webp و jpeg باشه',
     'ftp_upload_failed': 'آپلود به FTP ناموفق بود',
     'db_connection_failed': 'اتصال به دیتابیس ناموفق بود',
 }
@@ -158,6 +330,12 @@ def validate_config():
     elif AI_PROVIDER not in ['groq', 'claude']:
         errors.append(ERROR_MESSAGES['invalid_ai_provider'])
     
+    if AI_SETTINGS['mode'] not in ['json', 'tools']:
+        errors.append(ERROR_MESSAGES['invalid_ai_mode'])
+    
+    if not set(IMAGE_PROCESSING['formats']) <= {'webp', 'jpeg'}:
+        errors.append(ERROR_MESSAGES['invalid_image_formats'])
+    
     if not DB_CONFIG.get('user') or not DB_CONFIG.get('password'):
         errors.append(ERROR_MESSAGES['no_db_config'])
     
@@ -1,350 +1,453 @@
+import json
+import queue
+import threading
+import time
+from contextlib import contextmanager
 import mysql.connector
 from mysql.connector import Error
+from mysql.connector.errors import PoolError
 from typing import Optional, List, Dict, Any
 import config
-from datetime import datetime
+from text_normalizer import normalize as normalize_text
 
 
-class Database:
-    def __init__(self):
-        self.connection = None
-        self.connect()
+class ConnectionPool:
+    """Pool اتصال‌های MySQL با health-check هنگام تحویل و reconnect خودکار"""
+
+    def __init__(self, db_config: Dict[str, Any], min_size: int = 2, max_size: int = 10,
+                 timeout: float = 5.0, health_check: bool = True):
+        self.db_config = db_config
+        self.min_size = min_size
+        self.max_size = max(max_size, min_size, 1)
+        self.timeout = timeout
+        self.health_check = health_check
+
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._size = 0
+        self._closed = False
+
+        # متریک‌ها
+        self._checkouts = 0
+        self._timeouts = 0
+        self._reconnects = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+        for _ in range(self.min_size):
+            self._idle.put(self._create_connection())
+        print(f"Pool دیتابیس MySQL آماده شد ({self.min_size}-{self.max_size} اتصال).")
+
+    def _create_connection(self):
+        """ساخت اتصال جدید و ثبت آن در ظرفیت pool"""
+        with self._lock:
+            self._size += 1
+        return self._open_reserved()
 
-    def connect(self):
-        """اتصال به دیتابیس MySQL"""
+    def _open_reserved(self):
+        """باز کردن اتصال برای ظرفیتی که از قبل رزرو شده"""
         try:
-            self.connection = mysql.connector.connect(**config.DB_CONFIG)
-            if self.connection.is_connected():
-                print("اتصال به دیتابیس MySQL برقرار شد.")
+            return mysql.connector.connect(**self.db_config)
         except Error as e:
+            with self._lock:
+                self._size -= 1
             print(f"خطا در اتصال به دیتابیس: {e}")
             raise
 
-    def execute_query(self, query: str, params: tuple = None, fetch: bool = False):
-        """اجرای کوئری"""
-        cursor = self.connection.cursor(dictionary=True)
+    def _discard(self, connection):
+        """کنار گذاشتن اتصال خراب"""
+        with self._lock:
+            self._size -= 1
         try:
-            cursor.execute(query, params or ())
-            if fetch:
-                return cursor.fetchall()
-            else:
-                self.connection.commit()
-                return cursor.lastrowid
+            connection.close()
+        except Error:
+            pass
+
+    def _ensure_alive(self, connection):
+        """health-check اتصال قبل از تحویل؛ در صورت قطعی، اتصال دوباره ساخته می‌شود"""
+        try:
+            connection.ping(reconnect=True, attempts=2, delay=0)
+            return connection
         except Error as e:
-            print(f"خطا در اجرای کوئری: {e}")
-            self.connection.rollback()
-            raise
+            print(f"⚠️ اتصال دیتابیس قطع شده بود، اتصال جدید ساخته می‌شود: {e}")
+            self._discard(connection)
+            with self._lock:
+                self._reconnects += 1
+            return self._create_connection()
+
+    def acquire(self):
+        """گرفتن یک اتصال از pool (در صورت پر بودن، تا timeout صبر می‌کند)"""
+        if self._closed:
+            raise PoolError("Pool دیتابیس بسته شده است")
+
+        start = time.perf_counter()
+        try:
+            connection = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_grow = self._size < self.max_size
+                if can_grow:
+                    self._size += 1
+            if can_grow:
+                connection = self._open_reserved()
+            else:
+                try:
+                    connection = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    with self._lock:
+                        self._timeouts += 1
+                    raise PoolError(f"هیچ اتصال آزادی در {self.timeout} ثانیه پیدا نشد")
+
+        wait = time.perf_counter() - start
+        with self._lock:
+            self._checkouts += 1
+            self._total_wait += wait
+            self._max_wait = max(self._max_wait, wait)
+
+        if self.health_check:
+            connection = self._ensure_alive(connection)
+        return connection
+
+    def release(self, connection):
+        """برگرداندن اتصال به pool"""
+        if self._closed:
+            self._discard(connection)
+            return
+        try:
+            # پایان دادن به تراکنش خواندنی باز تا snapshot قدیمی به کاربر بعدی نرسد
+            if connection.in_transaction:
+                connection.rollback()
+        except Error:
+            self._discard(connection)
+            return
+        self._idle.put(connection)
+
+    @contextmanager
+    def connection(self):
+        """context manager برای گرفتن و برگرداندن اتصال"""
+        connection = self.acquire()
+        try:
+            yield connection
         finally:
-            cursor.close()
-
-    # ==================== محصولات ====================
-    
-    def add_product(self, product_data: Dict[str, Any]) -> int:
-        """افزودن محصول جدید"""
-        query = """
-        INSERT INTO products (
-            name, price, stock, sku, category_id, brand_id,
-            description, weight, weight_unit, is_same_day_shipping,
-            requires_preparation, preparation_days, is_limited_stock,
-            discount_amount, discount_percent, is_featured,
-            is_visible, is_active, order_limit
-        ) VALUES (
-            %(name)s, %(price)s, %(stock)s, %(sku)s, %(category_id)s, %(brand_id)s,
-            %(description)s, %(weight)s, %(weight_unit)s, %(is_same_day_shipping)s,
-            %(requires_preparation)s, %(preparation_days)s, %(is_limited_stock)s,
-            %(discount_amount)s, %(discount_percent)s, %(is_featured)s,
-            %(is_visible)s, %(is_active)s, %(order_limit)s
+            self.release(connection)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """متریک‌های pool (زمان انتظار بر حسب میلی‌ثانیه)"""
+        with self._lock:
+            idle = self._idle.qsize()
+            return {
+                'size': self._size,
+                'idle': idle,
+                'in_use': self._size - idle,
+                'max_size': self.max_size,
+                'checkouts': self._checkouts,
+                'timeouts': self._timeouts,
+                'reconnects': self._reconnects,
+                'avg_wait_ms': (self._total_wait / self._checkouts * 1000) if self._checkouts else 0.0,
+                'max_wait_ms': self._max_wait * 1000,
+            }
+
+    def close(self):
+        """بستن تمام اتصال‌های آزاد pool"""
+        self._closed = True
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                break
+        print("Pool دیتابیس بسته شد.")
+
+
+# pool مشترک بین تمام هندلرها
+_shared_pool: Optional[ConnectionPool] = None
+_shared_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """دریافت (یا ساخت) pool مشترک دیتابیس"""
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is None:
+            _shared_pool = ConnectionPool(config.DB_CONFIG, **config.DB_POOL_CONFIG)
+        return _shared_pool
+
+
+def close_pool():
+    """بستن pool مشترک (هنگام خاموش شدن بات)"""
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is not None:
+            _shared_pool.close()
+            _shared_pool = None
+
+
+# نسخه داده‌های مرجع (دسته‌بندی‌ها و برندها)؛ با هر تغییر موفق یکی زیاد می‌شود
+# تا کش‌هایی مثل system prompt بدانند کی باید دوباره ساخته شوند
+_reference_version = 0
+_reference_version_lock = threading.Lock()
+
+
+def get_reference_version() -> int:
+    """نسخه فعلی داده‌های مرجع"""
+    return _reference_version
+
+
+def bump_reference_version():
+    """باطل کردن کش‌های وابسته به دسته‌بندی‌ها و برندها"""
+    global _reference_version
+    with _reference_version_lock:
+        _reference_version += 1
+
+
+# کوئری بارگذاری هر جدول مرجع و ستون نام آن
+REFERENCE_TABLES = {
+    'categories': ("""
+        SELECT c.*, p.title as parent_name
+        FROM categories c
+        LEFT JOIN categories p ON c.parent_id = p.id
+        ORDER BY c.level, c.display_order
+        """, 'title'),
+    'brands': ("SELECT * FROM brands ORDER BY name", 'name'),
+}
+
+
+class ReferenceTable:
+    """ردیف‌های یک جدول مرجع با index بر اساس id و نام نرمال شده"""
+
+    def __init__(self, rows: List[Dict], name_field: str, version: int):
+        self.rows = list(rows)
+        self.name_field = name_field
+        self.version = version
+        self.loaded_at = time.monotonic()
+
+        self.by_id = {row['id']: row for row in self.rows}
+        # (نام نرمال شده, ردیف) به ترتیب کوئری؛ ردیف‌هایی که خارج از بات ساخته شده‌اند ستون نرمال شده ندارند
+        self._names = [
+            (row.get(f'{name_field}_normalized') or normalize_text(row[name_field]), row)
+            for row in self.rows
+        ]
+        self.by_name: Dict[str, Dict] = {}
+        for key, row in self._names:
+            self.by_name.setdefault(key, row)
+
+    def find_by_id(self, row_id: Any) -> Optional[Dict]:
+        """ردیف با id؛ id متنی (مثل "5" در پاسخ JSON مدل) هم پذیرفته می‌شود"""
+        try:
+            row_id = int(row_id)
+        except (TypeError, ValueError):
+            return None
+        return self.by_id.get(row_id)
+
+    def find_by_name(self, name: str) -> Optional[Dict]:
+        """مثل _find_by_normalized_name: اول نام برابر، بعد نامی که عبارت را شامل شود"""
+        normalized = normalize_text(name)
+        if not normalized:
+            return None
+        row = self.by_name.get(normalized)
+        if row is None:
+            row = next((row for key, row in self._names if normalized in key), None)
+        return row
+
+
+class ReferenceCache:
+    """
+    کش مشترک دسته‌بندی‌ها و برندها برای Database و AsyncDatabase
+
+    هر جدول با نسخه داده‌های مرجع ذخیره می‌شود؛ add/update/delete نسخه را زیاد می‌کنند
+    و خواندن بعدی از دیتابیس انجام می‌شود. TTL تغییرات خارج از بات را پوشش می‌دهد.
+    """
+
+    def __init__(self, enabled: bool = True, ttl: int = 0):
+        self.enabled = enabled
+        self.ttl = ttl
+        self._tables: Dict[str, ReferenceTable] = {}
+        self._lock = threading.Lock()
+
+        # متریک‌ها به تفکیک جدول
+        self.hits = {table: 0 for table in REFERENCE_TABLES}
+        self.misses = {table: 0 for table in REFERENCE_TABLES}
+
+    def get(self, table: str) -> Optional[ReferenceTable]:
+        """جدول کش شده اگر هنوز معتبر است"""
+        cached = self._tables.get(table) if self.enabled else None
+        valid = (
+            cached is not None
+            and cached.version == get_reference_version()
+            and (not self.ttl or time.monotonic() - cached.loaded_at < self.ttl)
         )
-        """
-        
-        # مقادیر پیش‌فرض
-        defaults = {
-            'stock': 0,
-            'weight': 0,
-            'weight_unit': 'کیلوگرم',
-            'is_same_day_shipping': 0,
-            'requires_preparation': 0,
-            'preparation_days': None,
-            'is_limited_stock': 0,
-            'discount_amount': 0,
-            'discount_percent': 0,
-            'is_featured': 0,
-            'is_visible': 1,
-            'is_active': 1,
-            'order_limit': None,
-            'description': None,
-            'brand_id': None
-        }
-        
-        # ترکیب مقادیر پیش‌فرض با داده‌های ورودی
-        product_data = {**defaults, **product_data}
-        
-        return self.execute_query(query, product_data)
-
-    def update_product(self, product_id: int, product_data: Dict[str, Any]) -> bool:
-        """ویرایش محصول"""
-        # ساخت dynamic query برای فیلدهایی که باید به‌روزرسانی شوند
-        set_clause = ", ".join([f"{key} = %({key})s" for key in product_data.keys()])
-        query = f"UPDATE products SET {set_clause} WHERE id = %(id)s"
-        
-        product_data['id'] = product_id
-        self.execute_query(query, product_data)
-        return True
-
-    def get_product_by_id(self, product_id: int) -> Optional[Dict]:
-        """دریافت محصول با ID"""
-        query = """
-        SELECT p.*, c.title as category_name, b.name as brand_name
-        FROM products p
-        LEFT JOIN categories c ON p.category_id = c.id
-        LEFT JOIN brands b ON p.brand_id = b.id
-        WHERE p.id = %s
-        """
-        result = self.execute_query(query, (product_id,), fetch=True)
-        return result[0] if result else None
-
-    def get_product_by_name(self, name: str) -> Optional[Dict]:
-        """جستجوی محصول با نام"""
-        query = """
-        SELECT p.*, c.title as category_name, b.name as brand_name
-        FROM products p
-        LEFT JOIN categories c ON p.category_id = c.id
-        LEFT JOIN brands b ON p.brand_id = b.id
-        WHERE p.name LIKE %s
-        """
-        result = self.execute_query(query, (f'%{name}%',), fetch=True)
-        return result[0] if result else None
+        with self._lock:
+            if valid:
+                self.hits[table] += 1
+            else:
+                self.misses[table] += 1
+        return cached if valid else None
+
+    def store(self, table: str, reference: ReferenceTable):
+        """ذخیره جدول بارگذاری شده (نسخه قبل از خواندن دیتابیس گرفته شده است)"""
+        if self.enabled:
+            self._tables[table] = reference
+
+    def get_stats(self) -> Dict[str, Any]:
+        """hit/miss و اندازه هر جدول"""
+        stats = {}
+        for table in REFERENCE_TABLES:
+            lookups = self.hits[table] + self.misses[table]
+            cached = self._tables.get(table)
+            stats[table] = {
+                'hits': self.hits[table],
+                'misses': self.misses[table],
+                'hit_rate': self.hits[table] / lookups if lookups else 0.0,
+                'size': len(cached.rows) if cached else 0,
+            }
+        return stats
+
+
+# کش مشترک بین تمام نمونه‌های Database و AsyncDatabase
+_reference_cache = ReferenceCache(**config.REFERENCE_CACHE)
+
+
+def get_reference_cache() -> ReferenceCache:
+    """کش مشترک داده‌های مرجع"""
+    return _reference_cache
+
+
+def serialize_media_variants(media: Dict[str, Any]) -> Dict[str, Any]:
+    """تبدیل variants رسانه به JSON برای ستون variants"""
+    if media.get('variants') is not None and not isinstance(media['variants'], str):
+        media['variants'] = json.dumps(media['variants'])
+    return media
+
+
+def with_normalized_name(data: Dict[str, Any], field: str, normalized_field: str) -> Dict[str, Any]:
+    """افزودن نسخه نرمال شده نام (برای ستون‌های *_normalized) وقتی نام در داده‌ها هست"""
+    if field in data:
+        data = {**data, normalized_field: normalize_text(data[field])}
+    return data
+
+
+# ستون‌های INSERT محصول (add_product و add_products)
+PRODUCT_INSERT_QUERY = """
+INSERT INTO products (
+    name, name_normalized, price, stock, sku, category_id, brand_id,
+    description, weight, weight_unit, is_same_day_shipping,
+    requires_preparation, preparation_days, is_limited_stock,
+    discount_amount, discount_percent, is_featured,
+    is_visible, is_active, order_limit, media_pinned_id
+) VALUES (
+    %(name)s, %(name_normalized)s, %(price)s, %(stock)s, %(sku)s, %(category_id)s, %(brand_id)s,
+    %(description)s, %(weight)s, %(weight_unit)s, %(is_same_day_shipping)s,
+    %(requires_preparation)s, %(preparation_days)s, %(is_limited_stock)s,
+    %(discount_amount)s, %(discount_percent)s, %(is_featured)s,
+    %(is_visible)s, %(is_active)s, %(order_limit)s, %(media_pinned_id)s
+)
+"""
+
+# لیست آخرین محصولات (get_all_products)
+PRODUCT_LIST_QUERY = """
+SELECT p.id, p.name, p.price, p.stock, c.title as category_name,
+       b.name as brand_name, p.is_active
+FROM products p
+LEFT JOIN categories c ON p.category_id = c.id
+LEFT JOIN brands b ON p.brand_id = b.id
+ORDER BY p.created_at DESC
+LIMIT %s
+"""
+
+# تمام محصولات برای /export؛ آدرس عکس‌ها با subquery (بدون GROUP BY روی کل جدول) تا ردیف‌ها
+# به ترتیب id و بدون جدول موقت از سرور استریم شوند
+PRODUCT_EXPORT_QUERY = """
+SELECT p.id, p.sku, p.name, p.price, p.stock, p.discount_amount, p.discount_percent,
+       p.weight, p.weight_unit, p.is_active, p.is_visible,
+       p.category_id, c.title AS category_name, p.brand_id, b.name AS brand_name,
+       p.description, p.created_at,
+       (SELECT GROUP_CONCAT(m.url ORDER BY m.id SEPARATOR ' ')
+        FROM medias m WHERE m.product_id = p.id) AS media_urls
+FROM products p
+LEFT JOIN categories c ON p.category_id = c.id
+LEFT JOIN brands b ON p.brand_id = b.id
+ORDER BY p.id
+"""
+
+# مقادیر پیش‌فرض محصول
+PRODUCT_DEFAULTS = {
+    'stock': 0,
+    'weight': 0,
+    'weight_unit': 'کیلوگرم',
+    'is_same_day_shipping': 0,
+    'requires_preparation': 0,
+    'preparation_days': None,
+    'is_limited_stock': 0,
+    'discount_amount': 0,
+    'discount_percent': 0,
+    'is_featured': 0,
+    'is_visible': 1,
+    'is_active': 1,
+    'order_limit': None,
+    'description': None,
+    'brand_id': None,
+    'media_pinned_id': None
+}
+
+# ستون‌های INSERT رسانه (add_media و add_medias)
+MEDIA_INSERT_QUERY = """
+INSERT INTO medias (url, type, alt_text, product_id, category_id, user_id, telegram_user_id, variants,
+                    content_hash, phash)
+VALUES (%(url)s, %(type)s, %(alt_text)s, %(product_id)s, %(category_id)s, %(user_id)s, %(telegram_user_id)s,
+        %(variants)s, %(content_hash)s, %(phash)s)
+"""
+
+# مقادیر پیش‌فرض رسانه
+MEDIA_DEFAULTS = {
+    'type': 'image',
+    'alt_text': None,
+    'product_id': None,
+    'category_id': None,
+    'user_id': None,
+    'telegram_user_id': None,
+    'variants': None,
+    'content_hash': None,
+    'phash': None
+}
+
+
+class Database:
+    """دسترسی همگام به دیتابیس برای test_bot (migration مستقیم از pool استفاده می‌کند)؛ بات از AsyncDatabase استفاده می‌کند"""
+
+    def __init__(self, pool: Optional[ConnectionPool] = None):
+        self.pool = pool or get_pool()
+
+    def execute_query(self, query: str, params: tuple = None, fetch: bool = False):
+        """اجرای کوئری روی یک اتصال از pool"""
+        with self.pool.connection() as connection:
+            cursor = connection.cursor(dictionary=True)
+            try:
+                cursor.execute(query, params or ())
+                if fetch:
+                    return cursor.fetchall()
+                connection.commit()
+                return cursor.lastrowid
+            except Error as e:
+                print(f"خطا در اجرای کوئری: {e}")
+                connection.rollback()
+                raise
+            finally:
+                cursor.close()
 
     def get_all_products(self, limit: int = 50) -> List[Dict]:
         """دریافت لیست محصولات"""
-        query = """
-        SELECT p.id, p.name, p.price, p.stock, c.title as category_name, 
-               b.name as brand_name, p.is_active
-        FROM products p
-        LEFT JOIN categories c ON p.category_id = c.id
-        LEFT JOIN brands b ON p.brand_id = b.id
-        ORDER BY p.created_at DESC
-        LIMIT %s
-        """
-        return self.execute_query(query, (limit,), fetch=True)
-
-    def delete_product(self, product_id: int) -> bool:
-        """حذف محصول"""
-        query = "DELETE FROM products WHERE id = %s"
-        self.execute_query(query, (product_id,))
-        return True
-
-    # ==================== دسته‌بندی‌ها ====================
-    
-    def add_category(self, category_data: Dict[str, Any]) -> int:
-        """افزودن دسته‌بندی جدید"""
-        query = """
-        INSERT INTO categories (
-            title, slug, description, parent_id, level, 
-            discount, display_order, is_active
-        ) VALUES (
-            %(title)s, %(slug)s, %(description)s, %(parent_id)s, %(level)s,
-            %(discount)s, %(display_order)s, %(is_active)s
-        )
-        """
-        
-        defaults = {
-            'description': None,
-            'parent_id': None,
-            'level': 0,
-            'discount': None,
-            'display_order': 0,
-            'is_active': 1
-        }
-        
-        category_data = {**defaults, **category_data}
-        return self.execute_query(query, category_data)
-
-    def get_category_by_name(self, title: str) -> Optional[Dict]:
-        """جستجوی دسته‌بندی با نام"""
-        query = "SELECT * FROM categories WHERE title LIKE %s"
-        result = self.execute_query(query, (f'%{title}%',), fetch=True)
-        return result[0] if result else None
-
-    def get_category_by_id(self, category_id: int) -> Optional[Dict]:
-        """دریافت دسته‌بندی با ID"""
-        query = "SELECT * FROM categories WHERE id = %s"
-        result = self.execute_query(query, (category_id,), fetch=True)
-        return result[0] if result else None
+        return self.execute_query(PRODUCT_LIST_QUERY, (limit,), fetch=True)
 
     def get_all_categories(self) -> List[Dict]:
         """دریافت لیست تمام دسته‌بندی‌ها"""
-        query = """
-        SELECT c.*, p.title as parent_name
-        FROM categories c
-        LEFT JOIN categories p ON c.parent_id = p.id
-        ORDER BY c.level, c.display_order
-        """
-        return self.execute_query(query, fetch=True)
-
-    def update_category(self, category_id: int, category_data: Dict[str, Any]) -> bool:
-        """ویرایش دسته‌بندی"""
-        set_clause = ", ".join([f"{key} = %({key})s" for key in category_data.keys()])
-        query = f"UPDATE categories SET {set_clause} WHERE id = %(id)s"
-        
-        category_data['id'] = category_id
-        self.execute_query(query, category_data)
-        return True
-
-    def delete_category(self, category_id: int) -> bool:
-        """حذف دسته‌بندی"""
-        query = "DELETE FROM categories WHERE id = %s"
-        self.execute_query(query, (category_id,))
-        return True
-
-    # ==================== برندها ====================
-    
-    def add_brand(self, brand_data: Dict[str, Any]) -> int:
-        """افزودن برند جدید"""
-        query = """
-        INSERT INTO brands (name, slug, logo, is_active)
-        VALUES (%(name)s, %(slug)s, %(logo)s, %(is_active)s)
-        """
-        
-        defaults = {
-            'logo': '',
-            'is_active': 1
-        }
-        
-        brand_data = {**defaults, **brand_data}
-        return self.execute_query(query, brand_data)
-
-    def get_brand_by_name(self, name: str) -> Optional[Dict]:
-        """جستجوی برند با نام"""
-        query = "SELECT * FROM brands WHERE name LIKE %s"
-        result = self.execute_query(query, (f'%{name}%',), fetch=True)
-        return result[0] if result else None
+        return self.execute_query(REFERENCE_TABLES['categories'][0], fetch=True)
 
     def get_all_brands(self) -> List[Dict]:
         """دریافت لیست تمام برندها"""
-        query = "SELECT * FROM brands ORDER BY name"
-        return self.execute_query(query, fetch=True)
-
-    def update_brand(self, brand_id: int, brand_data: Dict[str, Any]) -> bool:
-        """ویرایش برند"""
-        set_clause = ", ".join([f"{key} = %({key})s" for key in brand_data.keys()])
-        query = f"UPDATE brands SET {set_clause} WHERE id = %(id)s"
-        
-        brand_data['id'] = brand_id
-        self.execute_query(query, brand_data)
-        return True
-
-    def delete_brand(self, brand_id: int) -> bool:
-        """حذف برند"""
-        query = "DELETE FROM brands WHERE id = %s"
-        self.execute_query(query, (brand_id,))
-        return True
-
-    # ==================== ویژگی‌ها ====================
-    
-    def add_attribute(self, attribute_data: Dict[str, Any]) -> int:
-        """افزودن ویژگی جدید"""
-        query = """
-        INSERT INTO attributes (
-            name, slug, type, is_public, is_variant, 
-            group_id, display_order, is_active
-        ) VALUES (
-            %(name)s, %(slug)s, %(type)s, %(is_public)s, %(is_variant)s,
-            %(group_id)s, %(display_order)s, %(is_active)s
-        )
-        """
-        
-        defaults = {
-            'type': 'text',
-            'is_public': 0,
-            'is_variant': 0,
-            'group_id': None,
-            'display_order': 0,
-            'is_active': 1
-        }
-        
-        attribute_data = {**defaults, **attribute_data}
-        return self.execute_query(query, attribute_data)
-
-    def get_all_attributes(self) -> List[Dict]:
-        """دریافت لیست تمام ویژگی‌ها"""
-        query = """
-        SELECT a.*, ag.name as group_name
-        FROM attributes a
-        LEFT JOIN attribute_groups ag ON a.group_id = ag.id
-        ORDER BY a.display_order
-        """
-        return self.execute_query(query, fetch=True)
-
-    # ==================== راهنمای محصول ====================
-    
-    def add_helper(self, helper_data: Dict[str, Any]) -> int:
-        """افزودن راهنمای محصول"""
-        query = """
-        INSERT INTO helpers (title, description, image, product_id)
-        VALUES (%(title)s, %(description)s, %(image)s, %(product_id)s)
-        """
-        
-        defaults = {
-            'image': None
-        }
-        
-        helper_data = {**defaults, **helper_data}
-        return self.execute_query(query, helper_data)
-
-    def get_helper_by_product(self, product_id: int) -> Optional[Dict]:
-        """دریافت راهنمای محصول"""
-        query = "SELECT * FROM helpers WHERE product_id = %s"
-        result = self.execute_query(query, (product_id,), fetch=True)
-        return result[0] if result else None
-
-    # ==================== رسانه‌ها ====================
-    
-    def add_media(self, media_data: Dict[str, Any]) -> int:
-        """افزودن رسانه (تصویر/ویدیو)"""
-        query = """
-        INSERT INTO medias (url, type, alt_text, product_id, category_id, user_id)
-        VALUES (%(url)s, %(type)s, %(alt_text)s, %(product_id)s, %(category_id)s, %(user_id)s)
-        """
-        
-        defaults = {
-            'type': 'image',
-            'alt_text': None,
-            'product_id': None,
-            'category_id': None,
-            'user_id': None
-        }
-        
-        media_data = {**defaults, **media_data}
-        return self.execute_query(query, media_data)
-
-    def get_product_medias(self, product_id: int) -> List[Dict]:
-        """دریافت رسانه‌های محصول"""
-        query = "SELECT * FROM medias WHERE product_id = %s ORDER BY created_at"
-        return self.execute_query(query, (product_id,), fetch=True)
-
-    # ==================== جستجو ====================
-    
-    def search_products(self, search_term: str, limit: int = 20) -> List[Dict]:
-        """جستجوی محصولات"""
-        query = """
-        SELECT p.id, p.name, p.price, p.stock, c.title as category_name, 
-               b.name as brand_name
-        FROM products p
-        LEFT JOIN categories c ON p.category_id = c.id
-        LEFT JOIN brands b ON p.brand_id = b.id
-        WHERE p.name LIKE %s OR p.description LIKE %s OR p.sku LIKE %s
-        ORDER BY p.created_at DESC
-        LIMIT %s
-        """
-        search_pattern = f'%{search_term}%'
-        return self.execute_query(query, (search_pattern, search_pattern, search_pattern, limit), fetch=True)
+        return self.execute_query(REFERENCE_TABLES['brands'][0], fetch=True)
 
     def close(self):
-        """بستن اتصال دیتابیس"""
-        if self.connection and self.connection.is_connected():
-            self.connection.close()
-            print("اتصال دیتابیس بسته شد.")
+        """آزاد کردن Database؛ اتصال‌ها متعلق به pool مشترک هستند و با close_pool بسته می‌شوند"""
+        self.pool = None
 
     def __enter__(self):
         return self
@@ -0,0 +1,137 @@
+import asyncio
+import functools
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Dict, Any, Callable, Optional
+import config
+
+
+class BoundedExecutor:
+    """ThreadPoolExecutor (یا ProcessPoolExecutor برای کارهای CPU) با صف محدود و متریک صف/زمان انتظار"""
+
+    def __init__(self, name: str, max_workers: int = 4, max_queue: int = 32, processes: bool = False,
+                 start_method: Optional[str] = None):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.processes = processes
+        if processes:
+            # fork از process چند-thread ای (event loop، pool های thread، قفل‌ها) می‌تواند قفل نگه داشته شده را کپی کند
+            mp_context = multiprocessing.get_context(start_method) if start_method else None
+            self._executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=mp_context)
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-pool")
+        # سقف کارهای در حال اجرا + در صف؛ بیشتر از این، فراخواننده منتظر می‌ماند
+        self._slots = asyncio.Semaphore(max_workers + max_queue)
+
+        # متریک‌ها (از event loop و thread های pool به‌روز می‌شوند)
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._completed = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._total_run = 0.0
+
+    async def run(self, func: Callable, *args, **kwargs):
+        """اجرای تابع blocking در pool و انتظار برای نتیجه"""
+        submitted_at = time.perf_counter()
+        async with self._slots:
+            with self._lock:
+                self._queued += 1
+                queue_depth = self._queued + self._running
+            loop = asyncio.get_running_loop()
+            try:
+                if self.processes:
+                    return await self._run_in_process(loop, submitted_at, func, *args, **kwargs)
+                return await loop.run_in_executor(
+                    self._executor,
+                    functools.partial(self._call, submitted_at, func, *args, **kwargs)
+                )
+            finally:
+                self._log(queue_depth)
+
+    async def _run_in_process(self, loop, submitted_at: float, func: Callable, *args, **kwargs):
+        """اجرا در process pool؛ متریک‌ها در process اصلی ثبت می‌شوند و زمان انتظار جزو زمان اجراست"""
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+        try:
+            return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._completed += 1
+                self._total_run += time.perf_counter() - submitted_at
+
+    def _call(self, submitted_at: float, func: Callable, *args, **kwargs):
+        """اجرا داخل thread pool و ثبت زمان انتظار/اجرا"""
+        started_at = time.perf_counter()
+        wait = started_at - submitted_at
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+            self._total_wait += wait
+            self._max_wait = max(self._max_wait, wait)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._completed += 1
+                self._total_run += time.perf_counter() - started_at
+
+    def _log(self, queue_depth: int):
+        """لاگ وقتی کارها پشت سر هم صف می‌شوند (نشانه کوچک بودن pool)"""
+        if queue_depth > self.max_workers:
+            print(
+                f"⚠️ pool {self.name}: {queue_depth} کار در صف/اجرا "
+                f"(ظرفیت {self.max_workers}) - میانگین انتظار {self.get_stats()['avg_wait_ms']:.1f}ms"
+            )
+
+    def get_stats(self) -> Dict[str, Any]:
+        """متریک‌های pool (زمان‌ها بر حسب میلی‌ثانیه)"""
+        with self._lock:
+            return {
+                'max_workers': self.max_workers,
+                'queued': self._queued,
+                'running': self._running,
+                'completed': self._completed,
+                'avg_wait_ms': (self._total_wait / self._completed * 1000) if self._completed else 0.0,
+                'max_wait_ms': self._max_wait * 1000,
+                'avg_run_ms': (self._total_run / self._completed * 1000) if self._completed else 0.0,
+            }
+
+    def shutdown(self):
+        """بستن pool"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# pool های نام‌دار، بر اساس config.EXECUTOR_POOLS
+_executors: Dict[str, BoundedExecutor] = {}
+
+
+def get_executor(name: str) -> BoundedExecutor:
+    """دریافت (یا ساخت) pool با نام داده شده"""
+    if name not in _executors:
+        _executors[name] = BoundedExecutor(name, **config.EXECUTOR_POOLS[name])
+    return _executors[name]
+
+
+async def run_blocking(pool: str, func: Callable, *args, **kwargs):
+    """اجرای یک فراخوانی blocking در pool مربوطه، بدون قفل کردن event loop"""
+    return await get_executor(pool).run(func, *args, **kwargs)
+
+
+def get_executor_stats() -> Dict[str, Dict[str, Any]]:
+    """متریک تمام pool های ساخته شده"""
+    return {name: executor.get_stats() for name, executor in _executors.items()}
+
+
+def shutdown_executors():
+    """بستن تمام pool ها (هنگام خاموش شدن بات)"""
+    for executor in _executors.values():
+        executor.shutdown()
+    _executors.clear()
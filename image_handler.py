@@ -1,67 +1,385 @@
+import asyncio
+import ftplib
+import io
 import os
+import queue
+import secrets
+import threading
 import time
+from contextlib import contextmanager
 from ftplib import FTP
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Any, Union, BinaryIO
 import config
-from database import Database
+import image_processing
+from async_database import AsyncDatabase
+from executors import run_blocking
+
+
+class FTPPoolTimeout(Exception):
+    """در مهلت تعیین شده هیچ نشست FTP آزاد نشد"""
+
+
+class FTPSessionPool:
+    """Pool نشست‌های FTP لاگین شده و آماده در پوشه آپلود، با NOOP keepalive و reconnect"""
+    
+    def __init__(self, ftp_config: Dict[str, Any], max_size: int = 4,
+                 keepalive_interval: float = 60, timeout: float = 30, acquire_timeout: float = 60):
+        self.ftp_config = ftp_config
+        self.max_size = max_size
+        self.keepalive_interval = keepalive_interval
+        self.timeout = timeout
+        self.acquire_timeout = acquire_timeout
+        
+        # (ftp, زمان آخرین استفاده)
+        self._idle = queue.LifoQueue()
+        # تعداد نشست‌های همزمان (آزاد + در حال استفاده) هیچ‌وقت از max_size بیشتر نمی‌شود
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        
+        # متریک‌ها
+        self._created = 0
+        self._reused = 0
+        self._reconnects = 0
+        self._timeouts = 0
+    
+    def _connect(self) -> FTP:
+        """اتصال، لاگین و رفتن به پوشه مقصد"""
+        ftp = FTP(timeout=self.timeout)
+        ftp.connect(
+            self.ftp_config['host'], 
+            self.ftp_config['port']
+        )
+        ftp.login(
+            self.ftp_config['user'], 
+            self.ftp_config['password']
+        )
+        
+        # تغییر به پوشه مقصد
+        try:
+            ftp.cwd(self.ftp_config['base_path'])
+        except ftplib.error_perm:
+            # اگر پوشه وجود نداره، بسازش
+            self._create_ftp_directory(ftp, self.ftp_config['base_path'])
+            ftp.cwd(self.ftp_config['base_path'])
+        
+        with self._lock:
+            self._created += 1
+        return ftp
+    
+    def _create_ftp_directory(self, ftp: FTP, path: str):
+        """ساخت دایرکتوری در FTP"""
+        dirs = path.strip('/').split('/')
+        for directory in dirs:
+            try:
+                ftp.cwd(directory)
+            except ftplib.error_perm:
+                ftp.mkd(directory)
+                ftp.cwd(directory)
+    
+    def _close(self, ftp: FTP):
+        """بستن نشست (حتی اگر اتصال قطع شده باشد)"""
+        try:
+            ftp.quit()
+        except ftplib.all_errors:
+            ftp.close()
+    
+    def acquire(self) -> FTP:
+        """
+        گرفتن یک نشست آماده؛ نشست‌های بیکار قبل از تحویل با NOOP بررسی می‌شوند
+        
+        Raises:
+            FTPPoolTimeout: اگر تا acquire_timeout ثانیه همه نشست‌ها در حال استفاده بمانند
+        """
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            with self._lock:
+                self._timeouts += 1
+            raise FTPPoolTimeout(f"هیچ نشست FTP آزادی در {self.acquire_timeout} ثانیه پیدا نشد")
+        try:
+            try:
+                ftp, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            
+            if time.monotonic() - last_used > self.keepalive_interval:
+                try:
+                    ftp.voidcmd('NOOP')
+                except ftplib.all_errors:
+                    self._close(ftp)
+                    with self._lock:
+                        self._reconnects += 1
+                    return self._connect()
+            
+            with self._lock:
+                self._reused += 1
+            return ftp
+        except Exception:
+            self._slots.release()
+            raise
+    
+    def release(self, ftp: FTP, broken: bool = False):
+        """برگرداندن نشست به pool؛ نشست خراب بسته می‌شود"""
+        if broken:
+            self._close(ftp)
+        else:
+            self._idle.put((ftp, time.monotonic()))
+        self._slots.release()
+    
+    @contextmanager
+    def session(self):
+        """context manager نشست FTP؛ با هر خطایی نشست دور انداخته می‌شود و جای آن همیشه آزاد می‌شود"""
+        ftp = self.acquire()
+        broken = True
+        try:
+            yield ftp
+            broken = False
+        finally:
+            self.release(ftp, broken=broken)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """متریک‌های pool نشست‌ها"""
+        with self._lock:
+            return {
+                'idle': self._idle.qsize(),
+                'max_size': self.max_size,
+                'created': self._created,
+                'reused': self._reused,
+                'reconnects': self._reconnects,
+                'timeouts': self._timeouts,
+            }
+    
+    def close(self):
+        """بستن تمام نشست‌های آزاد"""
+        while True:
+            try:
+                ftp, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._close(ftp)
 
 
 class ImageHandler:
     """مدیریت آپلود تصاویر به FTP و ذخیره در دیتابیس"""
     
     def __init__(self):
-        self.db = Database()
+        self.db = AsyncDatabase()
         self.ftp_config = config.FTP_CONFIG
+        self.ftp_pool = FTPSessionPool(self.ftp_config, **config.FTP_SESSION_POOL)
     
-    async def upload_image(self, image_path: str, product_id: Optional[int] = None, 
-                          category_id: Optional[int] = None) -> Dict:
+    async def upload_image(self, image: Union[str, bytes, BinaryIO], product_id: Optional[int] = None, 
+                          category_id: Optional[int] = None, file_extension: str = '.jpg',
+                          telegram_user_id: Optional[int] = None) -> Dict:
         """
         آپلود تصویر به FTP و ذخیره در دیتابیس
         
         Args:
-            image_path: مسیر فایل تصویر
+            image: مسیر فایل، bytes یا stream تصویر
             product_id: شناسه محصول (اختیاری)
             category_id: شناسه دسته‌بندی (اختیاری)
+            file_extension: پسوند فایل وقتی تصویر از حافظه می‌آید
+            telegram_user_id: کاربر تلگرامی که عکس را فرستاده (اختیاری)
             
         Returns:
-            dict با media_id و url
+            dict با media_id، url و duplicate (فایل قبلاً آپلود شده بود)
         """
         try:
-            # ساخت نام فایل یونیک
-            timestamp = int(time.time() * 1000)
-            file_extension = os.path.splitext(image_path)[1]
-            filename = f"file-{timestamp}{file_extension}"
+            upload = await self.upload_file(image, file_extension)
+            if not upload['success']:
+                raise Exception(upload['error'])
             
-            # آپلود به FTP
-            ftp_url = self._upload_to_ftp(image_path, filename)
+            existing = upload['existing_media']
+            reusable = None
+            if (existing and telegram_user_id is not None and product_id is None and category_id is None
+                    and upload['content_hash']):
+                # فقط ردیف لینک نشده‌ی همین کاربر؛ ردیف لینک شده یا ردیف کاربر دیگر دزدیده نمی‌شود
+                # (وگرنه دو ادمین یک media_id می‌گرفتند)
+                reusable = await self.db.get_unlinked_media_by_hash(upload['content_hash'], telegram_user_id)
             
-            if not ftp_url:
-                raise Exception("خطا در آپلود به FTP")
+            if reusable:
+                media_id = reusable['id']
+            else:
+                # ذخیره در دیتابیس (برای فایل تکراری ردیف جدید با همان فایل ساخته می‌شود)
+                media_data = {
+                    'url': upload['url'],
+                    'type': 'image',
+                    'product_id': product_id,
+                    'category_id': category_id,
+                    'telegram_user_id': telegram_user_id,
+                    'variants': upload['variants'],
+                    'content_hash': upload['content_hash'],
+                    'phash': upload['phash']
+                }
+                
+                media_id = await self.db.add_media(media_data)
             
-            # ذخیره در دیتابیس
-            media_data = {
-                'url': ftp_url,
-                'type': 'image',
-                'product_id': product_id,
-                'category_id': category_id
+            return {
+                'success': True,
+                'media_id': media_id,
+                'url': upload['url'],
+                'filename': upload['filename'],
+                'duplicate': existing is not None
             }
             
-            media_id = self.db.add_media(media_data)
+        except Exception as e:
+            print(f"خطا در آپلود تصویر: {e}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
+    async def upload_file(self, image: Union[str, bytes, BinaryIO], file_extension: str = '.jpg') -> Dict:
+        """
+        آپلود فایل به FTP بدون ثبت در دیتابیس (برای آپلود گروهی)
+        
+        Args:
+            image: مسیر فایل، bytes یا stream تصویر
+            file_extension: پسوند فایل وقتی تصویر از حافظه می‌آید
+            
+        Returns:
+            dict با url، filename، variants (آدرس نسخه‌ها یا None)، hash ها و existing_media (ردیف تکراری یا None)
+        """
+        try:
+            source = self._read_source(image)
+            hashes = await self._compute_hashes(source)
+            
+            # فایل تکراری دوباره به FTP فرستاده نمی‌شود
+            existing = await self._find_duplicate(hashes)
+            if existing:
+                print(f"♻️ عکس تکراری (media {existing['id']})، آپلود انجام نشد")
+                return {
+                    'success': True,
+                    'url': existing['url'],
+                    'filename': os.path.basename(existing['url']),
+                    'variants': existing.get('variants'),
+                    'existing_media': existing,
+                    **hashes
+                }
+            
+            # ساخت نام فایل یونیک (پسوند تصادفی برای آپلودهای همزمان در یک میلی‌ثانیه)
+            timestamp = int(time.time() * 1000)
+            if isinstance(image, str):
+                file_extension = os.path.splitext(image)[1]
+            basename = f"file-{timestamp}-{secrets.token_hex(3)}"
+            
+            variants = await self._create_variants(source)
+            if variants:
+                upload = await self._upload_variants(variants, basename)
+                return {**upload, 'existing_media': None, **hashes}
+            
+            filename = f"{basename}{file_extension}"
+            
+            # آپلود به FTP (ftplib blocking است؛ در thread pool اجرا می‌شود)
+            ftp_url = await run_blocking('ftp', self._upload_to_ftp, source, filename)
+            
+            if not ftp_url:
+                raise Exception("خطا در آپلود به FTP")
             
             return {
                 'success': True,
-                'media_id': media_id,
                 'url': ftp_url,
-                'filename': filename
+                'filename': filename,
+                'variants': None,
+                'existing_media': None,
+                **hashes
             }
             
         except Exception as e:
-            print(f"خطا در آپلود تصویر: {e}")
+            print(f"خطا در آپلود فایل: {e}")
             return {
                 'success': False,
                 'error': str(e)
             }
     
+    def _read_source(self, image: Union[str, bytes, BinaryIO]) -> Union[str, bytes]:
+        """مسیر فایل یا bytes تصویر (stream ها یک بار خوانده می‌شوند)"""
+        if isinstance(image, (str, bytes)):
+            return image
+        if isinstance(image, bytearray):
+            return bytes(image)
+        return image.read()
+    
+    async def _compute_hashes(self, source: Union[str, bytes]) -> Dict[str, Any]:
+        """hash محتوا (و در صورت فعال بودن hash ادراکی) برای حذف تکراری‌ها"""
+        settings = config.MEDIA_DEDUP
+        if not settings['enabled']:
+            return {'content_hash': None, 'phash': None}
+        
+        # SHA-256 در thread اجرا می‌شود؛ فقط کار Pillow (dHash) به process pool می‌رود
+        jobs = [run_blocking('hash', image_processing.content_hash, source)]
+        if settings['perceptual'] and image_processing.is_available():
+            jobs.append(run_blocking('image', image_processing.perceptual_hash, source))
+        content_hash, *phash = await asyncio.gather(*jobs)
+        return {'content_hash': content_hash, 'phash': phash[0] if phash else None}
+    
+    async def _find_duplicate(self, hashes: Dict[str, Any]) -> Optional[Dict]:
+        """رسانه‌ای که قبلاً با همین محتوا (یا تقریباً همین تصویر) آپلود شده"""
+        if not hashes['content_hash']:
+            return None
+        
+        existing = await self.db.get_media_by_hash(hashes['content_hash'])
+        if existing is None and hashes['phash'] is not None:
+            existing = await self.db.get_media_by_phash(hashes['phash'], config.MEDIA_DEDUP['max_distance'])
+        return existing
+    
+    async def _create_variants(self, source: Union[str, bytes]) -> Optional[List[Dict[str, Any]]]:
+        """ساخت نسخه‌های تصویر در process pool؛ None یعنی عکس اصلی بدون تغییر آپلود شود"""
+        settings = config.IMAGE_PROCESSING
+        if not settings['enabled'] or not settings['sizes'] or not image_processing.is_available():
+            return None
+        
+        try:
+            return await run_blocking('image', image_processing.generate_variants, source, settings)
+        except Exception as e:
+            print(f"⚠️ ساخت نسخه‌های تصویر ناموفق بود، عکس اصلی آپلود می‌شود: {e}")
+            return None
+    
+    async def _upload_variants(self, variants: List[Dict[str, Any]], basename: str) -> Dict:
+        """آپلود همزمان تمام نسخه‌ها؛ بزرگ‌ترین نسخه (ترجیحاً JPEG) آدرس اصلی رسانه است"""
+        filenames = [f"{basename}-{v['size']}{v['extension']}" for v in variants]
+        urls = await asyncio.gather(*[
+            run_blocking('ftp', self._upload_to_ftp, variant['data'], filename)
+            for variant, filename in zip(variants, filenames)
+        ])
+        
+        if not all(urls):
+            raise Exception("خطا در آپلود نسخه‌های تصویر به FTP")
+        
+        # {"1600": {"webp": url, "jpeg": url}, "800": {...}, ...}
+        variant_urls = {}
+        for variant, url in zip(variants, urls):
+            variant_urls.setdefault(str(variant['size']), {})[variant['format']] = url
+        
+        largest = max(variants, key=lambda v: (v['size'], v['format'] == 'jpeg'))
+        index = variants.index(largest)
+        
+        return {
+            'success': True,
+            'url': urls[index],
+            'filename': filenames[index],
+            'variants': variant_urls
+        }
+    
+    async def add_medias(self, uploads: List[Dict], product_id: Optional[int] = None,
+                         category_id: Optional[int] = None, telegram_user_id: Optional[int] = None) -> List[int]:
+        """
+        ثبت گروهی تصاویر آپلود شده در دیتابیس با یک دستور INSERT
+        
+        Args:
+            uploads: نتیجه‌های موفق upload_file به ترتیب نمایش
+            product_id: شناسه محصول (اختیاری)
+            category_id: شناسه دسته‌بندی (اختیاری)
+            telegram_user_id: کاربر تلگرامی که عکس‌ها را فرستاده (اختیاری)
+            
+        Returns:
+            لیست media_id ها به همان ترتیب uploads
+        """
+        medias = [
+            {'url': upload['url'], 'type': 'image', 'product_id': product_id,
+             'category_id': category_id, 'telegram_user_id': telegram_user_id, 'variants': upload.get('variants'),
+             'content_hash': upload.get('content_hash'), 'phash': upload.get('phash')}
+            for upload in uploads
+        ]
+        return await self.db.add_medias(medias)
+    
     async def link_media_to_category(self, media_id: int, category_id: int) -> bool:
         """
         لینک کردن media به دسته‌بندی
@@ -74,8 +392,7 @@ class ImageHandler:
             bool موفقیت عملیات
         """
         try:
-            query = "UPDATE medias SET category_id = %s WHERE id = %s"
-            self.db.execute_query(query, (category_id, media_id))
+            await self.db.link_media_to_category(media_id, category_id)
             
             print(f"✅ عکس به دسته‌بندی {category_id} لینک شد")
             return True
@@ -96,9 +413,8 @@ class ImageHandler:
             bool موفقیت عملیات
         """
         try:
-            for media_id in media_ids:
-                query = "UPDATE medias SET product_id = %s WHERE id = %s"
-                self.db.execute_query(query, (product_id, media_id))
+            # یک UPDATE برای همه عکس‌ها: یک رفت و برگشت و یک commit
+            await self.db.link_medias_to_product(media_ids, product_id)
             
             print(f"✅ {len(media_ids)} عکس به محصول {product_id} لینک شد")
             return True
@@ -107,70 +423,53 @@ class ImageHandler:
             print(f"❌ خطا در لینک media ها: {e}")
             return False
     
-    def _upload_to_ftp(self, local_file: str, remote_filename: str) -> Optional[str]:
-        """آپلود فایل به FTP"""
-        try:
-            # اتصال به FTP
-            ftp = FTP()
-            ftp.connect(
-                self.ftp_config['host'], 
-                self.ftp_config['port']
-            )
-            ftp.login(
-                self.ftp_config['user'], 
-                self.ftp_config['password']
-            )
-            
-            # تغییر به پوشه مقصد
-            try:
-                ftp.cwd(self.ftp_config['base_path'])
-            except:
-                # اگر پوشه وجود نداره، بسازش
-                self._create_ftp_directory(ftp, self.ftp_config['base_path'])
-                ftp.cwd(self.ftp_config['base_path'])
-            
-            # آپلود فایل
-            with open(local_file, 'rb') as file:
-                ftp.storbinary(f'STOR {remote_filename}', file)
-            
-            ftp.quit()
-            
-            # ساخت URL کامل
-            full_url = self.ftp_config['base_url'] + remote_filename
-            print(f"✅ فایل آپلود شد: {full_url}")
-            
-            return full_url
-            
-        except Exception as e:
-            print(f"❌ خطا در FTP: {e}")
-            return None
-    
-    def _create_ftp_directory(self, ftp: FTP, path: str):
-        """ساخت دایرکتوری در FTP"""
-        dirs = path.strip('/').split('/')
-        for directory in dirs:
+    def _upload_to_ftp(self, source: Union[str, bytes, BinaryIO], remote_filename: str) -> Optional[str]:
+        """آپلود فایل (مسیر روی دیسک، bytes یا stream در حافظه) به FTP با نشست‌های آماده‌ی pool"""
+        if isinstance(source, str):
+            with open(source, 'rb') as file:
+                return self._upload_to_ftp(file, remote_filename)
+        if isinstance(source, (bytes, bytearray)):
+            source = io.BytesIO(source)
+        
+        start = source.tell()
+        # اگر نشست بیکار در این فاصله قطع شده باشد، یک بار با نشست تازه تلاش می‌شود
+        for attempt in range(2):
             try:
-                ftp.cwd(directory)
-            except:
-                ftp.mkd(directory)
-                ftp.cwd(directory)
+                source.seek(start)
+                with self.ftp_pool.session() as ftp:
+                    ftp.storbinary(f'STOR {remote_filename}', source)
+                break
+            except ftplib.all_errors as e:
+                print(f"❌ خطا در FTP: {e}")
+                if attempt:
+                    return None
+        
+        # ساخت URL کامل
+        full_url = self.ftp_config['base_url'] + remote_filename
+        print(f"✅ فایل آپلود شد: {full_url}")
+        
+        return full_url
     
-    def get_media_by_id(self, media_id: int) -> Optional[Dict]:
+    async def get_media_by_id(self, media_id: int) -> Optional[Dict]:
         """دریافت اطلاعات رسانه با ID"""
         query = "SELECT * FROM medias WHERE id = %s"
-        result = self.db.execute_query(query, (media_id,), fetch=True)
+        result = await self.db.execute_query(query, (media_id,), fetch=True)
         return result[0] if result else None
     
-    def get_product_medias(self, product_id: int) -> List[Dict]:
+    async def get_product_medias(self, product_id: int) -> List[Dict]:
         """دریافت تمام media های یک محصول"""
-        return self.db.get_product_medias(product_id)
+        return await self.db.get_product_medias(product_id)
     
-    def delete_image(self, media_id: int) -> bool:
+    async def delete_image(self, media_id: int) -> bool:
         """حذف تصویر از دیتابیس"""
         try:
             query = "DELETE FROM medias WHERE id = %s"
-            self.db.execute_query(query, (media_id,))
+            await self.db.execute_query(query, (media_id,))
             return True
         except Exception as e:
             print(f"خطا در حذف media: {e}")
             return False
+    
+    def close(self):
+        """بستن نشست‌های FTP"""
+        self.ftp_pool.close()
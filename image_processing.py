@@ -0,0 +1,138 @@
+import hashlib
+import io
+from typing import List, Dict, Any, Optional, Union
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow نصب نیست؛ عکس اصلی بدون تغییر آپلود می‌شود
+    Image = None
+
+# فرمت خروجی -> (فرمت Pillow، پسوند فایل)
+FORMATS = {
+    'webp': ('WEBP', '.webp'),
+    'jpeg': ('JPEG', '.jpg'),
+}
+
+
+def is_available() -> bool:
+    """آیا Pillow برای ساخت نسخه‌های تصویر نصب است"""
+    return Image is not None
+
+
+def _prepare(image: 'Image.Image', image_format: str) -> 'Image.Image':
+    """تبدیل mode تصویر به حالتی که فرمت خروجی پشتیبانی می‌کند"""
+    if image_format == 'JPEG':
+        if image.mode in ('RGBA', 'LA', 'P'):
+            rgba = image.convert('RGBA')
+            background = Image.new('RGB', rgba.size, (255, 255, 255))
+            background.paste(rgba, mask=rgba.getchannel('A'))
+            return background
+        if image.mode != 'RGB':
+            return image.convert('RGB')
+        return image
+    if image.mode not in ('RGB', 'RGBA'):
+        return image.convert('RGBA' if 'A' in image.getbands() or image.mode == 'P' else 'RGB')
+    return image
+
+
+def generate_variants(source: Union[str, bytes], settings: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    ساخت نسخه‌های تغییر اندازه داده شده‌ی تصویر (در process pool اجرا می‌شود)
+
+    Args:
+        source: مسیر فایل یا محتوای تصویر
+        settings: config.IMAGE_PROCESSING
+
+    Returns:
+        لیست dict با size، format، extension و data؛ به ترتیب sizes و formats
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+
+    with Image.open(source) as original:
+        # چرخش بر اساس EXIF قبل از حذف آن
+        image = ImageOps.exif_transpose(original)
+        image.load()
+    # EXIF (مکان، مدل دوربین و ...) در خروجی نوشته نمی‌شود
+    image.info.pop('exif', None)
+
+    variants = []
+    for size in settings['sizes']:
+        resized = image
+        if max(image.size) > size:
+            resized = image.copy()
+            resized.thumbnail((size, size), Image.LANCZOS)
+
+        for name in settings['formats']:
+            image_format, extension = FORMATS[name]
+            output = io.BytesIO()
+            if image_format == 'JPEG':
+                _prepare(resized, image_format).save(
+                    output, image_format,
+                    quality=settings['jpeg_quality'], optimize=True, progressive=True
+                )
+            else:
+                _prepare(resized, image_format).save(
+                    output, image_format,
+                    quality=settings['webp_quality'], method=4
+                )
+            variants.append({
+                'size': size,
+                'format': name,
+                'extension': extension,
+                'data': output.getvalue(),
+            })
+
+    return variants
+
+
+def _dhash(image: 'Image.Image') -> int:
+    """hash ادراکی 64 بیتی (difference hash) که با تغییر اندازه/فشرده‌سازی ثابت می‌ماند"""
+    pixels = list(image.convert('L').resize((9, 8), Image.LANCZOS).getdata())
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+def content_hash(source: Union[str, bytes]) -> str:
+    """
+    SHA-256 محتوای تصویر برای پیدا کردن آپلودهای تکراری (در thread pool اجرا می‌شود؛ hashlib هنگام hash کردن GIL را آزاد می‌کند)
+
+    Args:
+        source: مسیر فایل یا محتوای تصویر
+
+    Returns:
+        hex digest
+    """
+    digest = hashlib.sha256()
+    if isinstance(source, str):
+        with open(source, 'rb') as file:
+            for chunk in iter(lambda: file.read(1024 * 1024), b''):
+                digest.update(chunk)
+    else:
+        digest.update(source)
+    return digest.hexdigest()
+
+
+def perceptual_hash(source: Union[str, bytes]) -> Optional[int]:
+    """
+    dHash تصویر برای پیدا کردن عکس‌های تقریباً یکسان (در process pool اجرا می‌شود؛ نیاز به Pillow)
+
+    Args:
+        source: مسیر فایل یا محتوای تصویر
+
+    Returns:
+        hash ادراکی 64 بیتی، یا None اگر فایل تصویر معتبر نباشد
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+
+    try:
+        with Image.open(source) as image:
+            return _dhash(ImageOps.exif_transpose(image))
+    except Exception:
+        return None  # فایل تصویر معتبر نیست؛ فقط hash دقیق استفاده می‌شود
@@ -0,0 +1,130 @@
+from mysql.connector import Error
+from database import close_pool, get_pool
+from text_normalizer import normalize as normalize_text
+
+# خطاهای MySQL که یعنی تغییر قبلاً (مثلاً دستی) اعمال شده است
+ALREADY_APPLIED_ERRORS = {
+    1060,  # Duplicate column name
+    1061,  # Duplicate key name
+    1091,  # Can't DROP; index وجود ندارد
+}
+
+def _backfill_normalized(table: str, field: str, normalized_field: str):
+    """پر کردن ستون نرمال شده برای ردیف‌های موجود (نرمال‌سازی در پایتون انجام می‌شود)"""
+    def backfill(cursor):
+        cursor.execute(f"SELECT id, {field} FROM {table}")
+        rows = [(normalize_text(value), row_id) for row_id, value in cursor.fetchall()]
+        if rows:
+            cursor.executemany(f"UPDATE {table} SET {normalized_field} = %s WHERE id = %s", rows)
+    return backfill
+
+
+# تغییرات schema به ترتیب اجرا (دستور SQL یا تابعی که cursor می‌گیرد)؛ id هر مرحله هیچ‌وقت نباید عوض شود
+MIGRATIONS = [
+    ('001_medias_variants', [
+        # آدرس نسخه‌های تغییر اندازه داده شده‌ی تصویر: {"800": {"webp": url, "jpeg": url}, ...}
+        "ALTER TABLE medias ADD COLUMN variants JSON NULL",
+    ]),
+    ('002_medias_content_hash', [
+        # SHA-256 فایل اصلی برای حذف آپلودهای تکراری
+        "ALTER TABLE medias ADD COLUMN content_hash CHAR(64) NULL",
+        "ALTER TABLE medias ADD INDEX idx_medias_content_hash (content_hash)",
+        # dHash شصت و چهار بیتی برای عکس‌های تقریباً یکسان (با BIT_COUNT مقایسه می‌شود)
+        "ALTER TABLE medias ADD COLUMN phash BIGINT UNSIGNED NULL",
+    ]),
+    ('003_products_fulltext', [
+        # جستجوی محصولات با MATCH ... AGAINST؛ parser ngram برای متن فارسی (بدون فاصله بین همه کلمات)
+        "ALTER TABLE products ADD FULLTEXT INDEX ft_products_search (name, description, sku) WITH PARSER ngram",
+    ]),
+    ('004_normalized_names', [
+        # نام‌های یکسان‌سازی شده (text_normalizer) تا جستجوی نام با = و index انجام شود نه LIKE
+        "ALTER TABLE products ADD COLUMN name_normalized VARCHAR(255) NULL",
+        "ALTER TABLE products ADD INDEX idx_products_name_normalized (name_normalized(191))",
+        "ALTER TABLE categories ADD COLUMN title_normalized VARCHAR(255) NULL",
+        "ALTER TABLE categories ADD INDEX idx_categories_title_normalized (title_normalized(191))",
+        "ALTER TABLE brands ADD COLUMN name_normalized VARCHAR(255) NULL",
+        "ALTER TABLE brands ADD INDEX idx_brands_name_normalized (name_normalized(191))",
+        _backfill_normalized('products', 'name', 'name_normalized'),
+        _backfill_normalized('categories', 'title', 'title_normalized'),
+        _backfill_normalized('brands', 'name', 'name_normalized'),
+    ]),
+    ('005_products_keyset', [
+        # صفحه‌بندی لیست محصولات روی (created_at, id) بدون OFFSET
+        "ALTER TABLE products ADD INDEX idx_products_created_id (created_at, id)",
+    ]),
+    ('006_medias_telegram_user', [
+        # کاربر تلگرامی که عکس را فرستاده؛ user_id مال کاربران خود فروشگاه است و جدا می‌ماند
+        "ALTER TABLE medias ADD COLUMN telegram_user_id BIGINT NULL",
+        "ALTER TABLE medias ADD INDEX idx_medias_hash_telegram_user (content_hash, telegram_user_id)",
+    ]),
+    ('007_products_fulltext_normalized', [
+        # جستجو روی نام نرمال شده تا ی/ي، ک/ك و ارقام فارسی هم پیدا شوند (به جای index مرحله 003)
+        "ALTER TABLE products ADD FULLTEXT INDEX ft_products_search_normalized (name_normalized, description, sku) "
+        "WITH PARSER ngram",
+        "ALTER TABLE products DROP INDEX ft_products_search",
+    ]),
+]
+
+# مراحلی که شکستشان جلوی اجرای بات را نمی‌گیرد (مثلاً MariaDB که parser ngram ندارد)؛
+# ثبت نمی‌شوند و در اجرای بعدی دوباره امتحان می‌شوند
+OPTIONAL_MIGRATIONS = {
+    '003_products_fulltext',  # بدون این index جستجو با LIKE انجام می‌شود
+    '007_products_fulltext_normalized',
+}
+
+
+def run_migrations():
+    """
+    اجرای مراحل schema که هنوز اعمال نشده‌اند (چند بار اجرا مشکلی ندارد)
+
+    بات بعد از migration فقط از pool async استفاده می‌کند؛ pool همگام همین‌جا بسته می‌شود.
+    """
+    try:
+        with get_pool().connection() as connection:
+            _apply_migrations(connection)
+    finally:
+        close_pool()
+
+
+def _apply_migrations(connection):
+    """اعمال مراحل روی یک اتصال؛ هر مرحله جدا commit می‌شود"""
+    cursor = connection.cursor()
+    try:
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            id VARCHAR(100) PRIMARY KEY,
+            applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+        """)
+        cursor.execute("SELECT id FROM schema_migrations")
+        applied = {row[0] for row in cursor.fetchall()}
+
+        for migration_id, statements in MIGRATIONS:
+            if migration_id in applied:
+                continue
+
+            try:
+                for statement in statements:
+                    try:
+                        if callable(statement):
+                            statement(cursor)
+                        else:
+                            cursor.execute(statement)
+                    except Error as e:
+                        if e.errno not in ALREADY_APPLIED_ERRORS:
+                            raise
+            except Error as e:
+                if migration_id not in OPTIONAL_MIGRATIONS:
+                    raise
+                print(f"⚠️ migration اختیاری {migration_id} اعمال نشد: {e}")
+                continue
+
+            cursor.execute("INSERT INTO schema_migrations (id) VALUES (%s)", (migration_id,))
+            connection.commit()
+            print(f"✅ migration {migration_id} اعمال شد")
+    except Error as e:
+        print(f"❌ خطا در migration: {e}")
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
@@ -0,0 +1,226 @@
+import csv
+import io
+from typing import Any, Dict, Iterator, List, Tuple
+
+from text_normalizer import normalize as normalize_text
+
+try:
+    import openpyxl
+except ImportError:  # openpyxl نصب نیست؛ فقط فایل CSV وارد می‌شود
+    openpyxl = None
+
+# فرمت‌های قابل وارد کردن (پسوند فایل)
+SUPPORTED_EXTENSIONS = {'.csv', '.xlsx'}
+
+# عنوان ستون (نرمال شده) -> فیلد محصول؛ عنوان فارسی یا انگلیسی
+COLUMN_ALIASES = {
+    'name': 'name', 'نام': 'name', 'نام محصول': 'name',
+    'price': 'price', 'قیمت': 'price',
+    'stock': 'stock', 'موجودی': 'stock',
+    'sku': 'sku', 'کد': 'sku', 'کد محصول': 'sku',
+    'category': 'category', 'دسته': 'category', 'دسته بندی': 'category',
+    'brand': 'brand', 'برند': 'brand',
+    'description': 'description', 'توضیحات': 'description',
+    'weight': 'weight', 'وزن': 'weight',
+}
+
+REQUIRED_COLUMNS = ('name', 'price', 'sku', 'category')
+
+
+def is_supported(extension: str) -> bool:
+    """آیا فایل با این پسوند قابل وارد کردن است (XLSX نیاز به openpyxl دارد)"""
+    extension = extension.lower()
+    if extension == '.xlsx':
+        return openpyxl is not None
+    return extension in SUPPORTED_EXTENSIONS
+
+
+def build_lookup(rows: List[Dict[str, Any]], name_field: str) -> Dict[str, int]:
+    """نام نرمال شده و ID (به صورت متن) -> ID، برای دسته‌بندی‌ها یا برندها"""
+    lookup = {}
+    for row in rows:
+        lookup.setdefault(normalize_text(row[name_field]), row['id'])
+        lookup[str(row['id'])] = row['id']
+    return lookup
+
+
+def _iter_csv(path: str) -> Iterator[List[Any]]:
+    # utf-8-sig: فایل‌های CSV ذخیره شده با Excel با BOM شروع می‌شوند
+    with open(path, newline='', encoding='utf-8-sig') as file:
+        yield from csv.reader(file)
+
+
+def _iter_xlsx(path: str) -> Iterator[List[Any]]:
+    # read_only: ردیف‌ها از روی فایل خوانده می‌شوند، نه کل workbook در حافظه
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        for row in workbook.active.iter_rows(values_only=True):
+            yield list(row)
+    finally:
+        workbook.close()
+
+
+def _iter_rows(path: str, extension: str) -> Iterator[List[Any]]:
+    return _iter_xlsx(path) if extension.lower() == '.xlsx' else _iter_csv(path)
+
+
+def _map_columns(header: List[Any]) -> Dict[int, str]:
+    """شماره ستون -> فیلد محصول، از روی سطر عنوان"""
+    columns: Dict[int, str] = {}
+    for index, title in enumerate(header or []):
+        field = COLUMN_ALIASES.get(normalize_text(str(title or '')))
+        if field and field not in columns.values():
+            columns[index] = field
+    return columns
+
+
+def is_update_file(path: str, extension: str) -> bool:
+    """فایل SKU -> قیمت/موجودی برای تغییر گروهی (نه وارد کردن محصول جدید)"""
+    rows = _iter_rows(path, extension)
+    try:
+        fields = set(_map_columns(next(rows, None)).values())
+    finally:
+        rows.close()
+    return 'sku' in fields and bool(fields & {'price', 'stock'}) and not fields & {'name', 'category'}
+
+
+def read_updates(path: str, extension: str) -> Tuple[Dict[str, Dict[str, Any]], List[Tuple[int, str, str]]]:
+    """
+    خواندن فایل SKU -> قیمت/موجودی
+
+    Returns:
+        ({sku: {'price': ..., 'stock': ...}}, خطاها [(شماره ردیف, sku, پیام)])
+    """
+    rows = _iter_rows(path, extension)
+    try:
+        columns = _map_columns(next(rows, None))
+
+        updates, errors = {}, []
+        for line_number, row in enumerate(rows, start=2):
+            values = {field: row[index] for index, field in columns.items() if index < len(row)}
+            if not any(value not in (None, '') for value in values.values()):
+                continue  # ردیف خالی
+            sku = str(values.get('sku') or '').strip()
+            try:
+                if not sku:
+                    raise ValueError("SKU خالی است")
+                if sku in updates:
+                    raise ValueError("SKU تکراری است")
+                update = {}
+                if values.get('price') not in (None, ''):
+                    update['price'] = _parse_number(values['price'], 'قیمت')
+                if values.get('stock') not in (None, ''):
+                    update['stock'] = _parse_number(values['stock'], 'موجودی')
+                if not update:
+                    raise ValueError("قیمت و موجودی خالی است")
+                updates[sku] = update
+            except ValueError as e:
+                errors.append((line_number, sku, str(e)))
+    finally:
+        # فایل XLSX (workbook) حتی با خطای وسط خواندن بسته می‌شود
+        rows.close()
+    return updates, errors
+
+
+def _parse_number(value: Any, field: str, integer: bool = True):
+    """عدد از مقدار سلول (ارقام فارسی و جداکننده هزارگان مشکلی ندارد)"""
+    if isinstance(value, (int, float)):
+        number = value
+    else:
+        text = normalize_text(str(value)).replace(',', '').replace('٬', '')
+        try:
+            number = float(text)
+        except ValueError:
+            raise ValueError(f"{field} عدد نیست: {value}")
+    if number < 0:
+        raise ValueError(f"{field} منفی است: {value}")
+    if integer:
+        if number != int(number):
+            raise ValueError(f"{field} باید عدد صحیح باشد: {value}")
+        return int(number)
+    return float(number)
+
+
+def validate_row(values: Dict[str, Any], categories: Dict[str, int],
+                 brands: Dict[str, int]) -> Dict[str, Any]:
+    """
+    تبدیل یک ردیف فایل به داده محصول برای add_products
+
+    Raises:
+        ValueError: با پیام خطای همان ردیف
+    """
+    # سلول متنی فقط با فاصله خالی حساب می‌شود (وگرنه مثلاً SKU خالی '' ذخیره می‌شد)
+    values = {field: value.strip() if isinstance(value, str) else value for field, value in values.items()}
+    missing = [field for field in REQUIRED_COLUMNS if values.get(field) in (None, '')]
+    if missing:
+        raise ValueError(f"ستون‌های خالی: {', '.join(missing)}")
+
+    category_id = categories.get(normalize_text(str(values['category'])))
+    if category_id is None:
+        raise ValueError(f"دسته‌بندی یافت نشد: {values['category']}")
+
+    product = {
+        'name': str(values['name']).strip(),
+        'sku': str(values['sku']).strip(),
+        'price': _parse_number(values['price'], 'قیمت'),
+        'category_id': category_id,
+    }
+
+    if values.get('brand') not in (None, ''):
+        brand_id = brands.get(normalize_text(str(values['brand'])))
+        if brand_id is None:
+            raise ValueError(f"برند یافت نشد: {values['brand']}")
+        product['brand_id'] = brand_id
+    if values.get('stock') not in (None, ''):
+        product['stock'] = _parse_number(values['stock'], 'موجودی')
+    if values.get('weight') not in (None, ''):
+        product['weight'] = _parse_number(values['weight'], 'وزن', integer=False)
+    if values.get('description') not in (None, ''):
+        product['description'] = str(values['description']).strip()
+
+    return product
+
+
+def read_chunks(path: str, extension: str, chunk_size: int, categories: Dict[str, int],
+                brands: Dict[str, int]) -> Iterator[Tuple[List[Tuple[int, Dict]], List[Tuple[int, str, str]]]]:
+    """
+    خواندن و اعتبارسنجی فایل به صورت تکه‌تکه (هر next در thread pool اجرا می‌شود)
+
+    Yields:
+        (ردیف‌های معتبر [(شماره ردیف, محصول)], خطاها [(شماره ردیف, sku, پیام)])
+
+    Raises:
+        ValueError: اگر ستون‌های اجباری در سطر عنوان نباشند
+    """
+    rows = _iter_rows(path, extension)
+    columns = _map_columns(next(rows, None))
+    missing = [field for field in REQUIRED_COLUMNS if field not in columns.values()]
+    if missing:
+        raise ValueError(f"ستون‌های اجباری در سطر اول فایل نیستند: {', '.join(missing)}")
+
+    valid, errors = [], []
+    for line_number, row in enumerate(rows, start=2):
+        if not any(cell not in (None, '') for cell in row):
+            continue  # ردیف خالی
+
+        values = {field: row[index] for index, field in columns.items() if index < len(row)}
+        try:
+            valid.append((line_number, validate_row(values, categories, brands)))
+        except ValueError as e:
+            errors.append((line_number, str(values.get('sku') or ''), str(e)))
+
+        if len(valid) + len(errors) >= chunk_size:
+            yield valid, errors
+            valid, errors = [], []
+
+    if valid or errors:
+        yield valid, errors
+
+
+def error_report(errors: List[Tuple[int, str, str]]) -> bytes:
+    """فایل CSV خطاهای ردیف‌ها (با BOM تا Excel متن فارسی را درست نشان دهد)"""
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(['row', 'sku', 'error'])
+    writer.writerows(sorted(errors))
+    return output.getvalue().encode('utf-8-sig')
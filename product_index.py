@@ -0,0 +1,128 @@
+import math
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple, Any
+
+
+def trigrams(text: str) -> Set[str]:
+    """سه‌حرفی‌های متن (هر کلمه با دو فاصله در ابتدا و یکی در انتها، مثل pg_trgm)"""
+    result = set()
+    for word in text.split():
+        padded = f"  {word} "
+        for i in range(len(padded) - 2):
+            result.add(padded[i:i + 3])
+    return result
+
+
+class TrigramIndex:
+    """Index درون حافظه‌ی نام و SKU محصولات برای پیدا کردن محصول با غلط تایپی یا حروف عربی/فارسی متفاوت"""
+
+    def __init__(self, normalize: Callable[[str], str], min_score: float = 0.5):
+        self.normalize = normalize
+        self.min_score = min_score
+
+        # product_id -> (نام نرمال شده, sku نرمال شده, سه‌حرفی‌ها)
+        self._products: Dict[int, Tuple[str, str, Set[str]]] = {}
+        # سه‌حرفی -> شناسه محصولاتی که آن را دارند
+        self._postings: Dict[str, Set[int]] = {}
+        self.built_at: Optional[float] = None
+
+        # متریک‌ها
+        self.lookups = 0
+        self.matches = 0
+        self._total_lookup_time = 0.0
+
+    def build(self, products: Iterable[Dict[str, Any]]):
+        """ساخت دوباره index از ردیف‌های (id, name, sku) دیتابیس"""
+        self._products.clear()
+        self._postings.clear()
+        for product in products:
+            self.add(product['id'], product.get('name'), product.get('sku'))
+        self.built_at = time.monotonic()
+
+    def invalidate(self):
+        """ساخت دوباره index در اولین جستجوی بعدی (مثلاً بعد از وارد کردن گروهی محصولات)"""
+        self.built_at = None
+
+    def add(self, product_id: int, name: Optional[str], sku: Optional[str] = None):
+        """افزودن یا به‌روزرسانی یک محصول"""
+        self.remove(product_id)
+        name = self.normalize(name or '')
+        sku = self.normalize(sku or '')
+        grams = trigrams(name) | trigrams(sku)
+        self._products[product_id] = (name, sku, grams)
+        for gram in grams:
+            self._postings.setdefault(gram, set()).add(product_id)
+
+    def remove(self, product_id: int):
+        """حذف محصول از index"""
+        entry = self._products.pop(product_id, None)
+        if entry is None:
+            return
+        for gram in entry[2]:
+            ids = self._postings.get(gram)
+            if ids is not None:
+                ids.discard(product_id)
+                if not ids:
+                    del self._postings[gram]
+
+    def find_exact(self, text: str) -> List[int]:
+        """شناسه محصولاتی که نام یا SKU نرمال شده‌شان دقیقاً برابر متن است (برای ویرایش و حذف)"""
+        query = self.normalize(text)
+        query_grams = trigrams(query)
+        if not query_grams:
+            return []
+        # محصول برابر همه سه‌حرفی‌ها را دارد؛ کمیاب‌ترین سه‌حرفی کاندیدها را مشخص می‌کند
+        rarest = min(query_grams, key=lambda gram: len(self._postings.get(gram, ())))
+        return [
+            product_id for product_id in self._postings.get(rarest, ())
+            if query in self._products[product_id][:2]
+        ]
+
+    def search(self, text: str, limit: int = 5) -> List[Tuple[int, float]]:
+        """
+        محصولات شبیه به متن، به ترتیب امتیاز
+
+        امتیاز = سهم سه‌حرفی‌های عبارت که در نام/SKU محصول هست (عبارت کوتاه داخل نام طولانی امتیاز کامل می‌گیرد)؛
+        در امتیاز برابر، محصولی که نامش به عبارت نزدیک‌تر است (Jaccard) جلوتر است.
+        """
+        started_at = time.perf_counter()
+        query = self.normalize(text)
+        query_grams = trigrams(query)
+
+        results = []
+        if query_grams:
+            # محصولی با امتیاز کافی حداقل `needed` سه‌حرفی مشترک دارد، پس حتماً در یکی از
+            # (تعداد - needed + 1) سه‌حرفی کمیاب‌تر هست؛ سه‌حرفی‌های پرتکرار کاندید تولید نمی‌کنند
+            needed = max(1, math.ceil(self.min_score * len(query_grams)))
+            rarest = sorted(query_grams, key=lambda gram: len(self._postings.get(gram, ())))
+            candidates = set()
+            for gram in rarest[:len(query_grams) - needed + 1]:
+                candidates.update(self._postings.get(gram, ()))
+
+            for product_id in candidates:
+                name, sku, grams = self._products[product_id]
+                count = len(query_grams & grams)
+                if query == sku or query == name:
+                    results.append((product_id, 1.0, 1.0))
+                    continue
+                score = count / len(query_grams)
+                if score >= self.min_score:
+                    results.append((product_id, score, count / len(grams | query_grams)))
+
+        results.sort(key=lambda r: (r[1], r[2]), reverse=True)
+
+        self.lookups += 1
+        if results:
+            self.matches += 1
+        self._total_lookup_time += time.perf_counter() - started_at
+        return [(product_id, score) for product_id, score, _ in results[:limit]]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """متریک‌های index (زمان بر حسب میکروثانیه)"""
+        return {
+            'size': len(self._products),
+            'trigrams': len(self._postings),
+            'lookups': self.lookups,
+            'matches': self.matches,
+            'avg_lookup_us': (self._total_lookup_time / self.lookups * 1_000_000) if self.lookups else 0.0,
+        }
@@ -0,0 +1,58 @@
+"""
+تست‌های واحد AsyncDatabase (بدون دیتابیس؛ کوئری‌ها و پارامترها بررسی می‌شوند)
+
+اجرا: python -m unittest test_async_database
+"""
+
+import re
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+
+from async_database import AsyncDatabase
+from database import PRODUCT_INSERT_QUERY
+
+
+class AddProductTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.db = AsyncDatabase(pool=MagicMock())
+        self.db.execute_query = AsyncMock(return_value=42)
+
+    async def test_pinned_media_is_inserted(self):
+        product_id = await self.db.add_product({
+            'name': 'گوشی تست', 'price': 1000, 'sku': 'TEST-1', 'category_id': 1, 'media_pinned_id': 7,
+        })
+
+        self.assertEqual(product_id, 42)
+        query, params = self.db.execute_query.await_args.args
+        self.assertIn('%(media_pinned_id)s', query)
+        self.assertEqual(params['media_pinned_id'], 7)
+
+    async def test_every_column_has_a_value(self):
+        await self.db.add_product({'name': 'گوشی تست', 'price': 1000, 'sku': 'TEST-1', 'category_id': 1})
+
+        _, params = self.db.execute_query.await_args.args
+        placeholders = set(re.findall(r'%\((\w+)\)s', PRODUCT_INSERT_QUERY))
+        self.assertEqual(placeholders - params.keys(), set())
+        self.assertIsNone(params['media_pinned_id'])
+
+
+class SearchProductsTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.db = AsyncDatabase(pool=MagicMock())
+        self.db._search_products_fulltext = AsyncMock(return_value=[])
+        self.db._search_products_like = AsyncMock(return_value=[{'id': 1}])
+
+    async def test_fulltext_term_is_normalized(self):
+        self.db._search_products_fulltext.return_value = [{'id': 2}]
+
+        self.assertEqual(await self.db.search_products('آيفون ۱۳'), [{'id': 2}])
+        self.assertEqual(self.db._search_products_fulltext.await_args.args[0], 'آیفون 13')
+        self.db._search_products_like.assert_not_awaited()
+
+    async def test_empty_fulltext_result_falls_back_to_like(self):
+        self.assertEqual(await self.db.search_products('آيفون'), [{'id': 1}])
+        self.db._search_products_like.assert_awaited_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,6 +3,7 @@
 """
 
 import asyncio
+from unittest.mock import AsyncMock, MagicMock
 from database import Database
 from ai_handler import AIHandler
 import config
@@ -105,7 +106,7 @@ async def test_product_operations():
         print(f"📝 تست افزودن: {add_request}")
         
         action_data = await ai.process_request(add_request)
-        result = ai.execute_action(action_data)
+        result = await ai.execute_action(action_data)
         
         if result.get('success'):
             print("✅ محصول با موفقیت اضافه شد")
@@ -117,7 +118,7 @@ async def test_product_operations():
                 print(f"📝 تست حذف: {delete_request}")
                 
                 action_data = await ai.process_request(delete_request)
-                result = ai.execute_action(action_data)
+                result = await ai.execute_action(action_data)
                 
                 if result.get('success'):
                     print("✅ محصول با موفقیت حذف شد")
@@ -132,6 +133,50 @@ async def test_product_operations():
         return False
 
 
+async def test_bot_handlers():
+    """تست دود هندلرهای عکس و فایل (بدون تلگرام، FTP و دیتابیس)"""
+    print("\n📎 تست هندلرهای عکس و فایل...")
+    from bot import ShopBot
+    try:
+        bot = ShopBot()
+        user_id = config.ADMIN_USER_IDS[0] if config.ADMIN_USER_IDS else 1
+        
+        def make_update(**message):
+            update = MagicMock()
+            update.effective_user.id = user_id
+            update.message.media_group_id = None
+            update.message.reply_text = AsyncMock(return_value=MagicMock(edit_text=AsyncMock(), delete=AsyncMock()))
+            for key, value in message.items():
+                setattr(update.message, key, value)
+            return update
+        
+        # عکس: _download_photo باید context manager باشد و عکس به upload_image برسد
+        photo_file = MagicMock(file_size=1024, download_to_memory=AsyncMock())
+        context = MagicMock()
+        context.bot.get_file = AsyncMock(return_value=photo_file)
+        bot.image_handler.upload_image = AsyncMock(return_value={'success': True, 'media_id': 7, 'url': 'https://example.com/7.jpg'})
+        await bot.handle_photo(make_update(photo=[MagicMock(file_id='photo', file_size=1024)]), context)
+        assert bot.image_handler.upload_image.await_count == 1, "عکس آپلود نشد"
+        assert 7 in bot.user_media[user_id]['ids'], "media_id ذخیره نشد"
+        print("✅ هندلر عکس")
+        
+        # فایل SKU -> قیمت: پیش‌نمایش تغییر گروهی
+        async def download_to_drive(path):
+            with open(path, 'w', encoding='utf-8') as file:
+                file.write("sku,price\nA-1,1000\n")
+        context.bot.get_file = AsyncMock(return_value=MagicMock(download_to_drive=download_to_drive))
+        bot.ai_handler.preview_sku_updates = AsyncMock(return_value={'success': False, 'message': 'preview'})
+        document = MagicMock(file_name='prices.csv', file_size=32, file_id='document')
+        await bot.handle_document(make_update(document=document), context)
+        bot.ai_handler.preview_sku_updates.assert_awaited_once_with({'A-1': {'price': 1000}})
+        print("✅ هندلر فایل")
+        
+        return True
+    except Exception as e:
+        print(f"❌ خطا در تست هندلرها: {e}")
+        return False
+
+
 def main():
     """اجرای تست‌ها"""
     print("🚀 شروع تست‌های سیستم...")
@@ -147,6 +192,10 @@ def main():
         print("   - برای تولید: AI_PROVIDER=claude")
         return
     
+    # تست هندلرهای عکس و فایل
+    if not asyncio.run(test_bot_handlers()):
+        return
+    
     # تست دیتابیس
     db_ok = test_database_connection()
     
@@ -0,0 +1,88 @@
+"""
+تست‌های واحد تبدیل قانون‌های تغییر گروهی به SQL (ورودی از خروجی مدل AI می‌آید)
+
+اجرا: python -m unittest test_bulk_update
+"""
+
+import unittest
+
+from bulk_update import compile_rule, compile_sku_updates
+
+
+class CompileRuleTest(unittest.TestCase):
+    def assertPlaceholdersMatch(self, statement):
+        query, params = statement
+        self.assertEqual(query.count('%s'), len(params), query)
+
+    def test_category_percent(self):
+        count_query, update_query = compile_rule({'category_id': 3}, {'price_percent': 10})
+
+        self.assertEqual(count_query, ("SELECT COUNT(*) AS count FROM products p WHERE p.category_id = %s", (3,)))
+        self.assertIn("GREATEST(ROUND(p.price * (100 + %s) / 100), 0)", update_query[0])
+        self.assertEqual(update_query[1], (10, 3))
+
+    def test_lists_and_several_changes(self):
+        count_query, update_query = compile_rule(
+            {'product_ids': [1, 2, 3], 'skus': ['A-1']}, {'price_delta': -500, 'stock': 4}
+        )
+
+        self.assertIn("p.id IN (%s, %s, %s) AND p.sku IN (%s)", count_query[0])
+        self.assertEqual(update_query[1], (-500, 4, 1, 2, 3, 'A-1'))
+        self.assertPlaceholdersMatch(count_query)
+        self.assertPlaceholdersMatch(update_query)
+
+    def test_all_products(self):
+        count_query, update_query = compile_rule({'all': True}, {'stock_delta': 5})
+
+        self.assertNotIn("WHERE", update_query[0])
+        self.assertEqual(update_query[1], (5,))
+
+    def test_rejected_filters(self):
+        rejected = [
+            {'category_id': [1, 2]},
+            {'category_id': '5'},
+            {'category_id': True},
+            {'brand_id': 0},
+            {'product_ids': 7},
+            {'product_ids': []},
+            {'product_ids': [1, 'x']},
+            {'product_ids': [-1]},
+            {'skus': 'A-1'},
+            {'skus': ['A-1', '  ']},
+            {'color': 'red'},
+            {},
+            {'all': False},
+        ]
+        for filters in rejected:
+            with self.subTest(filters=filters), self.assertRaises(ValueError):
+                compile_rule(filters, {'price': 1000})
+
+    def test_rejected_changes(self):
+        rejected = [
+            {},
+            {'price': -1},
+            {'price': '1000'},
+            {'stock': True},
+            {'price_percent': -100},
+            {'price': 1000, 'price_delta': 5},
+            {'name': 'x'},
+        ]
+        for changes in rejected:
+            with self.subTest(changes=changes), self.assertRaises(ValueError):
+                compile_rule({'category_id': 1}, changes)
+
+
+class CompileSkuUpdatesTest(unittest.TestCase):
+    def test_batches_and_untouched_columns(self):
+        updates = {'A': {'price': 100}, 'B': {'stock': 2}, 'C': {'price': 300, 'stock': 0}}
+
+        statements = compile_sku_updates(updates, batch_size=2)
+
+        self.assertEqual(len(statements), 2)
+        for query, params in statements:
+            self.assertEqual(query.count('%s'), len(params))
+        self.assertEqual(statements[1][1], ('C', 300, 'C', 0, 'C'))
+
+
+if __name__ == '__main__':
+    unittest.main()
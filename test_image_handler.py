@@ -0,0 +1,77 @@
+"""
+تست‌های واحد pool نشست‌های FTP و محاسبه hash عکس‌ها (بدون سرور FTP)
+
+اجرا: python -m unittest test_image_handler
+"""
+
+import hashlib
+import unittest
+from unittest.mock import MagicMock, patch
+
+import config
+import image_processing
+from executors import BoundedExecutor
+from image_handler import FTPPoolTimeout, FTPSessionPool, ImageHandler
+
+
+class FTPSessionPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.pool = FTPSessionPool({}, max_size=1, acquire_timeout=0.05)
+        self.pool._connect = MagicMock(side_effect=lambda: MagicMock())
+
+    def test_any_exception_releases_the_slot_and_drops_the_session(self):
+        with self.assertRaises(MemoryError):
+            with self.pool.session() as ftp:
+                raise MemoryError()
+
+        ftp.quit.assert_called_once()
+        self.assertEqual(self.pool.get_stats()['idle'], 0)
+        with self.pool.session():
+            pass
+        self.assertEqual(self.pool._connect.call_count, 2)
+
+    def test_healthy_session_is_reused(self):
+        with self.pool.session() as first:
+            pass
+        with self.pool.session() as second:
+            pass
+        self.assertIs(first, second)
+
+    def test_acquire_times_out_when_all_sessions_are_busy(self):
+        with self.pool.session():
+            with self.assertRaises(FTPPoolTimeout):
+                self.pool.acquire()
+        self.assertEqual(self.pool.get_stats()['timeouts'], 1)
+
+
+class ComputeHashesTest(unittest.IsolatedAsyncioTestCase):
+    async def test_sha256_runs_in_threads_and_only_pillow_work_in_processes(self):
+        calls = []
+
+        async def run_blocking(pool, func, *args):
+            calls.append((pool, func))
+            return func(*args)
+
+        handler = ImageHandler.__new__(ImageHandler)
+        dedup = {**config.MEDIA_DEDUP, 'enabled': True, 'perceptual': True}
+        with patch('image_handler.run_blocking', run_blocking), patch.dict(config.MEDIA_DEDUP, dedup), \
+                patch('image_processing.is_available', return_value=True), \
+                patch('image_processing.perceptual_hash', return_value=5) as perceptual_hash:
+            hashes = await handler._compute_hashes(b'image-bytes')
+
+        self.assertEqual(hashes, {'content_hash': hashlib.sha256(b'image-bytes').hexdigest(), 'phash': 5})
+        self.assertEqual(calls, [('hash', image_processing.content_hash), ('image', perceptual_hash)])
+
+
+class ImagePoolTest(unittest.TestCase):
+    def test_image_processes_are_not_forked(self):
+        executor = BoundedExecutor('image-test', max_workers=1, processes=True,
+                                   start_method=config.EXECUTOR_POOLS['image']['start_method'])
+        try:
+            self.assertIn(executor._executor._mp_context.get_start_method(), ('forkserver', 'spawn'))
+        finally:
+            executor.shutdown()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+"""
+تست‌های واحد خواندن و اعتبارسنجی ردیف‌های فایل CSV/XLSX محصولات
+
+اجرا: python -m unittest test_product_import
+"""
+
+import unittest
+
+from product_import import validate_row
+
+CATEGORIES = {'موبایل': 1, '1': 1}
+BRANDS = {'اپل': 2, '2': 2}
+
+
+class ValidateRowTest(unittest.TestCase):
+    def test_valid_row(self):
+        product = validate_row(
+            {'name': ' آیفون 13 ', 'sku': ' IP13 ', 'price': '۱۲,۰۰۰', 'category': 'موبایل', 'brand': 'اپل', 'stock': 3},
+            CATEGORIES, BRANDS,
+        )
+
+        self.assertEqual(product, {
+            'name': 'آیفون 13', 'sku': 'IP13', 'price': 12000, 'category_id': 1, 'brand_id': 2, 'stock': 3,
+        })
+
+    def test_blank_required_fields_are_rejected(self):
+        row = {'name': 'آیفون 13', 'sku': 'IP13', 'price': 1000, 'category': 'موبایل'}
+        for field in ('name', 'sku', 'category'):
+            for blank in ('', ' ', '\t', None):
+                with self.subTest(field=field, value=blank), self.assertRaisesRegex(ValueError, field):
+                    validate_row({**row, field: blank}, CATEGORIES, BRANDS)
+
+    def test_unknown_category_and_bad_numbers(self):
+        row = {'name': 'آیفون 13', 'sku': 'IP13', 'price': 1000, 'category': 'موبایل'}
+        for change in ({'category': 'لپ تاپ'}, {'brand': 'سامسونگ'}, {'price': 'ارزان'}, {'stock': -1}):
+            with self.subTest(change=change), self.assertRaises(ValueError):
+                validate_row({**row, **change}, CATEGORIES, BRANDS)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,21 @@
+from typing import Optional
+
+# جدول ثابت یکسان‌سازی (یک بار ساخته می‌شود): حروف عربی به فارسی، ارقام فارسی/عربی به لاتین،
+# حذف اعراب، کشیده و نویسه‌های جهت‌نما؛ نیم‌فاصله مثل فاصله در نظر گرفته می‌شود
+_TRANSLATION = str.maketrans({
+    'ي': 'ی', 'ى': 'ی', 'ك': 'ک', 'ة': 'ه', 'ۀ': 'ه', 'أ': 'ا', 'إ': 'ا', 'ٱ': 'ا',
+    'ـ': None,
+    '\u200c': ' ',  # نیم‌فاصله (ZWNJ)
+    '\u200d': None, '\u200e': None, '\u200f': None, '\ufeff': None,  # ZWJ، نویسه‌های جهت‌نما و BOM
+    '\u0670': None,  # الف کوچک بالای حرف
+    **{chr(code): None for code in range(0x064B, 0x0653)},  # اعراب
+    **{chr(0x06F0 + i): str(i) for i in range(10)},
+    **{chr(0x0660 + i): str(i) for i in range(10)},
+})
+
+
+def normalize(text: Optional[str]) -> str:
+    """یکسان‌سازی متن فارسی برای مقایسه و جستجو (کوچک، بدون فاصله اضافه)"""
+    if not text:
+        return ''
+    return ' '.join(text.translate(_TRANSLATION).lower().split())